@@ -1,15 +1,28 @@
 from flask import Flask, render_template, jsonify, request
 from flask_cors import CORS
-from scheduler_core import SchedulerCore
+from scheduler_core import (SchedulerCore, UnknownGroupError, generate_all_groups, generate_best_candidate,
+                            MAX_SEED, ENGINES)
+from staff_roster import get_roster, get_rosters
+from schedule_cache import ScheduleCache
+from schedule_store import open_schedule_store, VersionConflict
+from schedule_codec import encode_scheduler, GRID_MIMETYPE
+from job_queue import JobQueue, JobLimitError, JobCancelled, open_job_store
+from schedule_excel import (ScheduleExcelWriter, EXCEL_MIMETYPE, export_filename, FileChunks,
+                            open_schedule_workbook, read_schedule_sheet, sheet_title, sheet_group_name)
+from schedule_table import (TABLE_FORMATS, TableFormatError, check_table_format, table_format_of, table_filename,
+                            iter_schedule_rows, iter_csv_chunks, spool_columnar, iter_csv_rows, iter_columnar_rows)
 import calendar
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-import io
-from datetime import datetime
-from flask import send_file
-from openpyxl import load_workbook
+from collections import deque, namedtuple
+from flask import Response, url_for
 import re
 import unicodedata
+import random
+import os
+import time
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 app = Flask(__name__, 
     template_folder='frontend/templates',
@@ -18,25 +31,236 @@ app = Flask(__name__,
 )
 CORS(app)
 
-schedulers = {
-    'sala': SchedulerCore(),
-    'cocina': SchedulerCore(),
-    'coperia': SchedulerCore()
-}
-# Add these constants
-GROUP_NAMES = {
-    'sala': 'Personal de Sala',
-    'cocina': 'Cocina',
-    'coperia': 'Copería'
-}
+# Upper bound for best-of-N generation requests
+MAX_CANDIDATES = 500
 
-# Global state to track all schedules
-global schedule_state
-schedule_state = {
-    'sala': {'schedule': None, 'year': None, 'month': None},
-    'cocina': {'schedule': None, 'year': None, 'month': None},
-    'coperia': {'schedule': None, 'year': None, 'month': None}
-}
+# Local-search time budget per schedule when engine is 'search' (milliseconds)
+DEFAULT_TIME_BUDGET_MS = 500
+MAX_TIME_BUDGET_MS = 10000
+
+# Cap on candidates x time_budget_ms for one request, well inside the gunicorn timeout
+MAX_REQUEST_SEARCH_MS = 60000
+
+# Share of a deadline_ms kept back for saving and serializing the result
+DEADLINE_RESERVE = 0.1
+
+# Generated schedules keyed by (group, year, month, seed, roster, preview week)
+generation_cache = ScheduleCache(
+    max_size=int(os.environ.get('SCHEDULE_CACHE_SIZE', 128)),
+    ttl=float(os.environ.get('SCHEDULE_CACHE_TTL', 3600))
+)
+
+# Schedulers with a built ConstraintTracker keyed by (group, year, month, version,
+# roster fingerprint), so verifying a stored version doesn't rescan its grid
+tracker_cache = ScheduleCache(
+    max_size=int(os.environ.get('TRACKER_CACHE_SIZE', 64)),
+    ttl=float(os.environ.get('SCHEDULE_CACHE_TTL', 3600))
+)
+
+# Schedules live in a store shared by every worker process ('memory' keeps them in-process)
+STORE_LOCATION = os.environ.get(
+    'SCHEDULE_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedules.db')
+)
+schedule_store = open_schedule_store(STORE_LOCATION)
+
+# Background jobs: a few workers per process, one active job per group across processes
+job_queue = JobQueue(
+    open_job_store(STORE_LOCATION),
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    group_limit=int(os.environ.get('JOB_GROUP_LIMIT', 1))
+)
+
+# Progress streams generating at once in this process; each runs on its own thread
+MAX_STREAMS = int(os.environ.get('STREAM_WORKERS', 2))
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+# Longest month range one Excel export may cover
+MAX_EXPORT_MONTHS = 24
+
+# Threads loading and rendering export sheets ahead of the writer; also caps how
+# many rendered sheets wait in memory to be written
+EXPORT_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+def group_names():
+    """Return {group: display name} of every group in the staff config, in config order.
+
+    Groups come from the hot-reloaded rosters, so the set can change
+    while the server runs.
+    """
+    return {group: roster.name for group, roster in get_rosters().items()}
+
+def new_scheduler(group, year, month):
+    """Create an empty scheduler for a group and month.
+
+    Raises UnknownGroupError if the group isn't in the staff config.
+    """
+    scheduler = SchedulerCore(group)
+    scheduler.initialize_month(year, month)
+    return scheduler
+
+def load_scheduler(group, year=None, month=None):
+    """Load a group's stored schedule into a fresh scheduler.
+
+    Uses the group's active month unless year/month are given. Returns
+    (scheduler, version), or (None, 0) if the group has no active month.
+    """
+    if year is None:
+        active_month = schedule_store.get_active_month(group)
+        if active_month is None:
+            return None, 0
+        year, month = active_month
+    
+    scheduler = new_scheduler(group, year, month)
+    record = schedule_store.load(group, year, month)
+    if record is None:
+        return scheduler, 0
+    scheduler.load_month_schedule(record['schedule'])
+    return scheduler, record['version']
+
+def save_scheduler(scheduler, expected_version=None):
+    """Store a scheduler's schedule and make its month the group's active one.
+
+    Pass expected_version to fail with VersionConflict if someone else
+    saved in between. Returns (schedule, new version).
+    """
+    schedule = scheduler.get_month_schedule()
+    version = schedule_store.save(scheduler.current_group, scheduler.year, scheduler.month,
+                                  schedule, expected_version=expected_version)
+    schedule_store.set_active_month(scheduler.current_group, scheduler.year, scheduler.month)
+    if scheduler.constraint_tracker is not None:
+        # Generation kept the tracker up to date cell by cell, so it matches this version
+        tracker_cache.put((scheduler.current_group, scheduler.year, scheduler.month, version,
+                           scheduler.roster.fingerprint), scheduler)
+    return schedule, version
+
+def load_checked_scheduler(group):
+    """Load a group's active schedule with its ConstraintTracker built.
+
+    Schedulers saved by this process are kept in tracker_cache under the
+    version they were saved as, tracker included, and other versions are
+    scanned once and then cached. Returns (scheduler, version) like
+    load_scheduler. The scheduler is shared, so callers must only read it.
+    """
+    active_month = schedule_store.get_active_month(group)
+    if active_month is None:
+        return None, 0
+    year, month = active_month
+    roster = get_roster(group)
+    version = schedule_store.get_version(group, year, month)
+    scheduler = tracker_cache.get((group, year, month, version, roster.fingerprint))
+    if scheduler is not None:
+        return scheduler, version
+
+    scheduler, version = load_scheduler(group, year, month)
+    scheduler.constraints()
+    tracker_cache.put((group, year, month, version, scheduler.roster.fingerprint), scheduler)
+    return scheduler, version
+
+def validate_shift_edit(scheduler, worker_index, day, shift):
+    """Check a manual edit against the T->M and DL-minimum rules.
+
+    Returns an error message, or None if the edit is allowed.
+    """
+    last_day = scheduler.days_in_month + scheduler.preview_days
+    if not 1 <= day <= last_day:
+        return f'Day must be between 1 and {last_day}'
+
+    # Check for T->M violation
+    if day > 1:
+        prev_shift = scheduler.get_shift(worker_index, day - 1)
+        if prev_shift == 'T' and shift == 'M':
+            return 'Cannot assign Morning shift after Tarde shift'
+
+    # Add validation for removing DLs
+    if shift != 'DL' and scheduler.get_shift(worker_index, day) == 'DL':
+        dl_count = len(scheduler.constraints().dl_days[worker_index] - {day})
+        if dl_count < 2:
+            return 'Cannot remove DL - worker must have 2 DLs per month'
+    return None
+
+def read_engine_options(data, candidates=1):
+    """Read engine and time_budget_ms from a generation request.
+
+    Every one of candidates schedules gets time_budget_ms, so their
+    product is capped at MAX_REQUEST_SEARCH_MS. Returns (engine,
+    time_budget_ms), with time_budget_ms None for the greedy engine.
+    Raises ValueError with a message for the client.
+    """
+    engine = data.get('engine', 'greedy')
+    if engine not in ENGINES:
+        raise ValueError(f'engine must be one of: {", ".join(ENGINES)}')
+    if engine != 'search':
+        return engine, None
+    time_budget_ms = int(data.get('time_budget_ms', DEFAULT_TIME_BUDGET_MS))
+    if not 1 <= time_budget_ms <= MAX_TIME_BUDGET_MS:
+        raise ValueError(f'time_budget_ms must be between 1 and {MAX_TIME_BUDGET_MS}')
+    if candidates * time_budget_ms > MAX_REQUEST_SEARCH_MS:
+        raise ValueError(f'candidates x time_budget_ms can be at most {MAX_REQUEST_SEARCH_MS}; '
+                         f'lower one of them or use deadline_ms')
+    return engine, time_budget_ms
+
+def parse_month(value, name):
+    """Parse a 'YYYY-MM' string into (year, month), raising ValueError for the client"""
+    match = re.fullmatch(r'(\d{4})-(\d{1,2})', str(value))
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f'{name} must be a month as YYYY-MM, got {value!r}')
+    return int(match.group(1)), int(match.group(2))
+
+def read_export_months(data):
+    """Read the months an export covers from its request.
+
+    Takes either 'year' for a whole year or 'start' and optionally 'end'
+    as YYYY-MM (both included). Returns a list of (year, month), or None
+    if neither is given. Raises ValueError with a message for the client.
+    """
+    if data.get('year') is not None:
+        if 'start' in data or 'end' in data:
+            raise ValueError('Give either year or start/end, not both')
+        year = int(data['year'])
+        if not 1 <= year <= 9999:
+            raise ValueError(f'year must be between 1 and 9999, got {year}')
+        return [(year, month) for month in range(1, 13)]
+    if data.get('start') is None:
+        if data.get('end') is not None:
+            raise ValueError('end needs a start')
+        return None
+
+    first = parse_month(data['start'], 'start')
+    last = parse_month(data['end'], 'end') if data.get('end') is not None else first
+    count = (last[0] - first[0]) * 12 + last[1] - first[1] + 1
+    if count < 1:
+        raise ValueError('end must not be before start')
+    if count > MAX_EXPORT_MONTHS:
+        raise ValueError(f'An export can cover at most {MAX_EXPORT_MONTHS} months')
+    return [(first[0] + (first[1] - 1 + offset) // 12, (first[1] - 1 + offset) % 12 + 1)
+            for offset in range(count)]
+
+class RequestError(ValueError):
+    """Raised when a parsed request can't be served as asked, e.g. there's nothing stored to work on"""
+
+def error_response(error, status_code=400):
+    """Error response for a RequestError or a ValueError raised while reading a request"""
+    return jsonify({
+        'success': False,
+        'error': str(error)
+    }), status_code
+
+def no_schedule_error(group):
+    """RequestError for a group that has no schedule yet"""
+    return RequestError(f'No schedule for group: {group}')
+
+def no_schedule_response(group):
+    """Error response for a group that has no schedule yet"""
+    return error_response(no_schedule_error(group))
+
+def conflict_response(error):
+    """Error response for a compare-and-set save that lost a race"""
+    return jsonify({
+        'success': False,
+        'error': f'{error}. Reload the schedule and try again',
+        'version': error.current_version
+    }), 409
 
 @app.route('/')
 def index():
@@ -47,69 +271,290 @@ def index():
 def get_workers():
     """Return list of workers"""
     group = request.args.get('group', 'sala')
-    if group not in schedulers:
+    if group not in get_rosters():
         return jsonify({
             'success': False,
             'error': f'Invalid group: {group}'
         }), 400
         
+    scheduler = SchedulerCore(group)
     return jsonify({
         'success': True,
-        'workers': schedulers[group].selected_workers
+        'workers': scheduler.selected_workers
     })
-@app.route('/api/generate', methods=['POST'])
-def generate():
-    """Generate a schedule"""
-    try:
-        data = request.get_json()
-        year = int(data.get('year', 2024))
-        month = int(data.get('month', 1))
-        group = data.get('group', 'sala')
-        
-        if group not in schedulers:
+
+@app.route('/api/schedule', methods=['GET'])
+def get_schedule():
+    """Return a group's stored schedule.
+
+    Clients sending Accept: application/x-schedule-grid get the compact
+    binary grid format (see schedule_codec) with the version in the
+    X-Schedule-Version header; everyone else gets JSON.
+    """
+    group = request.args.get('group', 'sala')
+    if group not in get_rosters():
+        return jsonify({
+            'success': False,
+            'error': f'Invalid group: {group}'
+        }), 400
+
+    if 'year' in request.args:
+        try:
+            year = int(request.args['year'])
+            month = int(request.args.get('month', 1))
+        except ValueError:
             return jsonify({
                 'success': False,
-                'error': f'Invalid group: {group}'
+                'error': 'year and month must be integers'
+            }), 400
+        if not 1 <= year <= 9999 or not 1 <= month <= 12:
+            return jsonify({
+                'success': False,
+                'error': f'No such month: {year}-{month}'
             }), 400
+        scheduler, version = load_scheduler(group, year, month)
+    else:
+        scheduler, version = load_scheduler(group)
+    if scheduler is None:
+        return no_schedule_response(group)
 
-        scheduler = schedulers[group]
-        
-        # Generate schedule
-        scheduler.initialize_month(year, month)
-        scheduler.set_current_group(group)  # Set the correct worker group
-        scheduler.assign_night_shifts()
-        scheduler.assign_free_sundays()
-        scheduler.assign_l_days()
-        scheduler.assign_dayshifts()
-
-        # Get the schedule data
-        schedule = scheduler.get_month_schedule()
+    if request.accept_mimetypes.best_match(['application/json', GRID_MIMETYPE]) == GRID_MIMETYPE:
+        response = Response(encode_scheduler(scheduler), mimetype=GRID_MIMETYPE)
+        response.headers['X-Schedule-Version'] = str(version)
+        response.vary.add('Accept')
+        return response
+
+    response = jsonify({
+        'success': True,
+        'schedule': scheduler.get_month_schedule(),
+        'month_data': {
+            'year': scheduler.year,
+            'month': scheduler.month,
+            'days_in_month': scheduler.days_in_month,
+            'preview_days': scheduler.preview_days
+        },
+        'version': version
+    })
+    response.vary.add('Accept')
+    return response
+
+def read_generate_request(data):
+    """Read a generate request into keyword arguments for generate_month_schedule.
+
+    Raises ValueError with a message for the client.
+    """
+    group = data.get('group', 'sala')
+    if group not in get_rosters():
+        raise ValueError(f'Invalid group: {group}')
+
+    candidates = int(data.get('candidates', 1))
+    if not 1 <= candidates <= MAX_CANDIDATES:
+        raise ValueError(f'candidates must be between 1 and {MAX_CANDIDATES}')
+
+    deadline_ms = data.get('deadline_ms')
+    if deadline_ms is not None:
+        deadline_ms = int(deadline_ms)
+        if data.get('engine', 'search') != 'search' or 'time_budget_ms' in data:
+            raise ValueError("deadline_ms runs the 'search' engine and replaces time_budget_ms")
+        if not 1 <= deadline_ms <= MAX_TIME_BUDGET_MS:
+            raise ValueError(f'deadline_ms must be between 1 and {MAX_TIME_BUDGET_MS}')
+        engine, time_budget_ms = 'search', None
+    else:
+        engine, time_budget_ms = read_engine_options(data, candidates)
+
+    return {
+        'group': group,
+        'year': int(data.get('year', 2024)),
+        'month': int(data.get('month', 1)),
+        'seed': data.get('seed'),
+        'candidates': candidates,
+        'engine': engine,
+        'time_budget_ms': time_budget_ms,
+        'deadline_ms': deadline_ms
+    }
+
+def generate_month_schedule(group, year, month, seed=None, candidates=1, engine='greedy',
+                            time_budget_ms=None, deadline_ms=None, progress=None):
+    """Generate and store a group's month, returning the generate response.
+
+    With deadline_ms the request runs as an anytime search: whatever the
+    deadline leaves after the greedy pipeline goes to LocalSearch, and the
+    best schedule found is returned with its score and iteration count.
+    progress is passed on to SchedulerCore.generate_schedule.
+    """
+    started = time.monotonic()
+    time_budget = time_budget_ms / 1000 if time_budget_ms else None
+
+    # Generate schedule
+    scheduler = new_scheduler(group, year, month)
+    seed = scheduler.set_seed(seed)
+    cache_key = ScheduleCache.make_key(group, year, month, seed, scheduler.roster.fingerprint,
+                                       candidates=candidates, engine=engine,
+                                       time_budget_ms=time_budget_ms, deadline_ms=deadline_ms)
+    cached = generation_cache.get(cache_key)
+    deadline = None
+    if deadline_ms is not None:
+        # Every search stops at the deadline, keeping a reserve for the response
+        deadline = started + deadline_ms / 1000 * (1 - DEADLINE_RESERVE)
+        # Candidates beyond one per CPU wait for a free pool worker, so each round gets a share
+        time_budget = max(0.0, deadline - time.monotonic()) / -(-candidates // (os.cpu_count() or 1))
+    iterations = 0
+    if cached:
+        scheduler.load_month_schedule(cached['schedule'])
+        seed = scheduler.set_seed(cached['seed'])
+        best = cached['best_of']
+        score = cached.get('score')
+        iterations = cached.get('iterations', 0)
+        if score is None:
+            # Entries cached by generate-all don't carry a score
+            tracker = scheduler.constraints()
+            score = scheduler.score_schedule(tracker.missing_dl_workers(), tracker.streak_workers())
+    elif candidates > 1:
+        # Best of N: try seeds [seed, seed + candidates) in parallel and keep the best
+        best_seed, score, best_schedule, iterations = generate_best_candidate(
+            group, year, month, range(seed, seed + candidates), engine, time_budget, deadline)
+        scheduler.load_month_schedule(best_schedule)
+        # The winning seed alone reproduces this schedule
+        seed = scheduler.set_seed(best_seed)
+        best = {'score': score, 'candidates': candidates}
+    else:
+        missing_dls, violations = scheduler.generate_schedule(engine, time_budget,
+                                                              progress=progress, deadline=deadline)
+        score = scheduler.score_schedule(missing_dls, violations)
+        if scheduler.search_stats:
+            iterations = scheduler.search_stats['iterations']
+        best = None
+
+    # Store the new schedule (a fresh generation replaces whatever was there)
+    schedule, version = save_scheduler(scheduler)
+    if not cached:
+        generation_cache.put(cache_key, {'schedule': schedule, 'seed': seed, 'best_of': best,
+                                         'score': score, 'iterations': iterations})
+    
+    # Add month information
+    month_data = {
+        'year': year,
+        'month': month,
+        'days_in_month': calendar.monthrange(year, month)[1],
+        'preview_days': 7
+    }
+    
+    response = {
+        'success': True,
+        'schedule': schedule,
+        'month_data': month_data,
+        'seed': seed,
+        'version': version,
+        'engine': engine,
+        'score': score
+    }
+    if engine == 'search':
+        response['iterations'] = iterations
+    if deadline_ms is not None:
+        response['elapsed_ms'] = round((time.monotonic() - started) * 1000)
+    if best:
+        response['best_of'] = best
+    return response
+
+@app.route('/api/generate', methods=['POST'])
+def generate():
+    """Generate a schedule (see generate_month_schedule)"""
+    try:
+        try:
+            args = read_generate_request(request.get_json())
+        except ValueError as e:
+            return error_response(e)
+        return jsonify(generate_month_schedule(**args))
+    except UnknownGroupError as e:
+        # The group was dropped from the staff config mid-request
+        return error_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+def read_generate_all_request(data):
+    """Read a generate-all request into keyword arguments for generate_all_schedules"""
+    seed = data.get('seed')
+    return {
+        'year': int(data.get('year', 2024)),
+        'month': int(data.get('month', 1)),
+        'seed': int(seed) if seed is not None else random.randrange(MAX_SEED)
+    }
+
+def generate_all_schedules(year, month, seed, progress=None):
+    """Generate and store every group's month, returning the generate-all response.
+
+    Groups run in parallel processes, so progress is called just once,
+    as progress('generated', {}) before anything is stored.
+    """
+    # Reuse cached groups and only generate the rest
+    groups = list(get_rosters())
+    generated = {}
+    cache_keys = {}
+    group_schedulers = {}
+    for group_name in groups:
+        scheduler = new_scheduler(group_name, year, month)
+        scheduler.set_seed(seed)
+        group_schedulers[group_name] = scheduler
+        cache_keys[group_name] = ScheduleCache.make_key(group_name, year, month, seed,
+                                                        scheduler.roster.fingerprint)
+        cached = generation_cache.get(cache_keys[group_name])
+        if cached:
+            generated[group_name] = cached['schedule']
+    
+    missing_groups = [group_name for group_name in groups if group_name not in generated]
+    if missing_groups:
+        # Each group runs its pipeline in its own process
+        generated.update(generate_all_groups(year, month, seed, groups=missing_groups))
+    
+    month_data = {
+        'year': year,
+        'month': month,
+        'days_in_month': calendar.monthrange(year, month)[1],
+        'preview_days': 7
+    }
+    if progress is not None:
+        progress('generated', {})
+    
+    result_data = {}
+    for group_name in groups:
+        scheduler = group_schedulers[group_name]
+        scheduler.load_month_schedule(generated[group_name])
         
-        # Update schedule state
-        schedule_state[group] = {
+        schedule, version = save_scheduler(scheduler)
+        if group_name in missing_groups:
+            generation_cache.put(cache_keys[group_name], {'schedule': schedule, 'seed': seed, 'best_of': None})
+        result_data[group_name] = {
             'schedule': schedule,
-            'year': year,
-            'month': month
-        }
-        
-        # Add month information
-        month_data = {
-            'year': year,
-            'month': month,
-            'days_in_month': calendar.monthrange(year, month)[1],
-            'preview_days': 7
+            'month_data': month_data,
+            'version': version
         }
-        
-        return jsonify({
-            'success': True,
-            'schedule': schedule,
-            'month_data': month_data
-        })
+    
+    return {
+        'success': True,
+        'schedules': result_data,
+        'seed': seed
+    }
+
+@app.route('/api/generate-all', methods=['POST'])
+def generate_all():
+    """Generate the schedules of every group for a month in one call"""
+    try:
+        try:
+            args = read_generate_all_request(request.get_json())
+        except ValueError as e:
+            return error_response(e)
+        return jsonify(generate_all_schedules(**args))
+    except UnknownGroupError as e:
+        return error_response(e)
     except Exception as e:
+        print(f"Error during generate-all: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
-        })
+        }), 500
 
 @app.route('/api/update-shift', methods=['POST'])
 def update_shift():
@@ -121,33 +566,26 @@ def update_shift():
         shift = data['shift']
         group = data.get('group', 'sala')
         
-        if group not in schedulers:
+        if group not in get_rosters():
             return jsonify({
                 'success': False,
                 'error': f'Invalid group: {group}'
             }), 400
 
-        scheduler = schedulers[group]
-        worker_index = scheduler.selected_workers.index(worker)
-
-        # Check for T->M violation
-        if day > 1:
-            prev_shift = scheduler.get_shift(worker_index, day - 1)
-            if prev_shift == 'T' and shift == 'M':
-                return jsonify({
-                    'success': False,
-                    'error': 'Cannot assign Morning shift after Tarde shift'
-                }), 400
+        scheduler, version = load_scheduler(group)
+        if scheduler is None:
+            return no_schedule_response(group)
+        # Clients may pin the version they last saw; otherwise guard against races since loading
+        expected_version = int(data.get('version', version))
+        worker_index = scheduler.get_worker_index(worker)
+        snapshot = scheduler.snapshot_grid()
 
-        # Add validation for removing DLs
-        if shift != 'DL' and scheduler.get_shift(worker_index, day) == 'DL':
-            dl_count = sum(1 for d in range(1, scheduler.days_in_month + 1)
-                         if d != day and scheduler.get_shift(worker_index, d) == 'DL')
-            if dl_count < 2:
-                return jsonify({
-                    'success': False,
-                    'error': 'Cannot remove DL - worker must have 2 DLs per month'
-                }), 400
+        error = validate_shift_edit(scheduler, worker_index, day, shift)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
 
         # Apply the shift
         scheduler.assign_shift(day, worker, shift)
@@ -157,20 +595,102 @@ def update_shift():
             scheduler.assign_free_sundays()  # Ensure DL requirements are met
             scheduler.assign_l_days()        # Ensure L day rules are met
         
-        # Get the updated schedule
-        schedule = scheduler.get_month_schedule()
+        # Store the updated schedule
+        schedule, version = save_scheduler(scheduler, expected_version)
         
-        # Update schedule state
-        schedule_state[group] = {
-            'schedule': schedule,
-            'year': scheduler.year,
-            'month': scheduler.month
+        # Only send what changed (the cell plus any DL/L fixes); full=true returns the whole schedule
+        changes, total_hours = scheduler.diff_grid(snapshot)
+        response = {
+            'success': True,
+            'changes': changes,
+            'total_hours': total_hours,
+            'version': version
         }
-        
+        if data.get('full'):
+            response['schedule'] = schedule
+        return jsonify(response)
+    except VersionConflict as e:
+        return conflict_response(e)
+    except (KeyError, TypeError, ValueError) as e:
+        # Missing fields, unknown workers, non-numeric or out-of-range days
         return jsonify({
+            'success': False,
+            'error': f'Invalid edit: {e}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/update-shifts', methods=['POST'])
+def update_shifts():
+    """Apply a batch of shift edits in one go.
+
+    Takes {'edits': [{'worker', 'day', 'shift'}, ...]}. Edits are checked
+    in order against the same rules as /api/update-shift, each one seeing
+    the edits before it; if any fails nothing is stored. DL/L fixes after
+    deletions run once for the whole batch.
+    """
+    try:
+        data = request.get_json()
+        edits = data.get('edits') or []
+        group = data.get('group', 'sala')
+        
+        if group not in get_rosters():
+            return jsonify({
+                'success': False,
+                'error': f'Invalid group: {group}'
+            }), 400
+
+        scheduler, version = load_scheduler(group)
+        if scheduler is None:
+            return no_schedule_response(group)
+        expected_version = int(data.get('version', version))
+        snapshot = scheduler.snapshot_grid()
+
+        deleted = False
+        for position, edit in enumerate(edits):
+            worker = edit['worker']
+            day = int(edit['day'])
+            shift = edit['shift']
+            worker_index = scheduler.get_worker_index(worker)
+
+            error = validate_shift_edit(scheduler, worker_index, day, shift)
+            if error:
+                return jsonify({
+                    'success': False,
+                    'error': f'{worker}, day {day}: {error}',
+                    'edit': position
+                }), 400
+
+            scheduler.assign_shift_at(day, worker_index, shift)
+            deleted = deleted or not shift
+
+        if deleted:
+            scheduler.assign_free_sundays()  # Ensure DL requirements are met
+            scheduler.assign_l_days()        # Ensure L day rules are met
+
+        schedule, version = save_scheduler(scheduler, expected_version)
+
+        changes, total_hours = scheduler.diff_grid(snapshot)
+        response = {
             'success': True,
-            'schedule': schedule
-        })
+            'changes': changes,
+            'total_hours': total_hours,
+            'version': version
+        }
+        if data.get('full'):
+            response['schedule'] = schedule
+        return jsonify(response)
+    except VersionConflict as e:
+        return conflict_response(e)
+    except (KeyError, TypeError, ValueError) as e:
+        # Missing fields, unknown workers, non-numeric or out-of-range days
+        return jsonify({
+            'success': False,
+            'error': f'Invalid edit: {e}'
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -182,23 +702,22 @@ def transfer():
     """Transfer preview data to next month for all groups"""
     try:
         current_group = request.get_json().get('group', 'sala')
-        main_scheduler = schedulers[current_group]
-        current_year = main_scheduler.year
-        current_month = main_scheduler.month
-        
-        # Calculate next month and year
-        next_month = current_month + 1 if current_month < 12 else 1
-        next_year = current_year + 1 if current_month == 12 else current_year
+        if schedule_store.get_active_month(current_group) is None:
+            return no_schedule_response(current_group)
         
         result_data = {}
         
-        # Transfer each group
-        for group_name in schedulers:
-            scheduler = schedulers[group_name]
+        # Transfer each group that has a schedule
+        for group_name in get_rosters():
+            scheduler, version = load_scheduler(group_name)
+            if scheduler is None:
+                continue
             scheduler.transfer_to_next_month()
+            next_year = scheduler.year
+            next_month = scheduler.month
             
-            # Store result for this group
-            schedule = scheduler.get_month_schedule()
+            # Store result for this group (this also makes the next month active)
+            schedule, version = save_scheduler(scheduler)
             result_data[group_name] = {
                 'schedule': schedule,
                 'month_data': {
@@ -206,14 +725,8 @@ def transfer():
                     'month': next_month,
                     'days_in_month': calendar.monthrange(next_year, next_month)[1],
                     'preview_days': 7
-                }
-            }
-            
-            # Update schedule state
-            schedule_state[group_name] = {
-                'schedule': schedule,
-                'year': next_year,
-                'month': next_month
+                },
+                'version': version
             }
 
         # Return all schedules but focus on the current group's data
@@ -231,77 +744,130 @@ def transfer():
             'error': str(e)
         }), 500
 
+def complete_group(group_name, year, month, seed, engine='greedy', time_budget_ms=None, progress=None):
+    """Regenerate a group's transferred month around its preview week.
+
+    progress, if given, receives SchedulerCore progress events as
+    progress(phase, info). Returns the group's entry of the
+    complete-generate response.
+    """
+    scheduler, version = load_scheduler(group_name, year, month)
+    print(f"Processing complete generation for group: {group_name}")
+    
+    # Store preview week data temporarily
+    preview_data = {}
+    for worker_index, worker in enumerate(scheduler.selected_workers):
+        worker_shifts = {}
+        for day in range(1, 8):
+            shift = scheduler.get_shift(worker_index, day)
+            if shift:
+                worker_shifts[day] = shift
+        preview_data[worker] = worker_shifts
+    
+    # Reinitialize schedule
+    scheduler.initialize_month(year, month)
+    
+    # Restore preview week
+    for worker, shifts in preview_data.items():
+        for day, shift in shifts.items():
+            scheduler.assign_shift(day, worker, shift)
+    
+    # Generate the rest of the schedule
+    scheduler.set_seed(seed)
+    cache_key = ScheduleCache.make_key(group_name, year, month, seed,
+                                       scheduler.roster.fingerprint,
+                                       preview=scheduler.get_preview_week(),
+                                       engine=engine, time_budget_ms=time_budget_ms)
+    cached = generation_cache.get(cache_key)
+    if cached:
+        scheduler.load_month_schedule(cached['schedule'])
+    else:
+        scheduler.complete_schedule(engine, time_budget_ms / 1000 if time_budget_ms else None,
+                                    progress=progress)
+    
+    # Store the updated schedule
+    schedule, version = save_scheduler(scheduler)
+    if not cached:
+        generation_cache.put(cache_key, {'schedule': schedule, 'seed': seed, 'best_of': None})
+    
+    print(f"Generation completed for {group_name} - Year: {year}, Month: {month}")
+    return {
+        'schedule': schedule,
+        'month_data': {
+            'year': year,
+            'month': month,
+            'days_in_month': calendar.monthrange(year, month)[1],
+            'preview_days': 7
+        },
+        'version': version
+    }
+
+def complete_all_groups(current_group, year, month, seed, engine='greedy', time_budget_ms=None,
+                        progress=None):
+    """Run complete_group for every group and build the complete-generate response.
+
+    progress, if given, is called as progress(event) with dicts holding
+    the group and phase plus the phase's details (see SchedulerCore._run_phases),
+    and a 'stored' phase with the version once a group is saved.
+    """
+    print(f"Completing generation for {year}-{month}")
+    result_data = {}
+    for group_name in get_rosters():
+        group_progress = None
+        if progress is not None:
+            group_progress = lambda phase, info, group_name=group_name: progress(
+                dict(info, group=group_name, phase=phase))
+        result_data[group_name] = complete_group(group_name, year, month, seed, engine, time_budget_ms,
+                                                 group_progress)
+        if progress is not None:
+            progress({'group': group_name, 'phase': 'stored', 'version': result_data[group_name]['version']})
+
+    # Return all schedules but focus on the current group's data
+    return {
+        'success': True,
+        'schedule': result_data[current_group]['schedule'],
+        'month_data': result_data[current_group]['month_data'],
+        'all_schedules': result_data,
+        'seed': seed
+    }
+
+def read_complete_request(data):
+    """Read a complete-generate request into keyword arguments for complete_all_groups.
+
+    The month is the current group's active one. Raises ValueError with a
+    message for the client, or RequestError if the group has no schedule.
+    """
+    current_group = data.get('group', 'sala')
+    engine, time_budget_ms = read_engine_options(data)
+    active_month = schedule_store.get_active_month(current_group)
+    if active_month is None:
+        raise no_schedule_error(current_group)
+    # Every group is generated from the same seed
+    seed = data.get('seed')
+    seed = int(seed) if seed is not None else random.randrange(MAX_SEED)
+    year, month = active_month
+    return {
+        'current_group': current_group,
+        'year': year,
+        'month': month,
+        'seed': seed,
+        'engine': engine,
+        'time_budget_ms': time_budget_ms
+    }
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/api/complete-generate', methods=['POST'])
 def complete_generate():
     """Complete and generate schedule after transfer for all groups"""
     try:
-        current_group = request.get_json().get('group', 'sala')
-        main_scheduler = schedulers[current_group]
-        current_year = main_scheduler.year
-        current_month = main_scheduler.month
-        
-        print(f"Completing generation for {current_year}-{current_month}")
-        result_data = {}
-        
-        # Process each group
-        for group_name in schedulers:
-            scheduler = schedulers[group_name]
-            print(f"Processing complete generation for group: {group_name}")
-            
-            # Store preview week data temporarily
-            preview_data = {}
-            for worker_index, worker in enumerate(scheduler.selected_workers):
-                worker_shifts = {}
-                for day in range(1, 8):
-                    shift = scheduler.get_shift(worker_index, day)
-                    if shift:
-                        worker_shifts[day] = shift
-                preview_data[worker] = worker_shifts
-            
-            # Reinitialize schedule
-            scheduler.initialize_month(current_year, current_month)
-            
-            # Restore preview week
-            for worker, shifts in preview_data.items():
-                for day, shift in shifts.items():
-                    scheduler.assign_shift(day, worker, shift)
-            
-            # Generate the rest of the schedule
-            scheduler.assign_night_shifts_after_transfer()
-            scheduler.assign_free_sundays()
-            scheduler.assign_l_days()
-            scheduler.assign_dayshifts()
-            
-            # Get the updated schedule
-            schedule = scheduler.get_month_schedule()
-            
-            # Store result for this group
-            result_data[group_name] = {
-                'schedule': schedule,
-                'month_data': {
-                    'year': current_year,
-                    'month': current_month,
-                    'days_in_month': calendar.monthrange(current_year, current_month)[1],
-                    'preview_days': 7
-                }
-            }
-            
-            # Update schedule state
-            schedule_state[group_name] = {
-                'schedule': schedule,
-                'year': current_year,
-                'month': current_month
-            }
-            
-            print(f"Generation completed for {group_name} - Year: {current_year}, Month: {current_month}")
-
-        # Return all schedules but focus on the current group's data
-        return jsonify({
-            'success': True,
-            'schedule': result_data[current_group]['schedule'],
-            'month_data': result_data[current_group]['month_data'],
-            'all_schedules': result_data
-        })
+        try:
+            args = read_complete_request(request.get_json())
+        except ValueError as e:
+            return error_response(e)
+        return jsonify(complete_all_groups(**args))
         
     except Exception as e:
         print(f"Error during complete generation: {str(e)}")
@@ -309,38 +875,124 @@ def complete_generate():
             'success': False,
             'error': str(e)
         }), 500
+
+@app.route('/api/complete-generate/stream', methods=['GET', 'POST'])
+def complete_generate_stream():
+    """complete-generate as a Server-Sent Events stream.
+
+    Takes the same parameters (as JSON or query string, since EventSource
+    can only GET). Sends a 'progress' event per group and phase, then
+    'done' with the complete-generate response or 'error'. At most
+    MAX_STREAMS streams hold a slot at once; beyond that the request gets
+    429. Generation only starts once the client reads the stream and stops
+    at its next progress event after the client disconnects.
+    """
+    try:
+        args = read_complete_request(request.get_json(silent=True) or request.args)
+    except ValueError as e:
+        return error_response(e)
+
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({
+            'success': False,
+            'error': f'{MAX_STREAMS} generation streams are already running; try again later'
+        }), 429
+
+    events = queue.Queue()
+    disconnected = threading.Event()
+    slot_lock = threading.Lock()
+    slot_held = [True]
+
+    def release_slot():
+        # Called by the stream once generation has stopped, and again when the
+        # response closes in case the stream was never read
+        with slot_lock:
+            if slot_held[0]:
+                slot_held[0] = False
+                stream_slots.release()
+
+    def progress(event):
+        if disconnected.is_set():
+            raise JobCancelled("Stream client disconnected")
+        events.put(('progress', event))
+
+    def run():
+        try:
+            events.put(('done', complete_all_groups(**args, progress=progress)))
+        except JobCancelled:
+            print("Complete generation stream stopped: client disconnected")
+        except Exception as e:
+            print(f"Error during complete generation: {str(e)}")
+            events.put(('error', {'success': False, 'error': str(e)}))
+        finally:
+            events.put(None)
+
+    def stream():
+        # Generation starts once the client reads and runs on its own thread,
+        # so events go out as they happen
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = events.get()
+                if item is None:
+                    return
+                yield sse_event(*item)
+        finally:
+            # On GeneratorExit (the client went away) the generation stops at
+            # its next progress event; the slot is free once it has
+            disconnected.set()
+            worker.join()
+            release_slot()
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release_slot)
+    return response
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Return hit/miss counters of the generation and tracker caches"""
+    return jsonify({
+        'success': True,
+        'cache': generation_cache.stats(),
+        'tracker_cache': tracker_cache.stats()
+    })
+
 @app.route('/api/verify-schedule', methods=['GET'])
 def verify_schedule():
     """Verify schedule integrity"""
     group = request.args.get('group', 'sala')
     
-    if group not in schedulers:
+    if group not in get_rosters():
         return jsonify({
             'success': False,
             'error': f'Invalid group: {group}'
         }), 400
 
-    scheduler = schedulers[group]
-    violations = []
-    
-    for worker_index, worker in enumerate(scheduler.selected_workers):
-        for day in range(2, scheduler.days_in_month + scheduler.preview_days + 1):
-            current_shift = scheduler.get_shift(worker_index, day)
-            prev_shift = scheduler.get_shift(worker_index, day - 1)
-            
-            if prev_shift == 'T' and current_shift == 'M':
-                violations.append({
-                    'worker': worker,
-                    'day': day,
-                    'error': 'M shift after T shift',
-                    'prev_shift': prev_shift,
-                    'current_shift': current_shift
-                })
+    scheduler, version = load_checked_scheduler(group)
+    if scheduler is None:
+        return no_schedule_response(group)
+    constraints = scheduler.constraints()
+    workers = scheduler.selected_workers
+    violations = [{
+        'worker': workers[worker_index],
+        'day': day,
+        'error': 'M shift after T shift',
+        'prev_shift': 'T',
+        'current_shift': 'M'
+    } for worker_index, day in constraints.t_to_m_violations()]
+    streak_violations = [{
+        'worker': workers[worker_index],
+        'start_day': start,
+        'days': length
+    } for worker_index, start, length in constraints.streak_violations()]
     
     return jsonify({
         'success': True,
         'violations': violations,
-        'total_violations': len(violations)
+        'total_violations': len(violations),
+        'streak_violations': streak_violations
     })
 
 @app.route('/api/verify-dl-counts', methods=['GET'])
@@ -348,46 +1000,34 @@ def verify_dl_counts():
     """Verify DL counts for each worker in the current month"""
     try:
         group = request.args.get('group', 'sala')
-        if group not in schedulers:
+        if group not in get_rosters():
             return jsonify({
                 'success': False,
                 'error': f'Invalid group: {group}'
             }), 400
 
-        scheduler = schedulers[group]
+        scheduler, version = load_checked_scheduler(group)
+        if scheduler is None:
+            return no_schedule_response(group)
         
-        # Get current month's Sundays
-        sundays = []
-        for day in range(1, scheduler.days_in_month + 1):
-            if calendar.weekday(scheduler.year, scheduler.month, day) == 6:  # 6 is Sunday
-                sundays.append(day)
+        constraints = scheduler.constraints()
+        missing_dls = set(constraints.missing_dl_workers())
         
         # Count DLs for each worker
         dl_status = []
-        for worker_index, worker in enumerate(scheduler.selected_workers):
-            # Skip part-time workers in DL verification
-            if scheduler.is_part_time(worker):
-                continue
-                
-            dl_count = 0
-            dl_days = []
-            
-            for sunday in sundays:
-                if scheduler.get_shift(worker_index, sunday) == "DL":
-                    dl_count += 1
-                    dl_days.append(sunday)
-            
+        for worker_index in scheduler.roster.full_time_indices:  # Part-time workers have no DLs
+            dl_days = constraints.sunday_dl_days(worker_index)
             dl_status.append({
-                'worker': worker,
-                'dl_count': dl_count,
+                'worker': scheduler.selected_workers[worker_index],
+                'dl_count': len(dl_days),
                 'dl_days': dl_days,
-                'needs_more': dl_count < 2
+                'needs_more': worker_index in missing_dls
             })
         
         return jsonify({
             'success': True,
             'dl_status': dl_status,
-            'month_sundays': sundays
+            'month_sundays': sorted(constraints.sundays)
         })
     except Exception as e:
         return jsonify({
@@ -395,196 +1035,132 @@ def verify_dl_counts():
             'error': str(e)
         }), 500
 
-def get_column_letter(n):
-    """Convert number to Excel column letter (1='A', 27='AA', etc.)"""
-    string = ""
-    while n > 0:
-        n, remainder = divmod(n - 1, 26)
-        string = chr(65 + remainder) + string
-    return string
+def read_export_sheets(data):
+    """Read which stored schedules an export request covers.
+
+    Returns (months, sheets): the months the export is named after and
+    the (group, year, month) of every schedule to include, in order.
+    Without a range (see read_export_months) that's each group's active
+    month, named after the first group's (sala's), and months is None if
+    that group has none. Raises ValueError with a message for the client.
+    """
+    groups = list(get_rosters())
+    months = read_export_months(data)
+    if months is not None:
+        return months, [(group_name, year, month) for year, month in months for group_name in groups]
+
+    # Get current month data from the active group
+    active_months = {group_name: schedule_store.get_active_month(group_name) for group_name in groups}
+    if not groups or active_months[groups[0]] is None:
+        return None, []
+    # Each group's sheet shows the month that group is working on
+    return [active_months[groups[0]]], [(group_name,) + active_month
+                                        for group_name, active_month in active_months.items()
+                                        if active_month is not None]
+
+def read_export_request(data):
+    """Read an export request into keyword arguments for build_excel_export.
+
+    Raises ValueError with a message for the client, or RequestError if
+    there's no active month to export.
+    """
+    months, sheets = read_export_sheets(data)
+    if months is None:
+        raise no_schedule_error('sala')
+    return {'months': months, 'sheets': sheets}
+
+def no_export_error(months):
+    """RequestError for an export range without any stored schedule"""
+    return RequestError(f'No stored schedules from {months[0][0]}-{months[0][1]:02d}'
+                        f' to {months[-1][0]}-{months[-1][1]:02d}')
+
+# A built export: the file's chunks, mimetype, download name and size (None if streamed as written)
+ExportFile = namedtuple('ExportFile', ['chunks', 'mimetype', 'filename', 'size'])
+
+def file_response(export):
+    """Stream an ExportFile as a download"""
+    headers = {'Content-Disposition': f'attachment; filename={export.filename}'}
+    if export.size is not None:
+        headers['Content-Length'] = str(export.size)
+    return Response(export.chunks, mimetype=export.mimetype, headers=headers)
+
+def render_export_sheet(writer, group, year, month):
+    """Load a group's stored month and render it for writer; None if nothing is stored"""
+    scheduler, version = load_scheduler(group, year, month)
+    if not version:
+        return None
+    return writer.render_sheet(year, month, scheduler.get_month_schedule())
+
+def render_export_sheets(writer, sheets):
+    """Yield ((group, year, month), rendered rows or None) for each sheet, in order.
+
+    Sheets are rendered on a thread pool, at most EXPORT_RENDER_WORKERS
+    ahead of the one being written, so a long export never holds more
+    than that many rendered sheets at once.
+    """
+    with ThreadPoolExecutor(max_workers=EXPORT_RENDER_WORKERS) as executor:
+        pending = deque()
+        for sheet in sheets:
+            pending.append((sheet, executor.submit(render_export_sheet, writer, *sheet)))
+            if len(pending) > EXPORT_RENDER_WORKERS:
+                sheet, future = pending.popleft()
+                yield sheet, future.result()
+        while pending:
+            sheet, future = pending.popleft()
+            yield sheet, future.result()
+
+def build_excel_export(months, sheets, progress=None):
+    """Build an Excel workbook of the stored schedules in sheets (see read_export_sheets).
+
+    Returns an ExportFile streamed from a spooled temp file. progress is
+    called after each sheet is written. Raises RequestError if none of the
+    sheets has a stored schedule.
+    """
+    single_month = len(months) == 1
+
+    print(f"Exporting schedules for {months[0]} to {months[-1]}")
+    writer = ScheduleExcelWriter()
+    names = group_names()
+
+    # Sheets are laid out a few ahead and written in order (the
+    # write-only workbook takes one sheet at a time)
+    written = 0
+    for (group_name, year, month), sheet_rows in render_export_sheets(writer, sheets):
+        if sheet_rows is None:  # Skip if no schedule exists
+            continue
+        title = names.get(group_name, group_name)
+        if not single_month:
+            title = sheet_title(title, year, month)
+        print(f"Writing sheet: {title}")
+        writer.write_sheet(title, sheet_rows)
+        written += 1
+        if progress is not None:
+            progress('sheet', {'title': title})
+
+    if not written:
+        raise no_export_error(months)
+
+    # Stream the file from a spooled temp file rather than one in-memory buffer
+    excel_file, size = writer.spool()
+    return ExportFile(FileChunks(excel_file), EXCEL_MIMETYPE,
+                      export_filename(*months[0], last=months[-1]), size)
 
 @app.route('/api/export-excel', methods=['POST'])
 def export_excel():
+    """Export schedules as an Excel workbook.
+
+    Without a range this is the active month with one sheet per group.
+    With 'year', or 'start'/'end' as YYYY-MM, every stored (group, month)
+    in the range gets its own sheet, in month order.
+    """
     try:
-        wb = Workbook()
-        
-        # Get current month data from the active group
-        primary_state = schedule_state['sala']
-        year = primary_state['year']
-        month = primary_state['month']
-        
-        print(f"Exporting schedule for year: {year}, month: {month}")
-        days_in_current_month = calendar.monthrange(year, month)[1]
-        
-        next_month = month + 1 if month < 12 else 1
-        next_year = year + 1 if month == 12 else year
-        
-        month_names = ["January", "February", "March", "April", "May", "June",
-                      "July", "August", "September", "October", "November", "December"]
-        
-        # Create worksheets for each group
-        for group_name in ['sala', 'cocina', 'coperia']:
-            # Use the stored state for this group
-            group_state = schedule_state[group_name]
-            if not group_state['schedule']:  # Skip if no schedule exists
-                continue
-                
-            print(f"\nProcessing group: {group_name}")
-            
-            if group_name == 'sala':
-                ws = wb.active
-                ws.title = 'Personal de Sala'
-            else:
-                ws = wb.create_sheet(title=GROUP_NAMES.get(group_name, group_name))
-            
-            # Calculate last column (days + worker name + separator + 7 preview days + hours column)
-            last_col = get_column_letter(days_in_current_month + 9)
-            
-            # Set column widths
-            for col in range(1, days_in_current_month + 10):
-                col_letter = get_column_letter(col)
-                ws.column_dimensions[col_letter].width = 4
-            ws.column_dimensions['A'].width = 12
-            
-            # Set the title
-            ws.merge_cells(f'A1:{last_col}1')
-            ws['A1'] = f"{month_names[month-1]} {year}"
-            ws['A1'].font = Font(bold=True, size=14)
-            ws['A1'].alignment = Alignment(horizontal='center')
-            
-            # Set up styles
-            thin_border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            
-            shift_colors = {
-                'N': 'D3D3D3',
-                'LN': 'D3D3D3',
-                '10N': 'D3D3D3',
-                '10LN': 'D3D3D3',
-                'L': 'FFFF99',
-                'SL': 'FFFF99',
-                'DL': '90EE90',
-                'M': 'ADD8E6',
-                'M4': 'ADD8E6',
-                'T': 'FFA07A',
-                '2T': 'FFA07A',
-                'I': 'E6E6FA'
-            }
-            
-            days = ['D', 'L', 'M', 'X', 'J', 'V', 'S']
-            
-            # Write headers
-            ws.merge_cells('A2:A3')
-            ws['A2'] = 'Workers'
-            ws['A2'].font = Font(bold=True)
-            ws['A2'].alignment = Alignment(horizontal='center', vertical='center')
-            ws['A2'].border = thin_border
-            
-            # Write days for current month
-            for day in range(1, days_in_current_month + 1):
-                col = get_column_letter(day + 1)
-                date = datetime(year, month, day)
-                day_name = days[date.weekday()]
-                ws[f'{col}2'] = day_name
-                ws[f'{col}3'] = day
-                ws[f'{col}2'].font = Font(bold=True)
-                ws[f'{col}3'].font = Font(bold=True)
-                ws[f'{col}2'].alignment = Alignment(horizontal='center')
-                ws[f'{col}3'].alignment = Alignment(horizontal='center')
-                ws[f'{col}2'].border = thin_border
-                ws[f'{col}3'].border = thin_border
-            
-            # Add separator
-            separator_col = get_column_letter(days_in_current_month + 2)
-            ws[f'{separator_col}2'] = '║'
-            ws[f'{separator_col}3'] = '║'
-            ws[f'{separator_col}2'].border = thin_border
-            ws[f'{separator_col}3'].border = thin_border
-            
-            # Write preview days (first 7 days of next month)
-            for day in range(1, 8):
-                col = get_column_letter(days_in_current_month + 2 + day)
-                date = datetime(next_year, next_month, day)
-                day_name = days[date.weekday()]
-                ws[f'{col}2'] = day_name
-                ws[f'{col}3'] = day
-                ws[f'{col}2'].font = Font(bold=True)
-                ws[f'{col}3'].font = Font(bold=True)
-                ws[f'{col}2'].alignment = Alignment(horizontal='center')
-                ws[f'{col}3'].alignment = Alignment(horizontal='center')
-                ws[f'{col}2'].border = thin_border
-                ws[f'{col}3'].border = thin_border
-            
-            # Hours column
-            hours_col = get_column_letter(days_in_current_month + 10)
-            ws[f'{hours_col}2'] = 'Total'
-            ws[f'{hours_col}3'] = 'Hours'
-            ws[f'{hours_col}2'].font = Font(bold=True)
-            ws[f'{hours_col}3'].font = Font(bold=True)
-            ws[f'{hours_col}2'].border = thin_border
-            ws[f'{hours_col}3'].border = thin_border
-            
-            # Write schedule data from stored state
-            schedule = group_state['schedule']
-            print(f"Writing schedule for {len(schedule)} workers")
-            
-            for idx, worker in enumerate(schedule):
-                row = idx + 4
-                
-                # Worker name
-                ws[f'A{row}'] = worker['name']
-                ws[f'A{row}'].font = Font(bold=True)
-                ws[f'A{row}'].border = thin_border
-                
-                # Write shifts for current month
-                for day in range(1, days_in_current_month + 1):
-                    col = get_column_letter(day + 1)
-                    shift = worker['shifts'].get(day, '')
-                    ws[f'{col}{row}'] = shift
-                    ws[f'{col}{row}'].border = thin_border
-                    if shift in shift_colors:
-                        ws[f'{col}{row}'].fill = PatternFill(start_color=shift_colors[shift],
-                                                            end_color=shift_colors[shift],
-                                                            fill_type='solid')
-                    ws[f'{col}{row}'].alignment = Alignment(horizontal='center')
-                
-                # Write separator
-                ws[f'{separator_col}{row}'] = '║'
-                ws[f'{separator_col}{row}'].border = thin_border
-                
-                # Write preview days
-                for day in range(1, 8):
-                    col = get_column_letter(days_in_current_month + 2 + day)
-                    actual_day = days_in_current_month + day
-                    shift = worker['shifts'].get(actual_day, '')
-                    ws[f'{col}{row}'] = shift
-                    ws[f'{col}{row}'].border = thin_border
-                    if shift in shift_colors:
-                        ws[f'{col}{row}'].fill = PatternFill(start_color=shift_colors[shift],
-                                                            end_color=shift_colors[shift],
-                                                            fill_type='solid')
-                    ws[f'{col}{row}'].alignment = Alignment(horizontal='center')
-                
-                # Write total hours
-                ws[f'{hours_col}{row}'] = worker['total_hours']
-                ws[f'{hours_col}{row}'].border = thin_border
-                ws[f'{hours_col}{row}'].alignment = Alignment(horizontal='center')
-        
-        # Save to memory buffer
-        excel_file = io.BytesIO()
-        wb.save(excel_file)
-        excel_file.seek(0)
-        
-        return send_file(
-            excel_file,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=f'schedule_{month_names[month-1]}_{year}.xlsx'
-        )
+        try:
+            args = read_export_request(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return error_response(e)
+        return file_response(build_excel_export(**args))
+    except RequestError as e:
+        return error_response(e)
         
     except Exception as e:
         print(f"Error during export: {str(e)}")
@@ -592,6 +1168,7 @@ def export_excel():
             'success': False,
             'error': str(e)
         }), 500
+
 @app.route('/api/import-excel', methods=['POST'])
 def import_excel():
     try:
@@ -603,100 +1180,70 @@ def import_excel():
             return jsonify({'success': False, 'error': 'Invalid file format. Please upload an Excel file'}), 400
             
         # Load workbook
-        wb = load_workbook(file)
+        wb = open_schedule_workbook(file)
         
+        imported = []
         result_data = {}
         
-        print("\nStarting Excel import...")
-        # Process each worksheet (group)
-        for group_name in ['sala', 'cocina', 'coperia']:
-            print(f"\nProcessing group: {group_name}")
+        try:
+            print("\nStarting Excel import...")
             print(f"Available worksheets in Excel: {wb.sheetnames}")
-            ws = None
-            worksheet_name = GROUP_NAMES[group_name]
-            print(f"Looking for worksheet: {worksheet_name}")
+            # Sheets are named after a group, with a YYYY-MM suffix in multi-month exports
+            groups_by_name = {name: group_name for group_name, name in group_names().items()}
+            sheets = [(groups_by_name[sheet_group_name(worksheet_name)], worksheet_name)
+                      for worksheet_name in wb.sheetnames if sheet_group_name(worksheet_name) in groups_by_name]
+            if not sheets:
+                return jsonify({
+                    'success': False,
+                    'error': f'No schedule sheets found; expected sheets named '
+                             f'{", ".join(groups_by_name)} (optionally followed by YYYY-MM)'
+                }), 400
+
+            # Process each worksheet (group month), in workbook order so each group
+            # ends up on its last month
+            for group_name, worksheet_name in sheets:
+                print(f"\nProcessing group: {group_name}, worksheet: {worksheet_name}")
             
-            try:
-                ws = wb[worksheet_name]
-                print(f"Successfully found worksheet: {worksheet_name}")
-                
-                # Extract month and year from title first
-                title = ws['A1'].value
-                month_year = title.split()
-                month = month_year[0]
-                year = int(month_year[1])
-                
-                # Convert month name to number
-                month_names = ["January", "February", "March", "April", "May", "June",
-                              "July", "August", "September", "October", "November", "December"]
-                month_num = month_names.index(month) + 1
-                
-                # Print first few cells to verify content
-                for row in range(4, 7):  # Print first few workers
-                    worker_name = ws.cell(row=row, column=1).value
-                    first_shifts = [ws.cell(row=row, column=col).value for col in range(2, 6)]
-                    print(f"Worker: {worker_name}, First shifts: {first_shifts}")
-
-                # Initialize scheduler with extracted month/year
-                scheduler = schedulers[group_name]
-                scheduler.initialize_month(year, month_num)
-                scheduler.set_current_group(group_name)
-                
-                # Get the separator column position (where '║' is)
-                separator_col = None
-                for col in range(1, ws.max_column + 1):
-                    if ws.cell(row=2, column=col).value == '║':
-                        separator_col = col
-                        break
+                try:
+                    sheet = read_schedule_sheet(wb[worksheet_name])
                 
-                # Read schedule data
-                for row in range(4, ws.max_row + 1):
-                    worker_name = ws.cell(row=row, column=1).value
-                    if not worker_name or worker_name in ['Morning:', 'Afternoon:', 'Night:']:
-                        break
-                        
-                    if worker_name not in scheduler.selected_workers:
-                        continue
-                        
-                    # Read main month shifts
-                    for day in range(1, scheduler.days_in_month + 1):
-                        col = day + 1  # +1 because first column is worker names
-                        cell_value = ws.cell(row=row, column=col).value
-                        if cell_value:
-                            scheduler.assign_shift(day, worker_name, cell_value)
-                    
-                    # Read preview days
-                    if separator_col:
-                        for day in range(1, 8):  # 7 preview days
-                            preview_col = separator_col + day
-                            cell_value = ws.cell(row=row, column=preview_col).value
-                            if cell_value and isinstance(cell_value, str):
-                                actual_day = scheduler.days_in_month + day
-                                scheduler.assign_shift(actual_day, worker_name, cell_value)
+                    # Load every worker row into a fresh scheduler in one go
+                    scheduler = new_scheduler(group_name, sheet.year, sheet.month)
+                    preview_start = scheduler.days_in_month + 1
+                    rows = []
+                    for worker_name, shifts, preview in sheet.workers:
+                        rows.append((worker_name, 1, shifts))
+                        # Preview cells only count when they hold a shift code
+                        rows.append((worker_name, preview_start,
+                                     [shift if isinstance(shift, str) else None for shift in preview]))
+                    scheduler.load_shift_rows(rows)
                 
-                # Store result for this group
-                result_data[group_name] = {
-                    'schedule': scheduler.get_month_schedule(),
-                    'month_data': {
-                        'year': year,
-                        'month': month_num,
-                        'days_in_month': calendar.monthrange(year, month_num)[1],
-                        'preview_days': 7
+                    # Store result for this group
+                    schedule, version = save_scheduler(scheduler)
+                    imported.append({'group': group_name, 'year': sheet.year, 'month': sheet.month,
+                                     'version': version})
+                    result_data[group_name] = {
+                        'schedule': schedule,
+                        'month_data': {
+                            'year': sheet.year,
+                            'month': sheet.month,
+                            'days_in_month': scheduler.days_in_month,
+                            'preview_days': 7
+                        },
+                        'version': version
                     }
-                }
-                print(f"Stored schedule for {group_name}:")  # Debug print
-                # Print first worker's shifts
-                if scheduler.get_month_schedule():
-                    first_worker = scheduler.get_month_schedule()[0]
-                    print(f"First worker: {first_worker['name']}, first shifts: {[first_worker['shifts'].get(d) for d in range(1,5)]}")
+                    print(f"Stored schedule for {group_name}: {len(sheet.workers)} worker rows")
                 
-            except Exception as e:
-                print(f"Error with worksheet {worksheet_name}: {str(e)}")
-                continue
+                except Exception as e:
+                    print(f"Error with worksheet {worksheet_name}: {str(e)}")
+                    continue
+        finally:
+            wb.close()
         
         # Return all schedules
         return jsonify({
             'success': True,
+            'imported': imported,
             'schedules': result_data,
             'current_group': request.args.get('group', 'sala')
         })
@@ -707,5 +1254,284 @@ def import_excel():
             'error': str(e)
         }), 500
     
+def read_table_export_request(data):
+    """Read an export-table request into keyword arguments for build_table_export"""
+    table_format = data.get('format', 'csv')
+    check_table_format(table_format)
+    return dict(read_export_request(data), table_format=table_format)
+
+def build_table_export(table_format, months, sheets, progress=None):
+    """Build a long-form table (see schedule_table) of the stored schedules in sheets.
+
+    CSV is streamed as it's written; Parquet and Arrow are written batch
+    by batch to a spooled temp file. progress is called after each
+    schedule is loaded. Raises RequestError if none is stored.
+    """
+    print(f"Exporting {table_format} table for {months[0]} to {months[-1]}")
+    schedules = []
+    for group_name, year, month in sheets:
+        scheduler, version = load_scheduler(group_name, year, month)
+        if version:  # Skip if no schedule exists
+            schedules.append((group_name, year, month, scheduler.get_month_schedule()))
+        if progress is not None:
+            progress('schedule', {'group': group_name, 'year': year, 'month': month})
+    if not schedules:
+        raise no_export_error(months)
+
+    rows = (row for schedule in schedules for row in iter_schedule_rows(*schedule))
+    mimetype = TABLE_FORMATS[table_format][0]
+    filename = table_filename(table_format, *months[0], last=months[-1])
+    if table_format == 'csv':
+        return ExportFile(iter_csv_chunks(rows), mimetype, filename, None)
+    table_file, size = spool_columnar(rows, table_format)
+    return ExportFile(FileChunks(table_file), mimetype, filename, size)
+
+@app.route('/api/export-table', methods=['POST'])
+def export_table():
+    """Export schedules as a long-form table.
+
+    Takes 'format' (csv, parquet or arrow, csv by default) and the same
+    month range as /api/export-excel (see build_table_export).
+    """
+    try:
+        try:
+            args = read_table_export_request(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return error_response(e)
+        return file_response(build_table_export(**args))
+    except RequestError as e:
+        return error_response(e)
+
+    except Exception as e:
+        print(f"Error during table export: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/import-table', methods=['POST'])
+def import_table():
+    """Import a long-form table written by /api/export-table.
+
+    The format comes from the 'format' form field or else the file's
+    extension. Every (group, month) in the table replaces the stored
+    schedule. Its preview week comes from the next month's first days
+    when the table has that month, and is kept from the stored schedule
+    otherwise. Rows of unknown workers are skipped, as in the Excel import.
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+
+        file = request.files['file']
+        table_format = request.form.get('format') or table_format_of(file.filename)
+        try:
+            if table_format is None:
+                raise ValueError(f'Unknown table format; use a file ending in '
+                                 f'{", ".join("." + extension for _, extension in TABLE_FORMATS.values())}')
+            check_table_format(table_format)
+
+            # (group, year, month) -> worker -> day -> shift
+            months = {}
+            if table_format == 'csv':
+                table_rows = iter_csv_rows(file.stream)
+            else:
+                table_rows = iter_columnar_rows(file.stream, table_format)
+            for group_name, year, month, worker, day, shift in table_rows:
+                if group_name not in get_rosters():
+                    raise TableFormatError(f'Unknown group: {group_name}')
+                if shift:
+                    months.setdefault((group_name, year, month), {}).setdefault(worker, {})[day] = shift
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if not months:
+            return jsonify({'success': False, 'error': 'The table has no shifts'}), 400
+
+        print(f"\nImporting {table_format} table: {len(months)} group months")
+        imported = []
+        result_data = {}
+        # Months in order, so each group ends up on the last month it has in the table
+        for group_name, year, month in sorted(months):
+            scheduler = new_scheduler(group_name, year, month)
+            rows = [(worker, day, (shift,))
+                    for worker, shifts in months[(group_name, year, month)].items()
+                    for day, shift in shifts.items()]
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            if (group_name, next_year, next_month) in months:
+                # The next month's first days are the preview week
+                for worker, shifts in months[(group_name, next_year, next_month)].items():
+                    rows.extend((worker, scheduler.days_in_month + day, (shift,))
+                                for day, shift in shifts.items() if day <= scheduler.preview_days)
+            else:
+                # Tables don't carry preview days, so keep the stored preview week
+                record = schedule_store.load(group_name, year, month)
+                for worker_schedule in record['schedule'] if record else ():
+                    rows.extend((worker_schedule['name'], int(day), (shift,))
+                                for day, shift in worker_schedule['shifts'].items()
+                                if int(day) > scheduler.days_in_month)
+            scheduler.load_shift_rows(rows)
+
+            schedule, version = save_scheduler(scheduler)
+            imported.append({'group': group_name, 'year': year, 'month': month, 'version': version})
+            result_data[group_name] = {
+                'schedule': schedule,
+                'month_data': {
+                    'year': year,
+                    'month': month,
+                    'days_in_month': scheduler.days_in_month,
+                    'preview_days': scheduler.preview_days
+                },
+                'version': version
+            }
+            print(f"Stored schedule for {group_name} {year}-{month:02d}")
+
+        return jsonify({
+            'success': True,
+            'imported': imported,
+            'schedules': result_data,
+            'current_group': request.args.get('group', 'sala')
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Requests that can run as jobs: type -> (request reader, function run with what it
+# reads, whether the job works on one group)
+JOB_TYPES = {
+    'generate': (read_generate_request, generate_month_schedule, True),
+    'generate-all': (read_generate_all_request, generate_all_schedules, False),
+    'complete-generate': (read_complete_request, complete_all_groups, False),
+    'export-excel': (read_export_request, build_excel_export, False),
+    'export-table': (read_table_export_request, build_table_export, False)
+}
+
+def run_job(job, fn, args):
+    """Run fn(**args) as a job and return its response for the job store.
+
+    fn gets a progress callback that stops it once the job is cancelled.
+    Errors the client caused are stored as the 400 response the request
+    would have got; anything else fails the job.
+    """
+    try:
+        result = fn(**args, progress=lambda *event: job.check_cancelled())
+    except (RequestError, UnknownGroupError) as e:
+        return {
+            'status_code': 400,
+            'mimetype': 'application/json',
+            'headers': {},
+            'body': json.dumps({'success': False, 'error': str(e)}).encode('utf-8')
+        }
+    if isinstance(result, ExportFile):
+        return {
+            'status_code': 200,
+            'mimetype': result.mimetype,
+            'headers': {'Content-Disposition': f'attachment; filename={result.filename}'},
+            'body': b''.join(result.chunks)
+        }
+    return {
+        'status_code': 200,
+        'mimetype': 'application/json',
+        'headers': {},
+        'body': json.dumps(result).encode('utf-8')
+    }
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a generation or export request as a background job.
+
+    Takes {'type': one of JOB_TYPES, 'params': the request's JSON body}
+    and answers 202 with the job id, 400 if the params are invalid, or 429
+    if the group already has its maximum of active jobs.
+    """
+    data = request.get_json() or {}
+    job_type = data.get('type')
+    if job_type not in JOB_TYPES:
+        return jsonify({
+            'success': False,
+            'error': f'type must be one of: {", ".join(JOB_TYPES)}'
+        }), 400
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({
+            'success': False,
+            'error': 'params must be an object'
+        }), 400
+
+    read_request, fn, per_group = JOB_TYPES[job_type]
+    try:
+        args = read_request(params)
+    except ValueError as e:
+        return error_response(e)
+    group = args['group'] if per_group else 'all'
+    try:
+        job_id = job_queue.submit(job_type, group, run_job, fn, args)
+    except JobLimitError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 429
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('job_status', job_id=job_id)
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report a job's state, with the response inline once a JSON job is done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'No job: {job_id}'
+        }), 404
+    response = {
+        'success': True,
+        'job': {name: job[name] for name in ('id', 'kind', 'group', 'status', 'cancel_requested',
+                                             'created_at', 'started_at', 'finished_at', 'error')}
+    }
+    if job['status'] == 'done':
+        response['result_status'] = job['status_code']
+        response['result_url'] = url_for('job_result', job_id=job_id)
+        if job['mimetype'] == 'application/json':
+            response['result'] = json.loads(job_queue.get(job_id, with_body=True)['body'])
+    return jsonify(response)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Return a finished job's response as the original request would have"""
+    job = job_queue.get(job_id, with_body=True)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'No job: {job_id}'
+        }), 404
+    if job['status'] != 'done':
+        return jsonify({
+            'success': False,
+            'error': f'Job {job_id} is {job["status"]}',
+            'status': job['status']
+        }), 409
+    return Response(job['body'], status=job['status_code'], mimetype=job['mimetype'],
+                    headers=job['headers'])
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a job: queued jobs never start, running ones stop at their next checkpoint"""
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return jsonify({
+            'success': False,
+            'error': f'No job: {job_id}'
+        }), 404
+    return jsonify({
+        'success': True,
+        'status': status
+    })
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
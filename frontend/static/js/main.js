@@ -45,6 +45,7 @@ document.addEventListener('DOMContentLoaded', () => {
     groupSelect.addEventListener('change', handleGroupChange);
     // Add event listeners
     document.getElementById('generateBtn').addEventListener('click', generateSchedule);
+    document.getElementById('generateAllBtn').addEventListener('click', generateAllGroups);
     document.getElementById('transferBtn').addEventListener('click', transferPreview);
     document.getElementById('completeBtn').addEventListener('click', completeGenerate);
 
@@ -149,6 +150,44 @@ async function generateSchedule() {
         alert('Failed to generate schedule. Please check the console for details.');
     }
 }
+async function generateAllGroups() {
+    const month = document.getElementById('monthSelect').value;
+    const year = document.getElementById('yearSelect').value;
+    
+    try {
+        const response = await fetch('http://127.0.0.1:5000/api/generate-all', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ 
+                month: parseInt(month), 
+                year: parseInt(year)
+            })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            // Store all schedules so switching groups doesn't regenerate
+            Object.keys(data.schedules).forEach(group => {
+                scheduleState[group] = {
+                    schedule: data.schedules[group].schedule,
+                    month: month,
+                    year: year
+                };
+            });
+            
+            // Display current group's schedule
+            displaySchedule(data.schedules[currentGroup].schedule, data.schedules[currentGroup].month_data);
+        } else {
+            alert('Failed to generate schedules: ' + data.error);
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('Failed to generate schedules. Please check the console for details.');
+    }
+}
 function displaySchedule(schedule, monthData) {
     currentSchedule = schedule;  // Store schedule globally
     const container = document.getElementById('scheduleContainer');
@@ -498,18 +537,12 @@ function clearSelected() {
 async function applyShiftToSelected(shift) {
     if (selectedCells.size === 0) return;
     
-    for (const cell of selectedCells) {
+    const edits = [...selectedCells].map(cell => {
         const [worker, day] = cell.dataset.cellInfo.split('-');
-        const shiftDiv = cell.querySelector('.shift-display');
-        
-        try {
-            await updateShift(worker, parseInt(day), shift);
-            shiftDiv.textContent = shift;
-            setShiftColor(cell, shift);
-        } catch (error) {
-            console.error('Error:', error);
-        }
-    }
+        return { worker, day: parseInt(day), shift };
+    });
+    
+    await updateShifts(edits);
     
     clearSelected();
     toggleSelectMode();
@@ -541,6 +574,44 @@ function updateShiftCounters() {
         if (lastRows[2]) lastRows[2].children[day].textContent = night;
     }
 }
+// Send a whole selection as one batch; the server applies all edits or none
+async function updateShifts(edits) {
+    try {
+        const response = await fetch('http://127.0.0.1:5000/api/update-shifts', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ edits, group: currentGroup })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            applyScheduleChanges(data.changes, data.total_hours);
+            
+            updateShiftCounters();
+            updateConsecutiveDays();
+            updateWarnings();
+            await updateDLVerification();
+            
+            scheduleState[currentGroup] = {
+                schedule: currentSchedule,
+                month: document.getElementById('monthSelect').value,
+                year: document.getElementById('yearSelect').value
+            };
+            
+            return true;
+        } else {
+            alert(data.error || 'Failed to update shifts');
+            return false;
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('Failed to update shifts. Please check the console for details.');
+        return false;
+    }
+}
 async function updateShift(worker, day, shift) {
     try {
         const response = await fetch('http://127.0.0.1:5000/api/update-shift', {
@@ -554,23 +625,13 @@ async function updateShift(worker, day, shift) {
         const data = await response.json();  
         
         if (data.success) {
-            // Update the display first
             const cell = document.querySelector(`[data-cell-info="${worker}-${day}"]`);
-            const shiftDiv = cell.querySelector('.shift-display');
-            const oldShift = shiftDiv.textContent;
-            
-            if (shift === '') {
-                shiftDiv.textContent = '';
-            } else {
-                shiftDiv.textContent = shift;
-            }
-            setShiftColor(cell, shift);
+            const oldShift = cell.querySelector('.shift-display').textContent;
 
-            // Then update the schedule data
-            currentSchedule = data.schedule;
+            // Patch only the cells and totals the server reports as changed
+            applyScheduleChanges(data.changes, data.total_hours);
             
             // Basic updates
-            updateHourCount(worker);  
             updateShiftCounters();    
             updateConsecutiveDays();
             updateWarnings(); // Add this line to update warnings whenever any shift changes
@@ -631,6 +692,35 @@ async function updateShift(worker, day, shift) {
         return false;
     }
 }
+// Apply a delta from the server: changed cells plus new totals of the workers they belong to
+function applyScheduleChanges(changes, totalHours) {
+    const tableRows = document.querySelectorAll('#scheduleContainer tbody tr');
+
+    changes.forEach(({ worker, day, shift }) => {
+        const workerData = currentSchedule.find(w => w.name === worker);
+        if (workerData) {
+            if (shift === '') {
+                delete workerData.shifts[day];
+            } else {
+                workerData.shifts[day] = shift;
+            }
+        }
+
+        const cell = document.querySelector(`[data-cell-info="${worker}-${day}"]`);
+        if (!cell) return;
+        cell.querySelector('.shift-display').textContent = shift;
+        setShiftColor(cell, shift);
+    });
+
+    Object.entries(totalHours).forEach(([worker, hours]) => {
+        const workerIndex = currentSchedule.findIndex(w => w.name === worker);
+        if (workerIndex === -1) return;
+        currentSchedule[workerIndex].total_hours = hours;
+        if (tableRows[workerIndex]) {
+            tableRows[workerIndex].lastElementChild.textContent = hours.toFixed(1);
+        }
+    });
+}
 // Helper function to update DL status for a single worker
 function updateDLVerificationForWorker(status) {
     const rows = document.querySelectorAll('tr');
@@ -923,45 +1013,72 @@ async function transferPreview() {
         alert('Failed to transfer preview. Please check the console for details.');
     }
 }
-async function completeGenerate() {
-    try {
-        const response = await fetch('http://127.0.0.1:5000/api/complete-generate', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ 
-                group: currentGroup 
-            })
+const COMPLETE_PHASE_LABELS = {
+    nights: 'nights',
+    dls: 'DLs',
+    l_days: 'L days',
+    dayshifts: 'dayshifts',
+    repair: 'repair',
+    searching: 'searching',
+    search: 'search',
+    stored: 'saved'
+};
+
+// Streams progress from /api/complete-generate/stream into the button label
+function completeGenerate() {
+    const completeBtn = document.getElementById('completeBtn');
+    const buttonLabel = completeBtn.textContent;
+    completeBtn.disabled = true;
+
+    const params = new URLSearchParams({ group: currentGroup });
+    const source = new EventSource(`http://127.0.0.1:5000/api/complete-generate/stream?${params}`);
+    const finish = () => {
+        source.close();
+        completeBtn.disabled = false;
+        completeBtn.textContent = buttonLabel;
+    };
+
+    source.addEventListener('progress', event => {
+        const progress = JSON.parse(event.data);
+        let label = `${progress.group}: ${COMPLETE_PHASE_LABELS[progress.phase] || progress.phase}`;
+        const score = progress.score ? progress.score.total : progress.cost;
+        if (score !== undefined) {
+            label += ` (score ${score})`;
+        }
+        completeBtn.textContent = label;
+    });
+
+    source.addEventListener('done', event => {
+        finish();
+        const data = JSON.parse(event.data);
+
+        // Display the current group's schedule
+        displaySchedule(data.schedule, data.month_data);
+
+        // Store all schedules in the state
+        Object.keys(data.all_schedules).forEach(group => {
+            scheduleState[group] = {
+                schedule: data.all_schedules[group].schedule,
+                month: data.all_schedules[group].month_data.month.toString(),
+                year: data.all_schedules[group].month_data.year.toString()
+            };
         });
-        
-        const data = await response.json();
-        
-        if (data.success) {
-            // Display the current group's schedule
-            displaySchedule(data.schedule, data.month_data);
-            
-            // Store all schedules in the state
-            Object.keys(data.all_schedules).forEach(group => {
-                scheduleState[group] = {
-                    schedule: data.all_schedules[group].schedule,
-                    month: data.all_schedules[group].month_data.month.toString(),
-                    year: data.all_schedules[group].month_data.year.toString()
-                };
-            });
-            
-            // Update verifications
-            updateConsecutiveDays();
-            updateDLVerification();
-            updateWarnings();
-            
+
+        // Update verifications
+        updateConsecutiveDays();
+        updateDLVerification();
+        updateWarnings();
+    });
+
+    source.addEventListener('error', event => {
+        finish();
+        if (event.data) {
+            alert('Failed to complete schedule: ' + JSON.parse(event.data).error);
         } else {
-            alert('Failed to complete schedule: ' + data.error);
+            console.error('Complete generation stream failed:', event);
+            alert('Failed to complete schedule. Please check the console for details.');
         }
-    } catch (error) {
-        console.error('Error:', error);
-        alert('Failed to complete schedule. Please check the console for details.');
-    }
+    });
 }
 
 // Update the existing updateDLVerification function to use the new endpoint
@@ -0,0 +1,321 @@
+import json
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlite_db import SqliteDatabase
+
+# Job states; a job is active while queued or running
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+ACTIVE_STATES = ('queued', 'running')
+
+# Seconds after which a job that is still active is taken to have died with its worker
+STALE_JOB_AGE = 24 * 3600
+
+# Record fields returned by JobStore.get (plus 'body' with with_body=True)
+JOB_FIELDS = ('id', 'kind', 'group', 'status', 'cancel_requested', 'created_at', 'started_at',
+              'finished_at', 'error', 'status_code', 'mimetype', 'headers')
+
+class JobLimitError(Exception):
+    """Raised when a group already has as many active jobs as it may"""
+
+    def __init__(self, group, limit):
+        super().__init__(f"Group {group} already has {limit} active job(s)")
+        self.group = group
+        self.limit = limit
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation was requested"""
+
+class JobStore:
+    """Base class for job stores.
+
+    A job record holds its kind, group and state, and once finished the
+    result as an HTTP response (status_code, mimetype, headers, body) or
+    an error message. Finished jobs are pruned max_age seconds after they
+    finish. Active ones are kept, and keep counting against the group's
+    limit, until stale_age seconds after they were created, when they're
+    taken to have died with their worker.
+    """
+
+    def __init__(self, max_age=3600, stale_age=STALE_JOB_AGE):
+        self.max_age = max_age
+        self.stale_age = stale_age
+
+    def is_expired(self, job, now):
+        """True if a job record should be pruned"""
+        if job['status'] in ACTIVE_STATES:
+            return job['created_at'] <= now - self.stale_age
+        return job['finished_at'] <= now - self.max_age
+
+    def create(self, job_id, kind, group, group_limit):
+        """Add a queued job, raising JobLimitError if the group is at its limit"""
+        raise NotImplementedError
+
+    def start(self, job_id):
+        """Mark a queued job running; False if it was cancelled meanwhile"""
+        raise NotImplementedError
+
+    def finish(self, job_id, result=None, error=None):
+        """Record a job's result (or error); a job with a pending cancel ends up cancelled"""
+        raise NotImplementedError
+
+    def cancel(self, job_id):
+        """Cancel a queued job or flag a running one; returns the job's status or None"""
+        raise NotImplementedError
+
+    def cancel_requested(self, job_id):
+        """True if the job was asked to stop"""
+        raise NotImplementedError
+
+    def get(self, job_id, with_body=False):
+        """Return a job record as a dict, or None"""
+        raise NotImplementedError
+
+class MemoryJobStore(JobStore):
+    """Job store living in this process only (tests, single worker)"""
+
+    def __init__(self, max_age=3600, stale_age=STALE_JOB_AGE):
+        super().__init__(max_age, stale_age)
+        self.jobs = {}  # id -> record dict
+        self.lock = threading.Lock()
+
+    def create(self, job_id, kind, group, group_limit):
+        now = time.time()
+        with self.lock:
+            for old_id in [old_id for old_id, job in self.jobs.items() if self.is_expired(job, now)]:
+                del self.jobs[old_id]
+            active = sum(1 for job in self.jobs.values()
+                         if job['group'] == group and job['status'] in ACTIVE_STATES)
+            if active >= group_limit:
+                raise JobLimitError(group, group_limit)
+            record = dict.fromkeys(JOB_FIELDS)
+            record.update(id=job_id, kind=kind, group=group, status='queued',
+                          cancel_requested=False, created_at=now, headers={}, body=None)
+            self.jobs[job_id] = record
+
+    def start(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] != 'queued':
+                return False
+            job.update(status='running', started_at=time.time())
+            return True
+
+    def finish(self, job_id, result=None, error=None):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] != 'running':
+                return
+            job['finished_at'] = time.time()
+            if job['cancel_requested']:
+                job['status'] = 'cancelled'
+            elif error is not None:
+                job.update(status='failed', error=error)
+            else:
+                job.update(status='done', **result)
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] == 'queued':
+                job.update(status='cancelled', finished_at=time.time())
+            elif job['status'] == 'running':
+                job['cancel_requested'] = True
+            return job['status']
+
+    def cancel_requested(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job is not None and job['cancel_requested']
+
+    def get(self, job_id, with_body=False):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            record = {field: job[field] for field in JOB_FIELDS}
+            if with_body:
+                record['body'] = job['body']
+            return record
+
+class SqliteJobStore(JobStore):
+    """Job store in a SQLite file shared by every worker process.
+
+    Any process can report on or cancel a job; the one running it sees
+    the cancel through cancel_requested(). Connections are handled by
+    SqliteDatabase, as in SqliteScheduleStore.
+    """
+
+    def __init__(self, path, timeout=10.0, max_age=3600, stale_age=STALE_JOB_AGE):
+        super().__init__(max_age, stale_age)
+        self.db = SqliteDatabase(path, timeout)
+        with self.db.transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, grp TEXT NOT NULL, status TEXT NOT NULL,"
+                " cancel_requested INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL,"
+                " started_at REAL, finished_at REAL, error TEXT, status_code INTEGER,"
+                " mimetype TEXT, headers TEXT, body BLOB)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_grp_status ON jobs (grp, status)")
+
+    def create(self, job_id, kind, group, group_limit):
+        now = time.time()
+        # The write lock is taken before counting so the limit check and insert are atomic
+        with self.db.transaction() as connection:
+            # Same rule as JobStore.is_expired
+            connection.execute(
+                f"DELETE FROM jobs WHERE CASE WHEN status IN {ACTIVE_STATES} THEN created_at <= ?"
+                " ELSE finished_at <= ? END",
+                (now - self.stale_age, now - self.max_age)
+            )
+            active = connection.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE grp = ? AND status IN {ACTIVE_STATES}", (group,)
+            ).fetchone()[0]
+            if active >= group_limit:
+                raise JobLimitError(group, group_limit)
+            connection.execute(
+                "INSERT INTO jobs (id, kind, grp, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, group, now)
+            )
+
+    def start(self, job_id):
+        cursor = self.db.connect().execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id, result=None, error=None):
+        now = time.time()
+        if error is not None:
+            self.db.connect().execute(
+                "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'failed' END,"
+                " finished_at = ?, error = ? WHERE id = ? AND status = 'running'",
+                (now, error, job_id)
+            )
+            return
+        self.db.connect().execute(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'done' END,"
+            " finished_at = ?, status_code = ?, mimetype = ?, headers = ?, body = ?"
+            " WHERE id = ? AND status = 'running'",
+            (now, result['status_code'], result['mimetype'], json.dumps(result['headers']),
+             result['body'], job_id)
+        )
+
+    def cancel(self, job_id):
+        with self.db.transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+            )
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def cancel_requested(self, job_id):
+        row = self.db.connect().execute(
+            "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def get(self, job_id, with_body=False):
+        columns = "id, kind, grp, status, cancel_requested, created_at, started_at, finished_at," \
+                  " error, status_code, mimetype, headers"
+        if with_body:
+            columns += ", body"
+        row = self.db.connect().execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(JOB_FIELDS + ('body',), row))
+        record['cancel_requested'] = bool(record['cancel_requested'])
+        record['headers'] = json.loads(record['headers']) if record['headers'] else {}
+        return record
+
+def open_job_store(location):
+    """Open the job store named by location: 'memory' or a SQLite file path"""
+    if location == 'memory':
+        return MemoryJobStore()
+    return SqliteJobStore(location)
+
+class Job:
+    """Handle a running job's function gets to check for cancellation"""
+
+    def __init__(self, store, job_id, check_interval=0.2):
+        self.store = store
+        self.id = job_id
+        self.check_interval = check_interval
+        self.next_check = 0.0
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job was asked to stop.
+
+        The store is read at most every check_interval seconds, so this
+        is cheap enough to call from progress callbacks.
+        """
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + self.check_interval
+        if self.store.cancel_requested(self.id):
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+class JobQueue:
+    """Runs jobs on a bounded thread pool and tracks them in a JobStore.
+
+    At most max_workers jobs run at once in this process, and each group
+    may have at most group_limit jobs queued or running across all
+    processes sharing the store. A job function is called as
+    fn(job, *args) and returns its result as a dict of status_code,
+    mimetype, headers and body (bytes).
+    """
+
+    def __init__(self, store, max_workers=2, group_limit=1):
+        self.store = store
+        self.max_workers = max_workers
+        self.group_limit = group_limit
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                   thread_name_prefix='job')
+            return self.executor
+
+    def submit(self, kind, group, fn, *args):
+        """Queue a job and return its id (raises JobLimitError)"""
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, kind, group, self.group_limit)
+        self.get_executor().submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _run(self, job_id, fn, args):
+        if not self.store.start(job_id):
+            return  # Cancelled while queued
+        try:
+            result = fn(Job(self.store, job_id), *args)
+        except JobCancelled:
+            self.store.finish(job_id, error='cancelled')
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            traceback.print_exc()
+            self.store.finish(job_id, error=str(e))
+        else:
+            self.store.finish(job_id, result=result)
+
+    def get(self, job_id, with_body=False):
+        """Return a job record, or None if there's no such job"""
+        return self.store.get(job_id, with_body)
+
+    def cancel(self, job_id):
+        """Cancel a job; returns its status afterwards, or None if there's no such job"""
+        return self.store.cancel(job_id)
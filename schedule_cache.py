@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+
+class ScheduleCache:
+    """LRU cache with a time-to-live for generated schedules.
+
+    Entries are keyed by make_key() and hold whatever payload the caller
+    stores (normally a get_month_schedule() result).
+    """
+
+    def __init__(self, max_size=128, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, payload)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(group, year, month, seed, roster_fingerprint, preview=None, candidates=1,
+                 engine='greedy', time_budget_ms=None, deadline_ms=None):
+        """Build the cache key for one generation"""
+        return (group, year, month, seed, roster_fingerprint, preview, candidates, engine, time_budget_ms,
+                deadline_ms)
+
+    def get(self, key):
+        """Return the cached payload for key, or None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        """Store a payload, evicting the least recently used entries if full"""
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, payload)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
@@ -0,0 +1,155 @@
+import calendar
+import struct
+
+# Compact binary schedule format ("grid" format), all integers little-endian:
+#
+#   header      magic b'SCHG', format version (u8), year (u16), month (u8),
+#               days_in_month (u8), preview_days (u8), workers (u16),
+#               shift codes (u16), group (u8 length + UTF-8)
+#   shift codes one entry per code: u8 length + UTF-8 (code 0 is the empty cell)
+#   roster      one entry per worker: flags (u8, bit 0 = part-time),
+#               total hours in half hours (u16), name (u8 length + UTF-8)
+#   cells       one shift-code byte per worker per day, days 1..days_in_month + preview_days
+GRID_MAGIC = b'SCHG'
+GRID_FORMAT_VERSION = 1
+GRID_MIMETYPE = 'application/x-schedule-grid'
+
+_HEADER = struct.Struct('<4sBHBBBHH')
+_WORKER = struct.Struct('<BH')
+
+PART_TIME_FLAG = 0x01
+
+class ScheduleFormatError(ValueError):
+    """Raised when bytes can't be decoded as a grid-format schedule"""
+
+def _pack_string(value):
+    encoded = str(value).encode('utf-8')
+    if len(encoded) > 255:
+        raise ValueError(f"String too long for grid format: {value!r}")
+    return bytes((len(encoded),)) + encoded
+
+def _pack(group, year, month, preview_days, shift_names, workers, rows):
+    """Assemble a grid-format payload.
+
+    workers is a list of (name, part_time, total_hours) and rows holds one
+    bytes-like row of shift codes per worker covering every day.
+    """
+    days_in_month = calendar.monthrange(year, month)[1]
+    total_days = days_in_month + preview_days
+    parts = [
+        _HEADER.pack(GRID_MAGIC, GRID_FORMAT_VERSION, year, month, days_in_month, preview_days,
+                     len(workers), len(shift_names)),
+        _pack_string(group)
+    ]
+    parts.extend(_pack_string(shift) for shift in shift_names)
+    for name, part_time, total_hours in workers:
+        parts.append(_WORKER.pack(PART_TIME_FLAG if part_time else 0, int(round(total_hours * 2))))
+        parts.append(_pack_string(name))
+    for row in rows:
+        if len(row) != total_days:
+            raise ValueError(f"Expected {total_days} days per worker, got {len(row)}")
+        parts.append(bytes(row))
+    return b''.join(parts)
+
+def encode_scheduler(scheduler):
+    """Encode a SchedulerCore's current month straight from its grid"""
+    workers = [
+        (worker, scheduler.roster.part_time_mask[worker_index], scheduler.total_hours.get(worker_index, 0))
+        for worker_index, worker in enumerate(scheduler.selected_workers)
+    ]
+    # Grid rows keep an unused slot for day 0
+    rows = [memoryview(row)[1:] for row in scheduler.grid]
+    return _pack(scheduler.current_group, scheduler.year, scheduler.month, scheduler.preview_days,
+                 scheduler.shift_names, workers, rows)
+
+def encode_schedule(group, year, month, schedule, preview_days=7):
+    """Encode a schedule in get_month_schedule() format"""
+    total_days = calendar.monthrange(year, month)[1] + preview_days
+    shift_names = [""]
+    shift_codes = {"": 0}
+    workers = []
+    rows = []
+    for worker_schedule in schedule:
+        row = bytearray(total_days)
+        for day, shift in worker_schedule['shifts'].items():
+            day = int(day)
+            if not shift or not 0 < day <= total_days:
+                continue
+            code = shift_codes.get(shift)
+            if code is None:
+                code = shift_codes[shift] = len(shift_names)
+                shift_names.append(shift)
+            row[day - 1] = code
+        workers.append((worker_schedule['name'], worker_schedule.get('part_time', False),
+                        worker_schedule.get('total_hours', 0)))
+        rows.append(row)
+    if len(shift_names) > 256:
+        raise ValueError("Too many distinct shift types for grid format (max 256)")
+    return _pack(group, year, month, preview_days, shift_names, workers, rows)
+
+def decode_schedule(data):
+    """Decode a grid-format payload.
+
+    Returns a dict with group, year, month, days_in_month, preview_days and
+    the schedule in get_month_schedule() format.
+    """
+    data = memoryview(data)
+    try:
+        (magic, format_version, year, month, days_in_month, preview_days,
+         worker_count, shift_count) = _HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise ScheduleFormatError("Truncated grid header") from None
+    if magic != GRID_MAGIC:
+        raise ScheduleFormatError("Not a grid-format schedule")
+    if format_version != GRID_FORMAT_VERSION:
+        raise ScheduleFormatError(f"Unsupported grid format version {format_version}")
+
+    offset = _HEADER.size
+    try:
+        def read_string():
+            nonlocal offset
+            length = data[offset]
+            value = bytes(data[offset + 1:offset + 1 + length]).decode('utf-8')
+            offset += 1 + length
+            return value
+
+        group = read_string()
+        shift_names = [read_string() for _ in range(shift_count)]
+
+        workers = []
+        for _ in range(worker_count):
+            flags, half_hours = _WORKER.unpack_from(data, offset)
+            offset += _WORKER.size
+            workers.append((read_string(), bool(flags & PART_TIME_FLAG), half_hours / 2))
+    except (IndexError, struct.error, UnicodeDecodeError):
+        raise ScheduleFormatError("Truncated grid header") from None
+
+    total_days = days_in_month + preview_days
+    if len(data) - offset != worker_count * total_days:
+        raise ScheduleFormatError("Grid cell data has the wrong size")
+    if max(data[offset:], default=0) >= len(shift_names):
+        raise ScheduleFormatError("Grid cell uses an undefined shift code")
+
+    schedule = []
+    for name, part_time, total_hours in workers:
+        row = data[offset:offset + total_days]
+        offset += total_days
+        schedule.append({
+            'name': name,
+            'shifts': {day: shift_names[code] for day, code in enumerate(row, start=1) if code},
+            'total_hours': total_hours,
+            'part_time': part_time
+        })
+
+    return {
+        'group': group,
+        'year': year,
+        'month': month,
+        'days_in_month': days_in_month,
+        'preview_days': preview_days,
+        'schedule': schedule
+    }
+
+def is_grid_payload(data):
+    """Check whether bytes look like a grid-format schedule"""
+    return bytes(data[:len(GRID_MAGIC)]) == GRID_MAGIC
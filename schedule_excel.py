@@ -0,0 +1,304 @@
+import calendar
+import os
+import re
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, PatternFill, Font, Alignment, Border, Side
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
+
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June",
+               "July", "August", "September", "October", "November", "December"]
+
+# Day letters, indexed by datetime.weekday()
+DAY_LETTERS = ['D', 'L', 'M', 'X', 'J', 'V', 'S']
+
+# Cell colour of each shift type
+SHIFT_COLORS = {
+    'N': 'D3D3D3',
+    'LN': 'D3D3D3',
+    '10N': 'D3D3D3',
+    '10LN': 'D3D3D3',
+    'L': 'FFFF99',
+    'SL': 'FFFF99',
+    'DL': '90EE90',
+    'M': 'ADD8E6',
+    'M4': 'ADD8E6',
+    'T': 'FFA07A',
+    '2T': 'FFA07A',
+    'I': 'E6E6FA'
+}
+
+# Days of the next month shown after the separator column
+PREVIEW_DAYS = 7
+
+SEPARATOR = '║'
+
+# Month suffix of sheet titles in multi-month exports ("Cocina 2024-02")
+SHEET_MONTH_SUFFIX = re.compile(r' (\d{4})-(\d{2})$')
+
+# First-column labels of summary rows below the workers, which end an import
+SUMMARY_LABELS = ('Morning:', 'Afternoon:', 'Night:')
+
+# Exports up to this many bytes stay in memory, larger ones spill to a temp file
+EXPORT_SPOOL_SIZE = 1024 * 1024
+
+# Bytes per chunk when streaming an export to the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Sheet layout: worker names in A, then the month's days, a separator, the
+# preview days and the hours column. Letters are computed once for the
+# widest month.
+MAX_COLUMNS = 31 + PREVIEW_DAYS + 3
+COLUMN_LETTERS = [None] + [get_column_letter(column) for column in range(1, MAX_COLUMNS + 1)]
+
+class ExcelStyles:
+    """Named styles of one export workbook.
+
+    Each distinct look is registered once as a NamedStyle; cells then
+    refer to it by name instead of carrying their own Font, Border,
+    Alignment and PatternFill objects.
+    """
+
+    TITLE = 'schedule_title'
+    CORNER = 'schedule_corner'
+    DAY = 'schedule_day'
+    BORDERED = 'schedule_bordered'
+    BOLD = 'schedule_bold'
+    CENTERED = 'schedule_centered'
+
+    def __init__(self, workbook):
+        side = Side(style='thin')
+        border = Border(left=side, right=side, top=side, bottom=side)
+        bold = Font(bold=True)
+        centered = Alignment(horizontal='center')
+
+        self.workbook = workbook
+        self._add(self.TITLE, font=Font(bold=True, size=14), alignment=centered)
+        self._add(self.CORNER, font=bold, border=border,
+                  alignment=Alignment(horizontal='center', vertical='center'))
+        self._add(self.DAY, font=bold, border=border, alignment=centered)
+        self._add(self.BORDERED, border=border)
+        self._add(self.BOLD, font=bold, border=border)
+        self._add(self.CENTERED, border=border, alignment=centered)
+
+        # Shift cells look like CENTERED plus their shift colour
+        self.shift_styles = {}
+        color_styles = {}
+        for shift, color in SHIFT_COLORS.items():
+            if color not in color_styles:
+                color_styles[color] = self._add(
+                    f'schedule_shift_{color}', border=border, alignment=centered,
+                    fill=PatternFill(start_color=color, end_color=color, fill_type='solid'))
+            self.shift_styles[shift] = color_styles[color]
+
+    def _add(self, name, font=DEFAULT_FONT, **attributes):
+        # Without a font a named style would drop the workbook's default one
+        style = NamedStyle(name=name, font=font, **attributes)
+        self.workbook.add_named_style(style)
+        return name
+
+    def shift_style(self, shift):
+        """Style name of a cell holding shift"""
+        return self.shift_styles.get(shift, self.CENTERED)
+
+# One sheet laid out by ScheduleExcelWriter.render_sheet: the hours column
+# (the last one) and the rows as lists of (value, style name) entries, None
+# for an empty unstyled cell.
+SheetRows = namedtuple('SheetRows', ['hours_column', 'rows'])
+
+class ScheduleExcelWriter:
+    """Builds the schedule export workbook in openpyxl's write-only mode.
+
+    Sheets are rendered into SheetRows buffers first and then streamed to
+    the workbook one row at a time, so memory use doesn't grow with the
+    number of cells already written.
+    """
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        self.styles = ExcelStyles(self.workbook)
+
+    def render_sheet(self, year, month, schedule):
+        """Lay out one group's month as a SheetRows buffer without touching the workbook.
+
+        year and month set the title and day headers; schedule is in
+        get_month_schedule() format. Only reads shared state, so several
+        sheets can be rendered at once before write_sheet() adds them.
+        """
+        styles = self.styles
+        days_in_month = calendar.monthrange(year, month)[1]
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        separator_column = days_in_month + 2
+        hours_column = separator_column + PREVIEW_DAYS + 1
+        separator = (SEPARATOR, styles.BORDERED)
+
+        rows = [[(f"{MONTH_NAMES[month - 1]} {year}", styles.TITLE)]]
+
+        header_dates = ([datetime(year, month, day) for day in range(1, days_in_month + 1)]
+                        + [None]
+                        + [datetime(next_year, next_month, day) for day in range(1, PREVIEW_DAYS + 1)])
+        day_names = [('Workers', styles.CORNER)]
+        day_numbers = [None]
+        for date in header_dates:
+            if date is None:
+                day_names.append(separator)
+                day_numbers.append(separator)
+            else:
+                day_names.append((DAY_LETTERS[date.weekday()], styles.DAY))
+                day_numbers.append((date.day, styles.DAY))
+        day_names.append(('Total', styles.BOLD))
+        day_numbers.append(('Hours', styles.BOLD))
+        rows.append(day_names)
+        rows.append(day_numbers)
+
+        days = list(range(1, days_in_month + 1))
+        preview = list(range(days_in_month + 1, days_in_month + PREVIEW_DAYS + 1))
+        shift_style = styles.shift_style
+        for worker in schedule:
+            shifts = worker['shifts']
+            row = [(worker['name'], styles.BOLD)]
+            for day in days:
+                shift = shifts.get(day, '')
+                row.append((shift, shift_style(shift)))
+            row.append(separator)
+            for day in preview:
+                shift = shifts.get(day, '')
+                row.append((shift, shift_style(shift)))
+            row.append((worker['total_hours'], styles.CENTERED))
+            rows.append(row)
+        return SheetRows(hours_column, rows)
+
+    def write_sheet(self, title, sheet_rows):
+        """Append a rendered sheet to the workbook as a new worksheet"""
+        worksheet = self.workbook.create_sheet(title=title)
+        hours_column = sheet_rows.hours_column
+
+        # Column widths have to be set before the first row is written
+        for column in range(1, hours_column):
+            worksheet.column_dimensions[COLUMN_LETTERS[column]].width = 4
+        worksheet.column_dimensions['A'].width = 12
+        worksheet.merged_cells.add(f'A1:{COLUMN_LETTERS[hours_column - 1]}1')
+        worksheet.merged_cells.add('A2:A3')
+
+        for row in sheet_rows.rows:
+            cells = []
+            for entry in row:
+                if entry is None:
+                    cells.append(None)
+                    continue
+                cell = WriteOnlyCell(worksheet, entry[0])
+                cell.style = entry[1]
+                cells.append(cell)
+            worksheet.append(cells)
+        return worksheet
+
+    def save(self, target):
+        """Write the workbook to a path or binary file object"""
+        self.workbook.save(target)
+
+    def spool(self):
+        """Save the workbook to a rewound spooled temp file.
+
+        Returns (file, size); the caller closes the file, normally through
+        FileChunks.
+        """
+        spooled = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+        try:
+            self.save(spooled)
+            size = spooled.seek(0, os.SEEK_END)
+            spooled.seek(0)
+        except BaseException:
+            spooled.close()
+            raise
+        return spooled, size
+
+class FileChunks:
+    """Iterate a file's contents in chunks, closing it once read.
+
+    close() closes the file too, even before the first chunk, so a
+    response that is dropped unread doesn't leave the file open.
+    """
+
+    def __init__(self, file, chunk_size=EXPORT_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = b'' if self.file.closed else self.file.read(self.chunk_size)
+        if not chunk:
+            self.close()
+            raise StopIteration
+        return chunk
+
+    def close(self):
+        self.file.close()
+
+def sheet_title(name, year=None, month=None):
+    """Title of a group's sheet: its display name, plus YYYY-MM when year and month are given"""
+    if year is None:
+        return name
+    return f'{name} {year}-{month:02d}'
+
+def sheet_group_name(title):
+    """Display name of the group a sheet title refers to (see sheet_title)"""
+    match = SHEET_MONTH_SUFFIX.search(title)
+    return title[:match.start()] if match else title
+
+def export_filename(year, month, last=None):
+    """Download name of a month's export, or of a range ending at last=(year, month)"""
+    if last is None or last == (year, month):
+        return f'schedule_{MONTH_NAMES[month - 1]}_{year}.xlsx'
+    return f'schedule_{MONTH_NAMES[month - 1]}_{year}_to_{MONTH_NAMES[last[1] - 1]}_{last[0]}.xlsx'
+
+# One imported sheet: the month from its title and one (name, month shifts,
+# preview shifts) entry per worker row. Shift lists are indexed from day 1
+# and may hold empty cells (None or '').
+ScheduleSheet = namedtuple('ScheduleSheet', ['year', 'month', 'workers'])
+
+def open_schedule_workbook(file):
+    """Open an uploaded workbook for import in read-only mode (close it when done)"""
+    return load_workbook(file, read_only=True, data_only=True)
+
+def read_schedule_sheet(worksheet):
+    """Read an exported sheet in a single pass over its rows.
+
+    The month comes from the title in A1 and the preview days from the
+    columns after the separator in row 2. Worker rows start at row 4
+    and end at the first empty name or summary label. Raises ValueError
+    if the title isn't "<Month> <year>".
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    title = next(rows, (None,))[0]
+    try:
+        month_name, year = str(title).split()
+        year, month = int(year), MONTH_NAMES.index(month_name) + 1
+    except ValueError:
+        raise ValueError(f"Sheet {worksheet.title!r} has no '<Month> <year>' title in A1") from None
+    days_in_month = calendar.monthrange(year, month)[1]
+
+    header = next(rows, ())
+    preview_start = header.index(SEPARATOR) + 1 if SEPARATOR in header else None
+    next(rows, None)
+    width = max(days_in_month + 1, preview_start + PREVIEW_DAYS if preview_start else 0)
+
+    workers = []
+    for row in rows:
+        name = row[0] if row else None
+        if not name or name in SUMMARY_LABELS:
+            break
+        # Read-only rows stop at the last stored cell
+        if len(row) < width:
+            row = row + (None,) * (width - len(row))
+        preview = row[preview_start:preview_start + PREVIEW_DAYS] if preview_start else ()
+        workers.append((name, row[1:days_in_month + 1], preview))
+    return ScheduleSheet(year, month, workers)
@@ -0,0 +1,108 @@
+import copy
+import json
+from collections import namedtuple
+
+# Night cycle kinds:
+#   team    team_size workers work N N N LN together, then SL and L, while the
+#           next team starts on their SL day
+#   anchor  one worker runs N N N LN SL L back to back; other night-eligible
+#           workers cover the SL and L nights
+NIGHT_CYCLE_TYPES = ('team', 'anchor')
+
+# Rules for groups whose config doesn't spell them out
+DEFAULT_RULES = {
+    'night_cycle': {'type': 'team', 'team_size': 1},
+    'dl_per_sunday': 7,                  # Most workers off on the same Sunday
+    'shift_caps': {'M': 4, 'T': 5},      # Day shifts before the rest switch over
+    'opposite_shift': None               # {'worker': ..., 'follows': ...}
+}
+
+# Legacy special_rules entries and the opposite_shift rule each one stands for
+LEGACY_OPPOSITE_SHIFT_RULES = {
+    'marianella_javiera': {'worker': 'Marianella', 'follows': 'Javiera'}
+}
+
+# Compiled rules of one group, shared read-only through its Roster.
+# Worker references are resolved to worker indices; config is the merged
+# rule definition as canonical JSON.
+RuleSet = namedtuple('RuleSet', [
+    'night_cycle', 'team_size', 'anchor_index',
+    'dl_per_sunday', 'morning_cap', 'afternoon_cap',
+    'opposite_shift', 'config'
+])
+
+def _positive_int(group, name, value):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError(f"{group}: {name} must be a positive integer, got {value!r}")
+    return value
+
+def _object(group, name, value):
+    if not isinstance(value, dict):
+        raise ValueError(f"{group}: {name} must be an object, got {value!r}")
+    return value
+
+def _worker_index(group, name, worker, worker_indices):
+    if not isinstance(worker, str):
+        raise ValueError(f"{group}: {name} must name a worker, got {worker!r}")
+    if worker not in worker_indices:
+        raise ValueError(f"{group}: {name} refers to unknown worker {worker!r}")
+    return worker_indices[worker]
+
+def normalize_rules(group_config):
+    """Merge a group's 'rules' section over DEFAULT_RULES.
+
+    Legacy special_rules that stand for an opposite_shift rule are used
+    when the config doesn't define one.
+    """
+    rules = copy.deepcopy(DEFAULT_RULES)
+    rules.update(copy.deepcopy(group_config.get('rules') or {}))
+    if rules['opposite_shift'] is None:
+        for rule in sorted(group_config.get('special_rules', ())):
+            if rule in LEGACY_OPPOSITE_SHIFT_RULES:
+                rules['opposite_shift'] = dict(LEGACY_OPPOSITE_SHIFT_RULES[rule])
+    return rules
+
+def compile_rules(group, group_config, worker_indices, night_eligible_indices):
+    """Validate a group's rules and compile them into a RuleSet.
+
+    Raises ValueError naming the group and key for any malformed rule.
+    """
+    rules = normalize_rules(group_config)
+
+    night_cycle = _object(group, 'night_cycle', rules['night_cycle'])
+    cycle_type = night_cycle.get('type')
+    if cycle_type not in NIGHT_CYCLE_TYPES:
+        raise ValueError(f"{group}: night_cycle type must be one of {NIGHT_CYCLE_TYPES}, got {cycle_type!r}")
+    team_size = 1
+    anchor_index = None
+    if cycle_type == 'team':
+        team_size = _positive_int(group, 'night_cycle team_size', night_cycle.get('team_size', 1))
+        if team_size > len(night_eligible_indices):
+            raise ValueError(f"{group}: night_cycle team_size {team_size} is larger than "
+                             f"the {len(night_eligible_indices)} night-eligible workers")
+    else:
+        anchor_index = _worker_index(group, 'night_cycle', night_cycle.get('worker'), worker_indices)
+        if anchor_index not in night_eligible_indices:
+            raise ValueError(f"{group}: night_cycle worker {night_cycle['worker']!r} can't work nights")
+        if len(night_eligible_indices) < 3:
+            raise ValueError(f"{group}: an anchor night cycle needs two other night-eligible workers")
+
+    shift_caps = _object(group, 'shift_caps', rules['shift_caps'])
+    opposite_shift = None
+    if rules['opposite_shift'] is not None:
+        rule = _object(group, 'opposite_shift', rules['opposite_shift'])
+        opposite_shift = (
+            _worker_index(group, 'opposite_shift', rule.get('worker'), worker_indices),
+            _worker_index(group, 'opposite_shift', rule.get('follows'), worker_indices)
+        )
+
+    return RuleSet(
+        night_cycle=cycle_type,
+        team_size=team_size,
+        anchor_index=anchor_index,
+        dl_per_sunday=_positive_int(group, 'dl_per_sunday', rules['dl_per_sunday']),
+        morning_cap=_positive_int(group, 'shift_caps M', shift_caps.get('M')),
+        afternoon_cap=_positive_int(group, 'shift_caps T', shift_caps.get('T')),
+        opposite_shift=opposite_shift,
+        config=json.dumps(rules, sort_keys=True)
+    )
@@ -0,0 +1,420 @@
+import math
+import time
+
+# Weights of the local-search objective (lower is better); the hard rules
+# match SCORE_WEIGHTS, but count days and DLs rather than workers so every
+# step towards a fix shows up
+SEARCH_WEIGHTS = {
+    'dl_shortfall': 100,    # per Sunday DL a full-time worker is missing
+    'streak_excess': 100,   # per day a work streak runs past STREAK_LIMIT - 1
+    't_to_m': 50,           # per M straight after a T
+    'cap_excess': 10,       # per M or T over the day's shift cap
+    'opposite_shift': 10,   # per day an opposite_shift pair works the same day shift
+    'extra_l': 20,          # per L beyond the ones the schedule started with
+    'imbalance': 1          # |M - T| summed over every day
+}
+
+# Seconds a search runs when the caller gives no budget
+DEFAULT_TIME_BUDGET = 0.5
+
+# Starting temperature of the annealing schedule (one T->M violation)
+START_TEMPERATURE = 50.0
+
+# Seconds between progress reports of a running search
+PROGRESS_INTERVAL = 0.25
+
+class LocalSearch:
+    """Simulated-annealing local search over a generated schedule.
+
+    Night cycles stay as they are: N, LN and SL cells are locked, and the L
+    after an SL may only turn into a DL. Part-time workers are left alone
+    and an opposite_shift pair is kept apart through the objective. The
+    search only touches M, T, L and DL cells, with these moves:
+
+        swap      exchange M and T between two workers on one day
+        flip      turn one M into a T or back
+        shuffle   swap a worker's L or DL with another of their cells, which
+                  moves free days without changing how many there are
+        toggle_l  turn a work day into an L or back (extra Ls are penalised)
+        add_dl    give a worker short of Sunday DLs one more
+
+    Half of the moves aim at a current violation, the rest are random.
+    Every move goes through SchedulerCore.assign_shift_at, so the hours
+    ledger and ConstraintTracker stay current and the objective is read
+    from counters.
+    """
+
+    def __init__(self, scheduler, start_from_day=1, weights=None):
+        self.scheduler = scheduler
+        self.rng = scheduler.rng
+        self.weights = dict(SEARCH_WEIGHTS, **(weights or {}))
+        self.tracker = scheduler.constraints()
+        self.total_days = scheduler.days_in_month + scheduler.preview_days
+
+        self.morning = scheduler.intern_shift("M")
+        self.afternoon = scheduler.intern_shift("T")
+        self.day_free = scheduler.intern_shift("L")
+        self.day_off = scheduler.intern_shift("DL")
+        rest = scheduler.intern_shift("SL")
+        searchable = (self.morning, self.afternoon, self.day_free, self.day_off)
+
+        rules = scheduler.roster.rules
+        self.morning_cap = rules.morning_cap
+        self.afternoon_cap = rules.afternoon_cap
+        self.dl_capacity = rules.dl_per_sunday
+        self.opposite_shift = rules.opposite_shift
+        self.workers = list(scheduler.roster.full_time_indices)
+        self.movable = frozenset(self.workers)
+
+        grid = scheduler.grid
+        self.free_days = {}   # worker -> days the search may change
+        self.rest_days = {}   # worker -> days right after an SL (L or DL only)
+        for worker_index in self.workers:
+            row = grid[worker_index]
+            self.free_days[worker_index] = [day for day in range(start_from_day, self.total_days + 1)
+                                            if row[day] in searchable]
+            self.rest_days[worker_index] = frozenset(day for day in self.free_days[worker_index]
+                                                     if row[day - 1] == rest)
+        self.free_sets = {worker_index: frozenset(days) for worker_index, days in self.free_days.items()}
+        self.l_counts = {worker_index: grid[worker_index].count(self.day_free) for worker_index in self.workers}
+        self.l_baseline = dict(self.l_counts)
+        self.extra_l = 0
+        self.sundays = [day for day in sorted(self.tracker.sundays) if day >= start_from_day]
+        # Workers whose locked cells leave too few Sundays for the DLs they lack
+        self.stuck_dl_workers = frozenset(
+            worker_index for worker_index in self.workers
+            if self.tracker.worker_shortfall[worker_index] > sum(
+                1 for day in self.sundays
+                if day in self.free_sets[worker_index] and grid[worker_index][day] != self.day_off)
+        )
+        self.sunday_dls = {day: sum(1 for row in grid if row[day] == self.day_off)
+                           for day in self.tracker.sundays}
+
+        self.day_mornings = [0] * (self.total_days + 1)
+        self.day_afternoons = [0] * (self.total_days + 1)
+        for row in grid:
+            for day in range(1, self.total_days + 1):
+                if row[day] == self.morning:
+                    self.day_mornings[day] += 1
+                elif row[day] == self.afternoon:
+                    self.day_afternoons[day] += 1
+        self.imbalance = 0
+        self.cap_excess = 0
+        self.opposite_clashes = 0
+        for day in range(1, self.total_days + 1):
+            imbalance, cap_excess, clash = self._day_cost(day)
+            self.imbalance += imbalance
+            self.cap_excess += cap_excess
+            self.opposite_clashes += clash
+
+    def _day_cost(self, day):
+        """Return (imbalance, cap excess, opposite_shift clash) of one day"""
+        mornings = self.day_mornings[day]
+        afternoons = self.day_afternoons[day]
+        clash = 0
+        if self.opposite_shift:
+            grid = self.scheduler.grid
+            follower, leader = self.opposite_shift
+            code = grid[follower][day]
+            clash = int(code == grid[leader][day] and code in (self.morning, self.afternoon))
+        return (abs(mornings - afternoons),
+                max(0, mornings - self.morning_cap) + max(0, afternoons - self.afternoon_cap),
+                clash)
+
+    def cost(self):
+        """Current value of the objective"""
+        tracker = self.tracker
+        weights = self.weights
+        return (weights['dl_shortfall'] * tracker.dl_shortfall
+                + weights['streak_excess'] * tracker.streak_excess
+                + weights['t_to_m'] * tracker.counts['t_to_m']
+                + weights['cap_excess'] * self.cap_excess
+                + weights['opposite_shift'] * self.opposite_clashes
+                + weights['extra_l'] * self.extra_l
+                + weights['imbalance'] * self.imbalance)
+
+    def is_feasible(self):
+        """True when no hard rule (DLs, streaks, T->M) is broken"""
+        counts = self.tracker.counts
+        return not (counts['missing_dl'] or counts['streak'] or counts['t_to_m'])
+
+    def is_repaired(self):
+        """True when every hard-rule violation left is one the search can't fix"""
+        counts = self.tracker.counts
+        return not (counts['streak'] or counts['t_to_m']
+                    or counts['missing_dl'] > len(self.stuck_dl_workers))
+
+    def _set(self, worker_index, day, code):
+        """Write one cell and return its previous code"""
+        old_code = self.scheduler.grid[worker_index][day]
+        imbalance, cap_excess, clash = self._day_cost(day)
+        self.imbalance -= imbalance
+        self.cap_excess -= cap_excess
+        self.opposite_clashes -= clash
+        for cell_code, step in ((old_code, -1), (code, 1)):
+            if cell_code == self.day_free:
+                baseline = self.l_baseline[worker_index]
+                count = self.l_counts[worker_index]
+                self.extra_l += max(0, count + step - baseline) - max(0, count - baseline)
+                self.l_counts[worker_index] = count + step
+            elif cell_code == self.morning:
+                self.day_mornings[day] += step
+            elif cell_code == self.afternoon:
+                self.day_afternoons[day] += step
+            elif cell_code == self.day_off and day in self.sunday_dls:
+                self.sunday_dls[day] += step
+        self.scheduler.assign_shift_at(day, worker_index, self.scheduler.shift_names[code])
+        imbalance, cap_excess, clash = self._day_cost(day)
+        self.imbalance += imbalance
+        self.cap_excess += cap_excess
+        self.opposite_clashes += clash
+        return old_code
+
+    def _apply(self, changes):
+        """Apply [(worker_index, day, code)] and return the changes that undo it"""
+        return [(worker_index, day, self._set(worker_index, day, code))
+                for worker_index, day, code in changes][::-1]
+
+    def _allowed(self, changes):
+        for worker_index, day, code in changes:
+            if code == self.day_off:
+                if day not in self.sunday_dls or self.sunday_dls[day] >= self.dl_capacity:
+                    return False
+            elif day in self.rest_days[worker_index] and code != self.day_free:
+                return False
+        return True
+
+    def _day_shift_cell(self, worker_index, day):
+        """True if the cell holds an M or T the search may change"""
+        return (day in self.free_sets[worker_index] and day not in self.rest_days[worker_index]
+                and self.scheduler.grid[worker_index][day] in (self.morning, self.afternoon))
+
+    def _swap(self, day=None, worker_index=None):
+        if day is None:
+            day = self.rng.randint(1, self.total_days)
+        grid = self.scheduler.grid
+        shift_workers = [i for i in self.workers if self._day_shift_cell(i, day)]
+        if worker_index is None:
+            if len(shift_workers) < 2:
+                return None
+            worker_index = self.rng.choice(shift_workers)
+        elif worker_index not in shift_workers:
+            return None
+        code = grid[worker_index][day]
+        partners = [i for i in shift_workers if grid[i][day] != code]
+        if not partners:
+            return None
+        partner = self.rng.choice(partners)
+        return [(worker_index, day, grid[partner][day]), (partner, day, code)]
+
+    def _flip(self, worker_index=None, day=None):
+        if worker_index is None:
+            worker_index = self.rng.choice(self.workers)
+        if day is None:
+            if not self.free_days[worker_index]:
+                return None
+            day = self.rng.choice(self.free_days[worker_index])
+        if not self._day_shift_cell(worker_index, day):
+            return None
+        code = self.scheduler.grid[worker_index][day]
+        return [(worker_index, day, self.afternoon if code == self.morning else self.morning)]
+
+    def _shuffle(self, worker_index=None, work_day=None):
+        """Swap one of the worker's L/DL days with another of their days"""
+        if worker_index is None:
+            worker_index = self.rng.choice(self.workers)
+        row = self.scheduler.grid[worker_index]
+        rest_days = self.rest_days[worker_index]
+        days = [day for day in self.free_days[worker_index] if day not in rest_days]
+        off_days = [day for day in days if row[day] in (self.day_free, self.day_off)]
+        if not off_days:
+            return None
+        off_day = self.rng.choice(off_days)
+        if work_day is None:
+            work_day = self.rng.choice(days)
+        if row[work_day] == row[off_day] or work_day not in days:
+            return None
+        return [(worker_index, off_day, row[work_day]), (worker_index, work_day, row[off_day])]
+
+    def _toggle_l(self, worker_index=None, day=None):
+        if worker_index is None:
+            worker_index = self.rng.choice(self.workers)
+        if day is None:
+            if not self.free_days[worker_index]:
+                return None
+            day = self.rng.choice(self.free_days[worker_index])
+        if day not in self.free_sets[worker_index] or day in self.rest_days[worker_index]:
+            return None
+        code = self.scheduler.grid[worker_index][day]
+        if code == self.day_free:
+            return [(worker_index, day, self.rng.choice((self.morning, self.afternoon)))]
+        if code in (self.morning, self.afternoon):
+            return [(worker_index, day, self.day_free)]
+        return None
+
+    def _add_dl(self, worker_index=None):
+        tracker = self.tracker
+        if worker_index is None:
+            short = [i for i in self.workers if tracker.worker_shortfall[i]]
+            if not short:
+                return None
+            worker_index = self.rng.choice(short)
+        row = self.scheduler.grid[worker_index]
+        sundays = [day for day in self.sundays
+                   if day in self.free_sets[worker_index] and row[day] != self.day_off]
+        if not sundays:
+            return None
+        sunday = self.rng.choice(sundays)
+        changes = [(worker_index, sunday, self.day_off)]
+        # Hand the lost work day back by working one of the worker's L days instead
+        if row[sunday] != self.day_free and self.rng.random() < 0.5:
+            l_days = [day for day in self.free_days[worker_index]
+                      if row[day] == self.day_free and day not in self.rest_days[worker_index]]
+            if l_days:
+                changes.append((worker_index, self.rng.choice(l_days), row[sunday]))
+        return changes
+
+    def _targeted_move(self, key):
+        kind, worker_index = key[0], key[1]
+        if kind == 'missing_dl':
+            return self._add_dl(worker_index)
+        if kind == 't_to_m':
+            day = key[2]
+            choice = self.rng.randrange(4)
+            if choice == 0:
+                return self._flip(worker_index, day)
+            if choice == 1:
+                return self._flip(worker_index, day - 1)
+            return self._swap(day - (choice == 3), worker_index)
+        # Streak: move an L or DL into the run
+        start = key[2]
+        length = self.tracker.streaks[worker_index].get(start)
+        if not length:
+            return None
+        day = self.rng.randrange(start, start + length)
+        if self.rng.random() < 0.5:
+            return self._toggle_l(worker_index, day)
+        return self._shuffle(worker_index, day)
+
+    def _propose(self):
+        if self.rng.random() < 0.5:
+            # Sorted so a seeded run doesn't depend on set order (str hashes vary per process)
+            targets = sorted(key for key in self.tracker.violations if key[1] in self.movable)
+            if targets:
+                return self._targeted_move(self.rng.choice(targets))
+        roll = self.rng.random()
+        if roll < 0.4:
+            return self._swap()
+        if roll < 0.6:
+            return self._flip()
+        if roll < 0.8:
+            return self._shuffle()
+        if roll < 0.9:
+            return self._toggle_l()
+        return self._add_dl()
+
+    def run(self, time_budget=DEFAULT_TIME_BUDGET, max_iterations=None, stop_when_feasible=False,
+            progress=None, deadline=None):
+        """Search until the budget runs out, the objective hits 0 or (optionally) is_repaired().
+
+        time_budget is in seconds from the start of the run; deadline is
+        an absolute time.monotonic() value, and with both the earlier one
+        ends the search. At least one of time_budget, max_iterations and
+        deadline must be given. The best schedule found is left in
+        the scheduler, except that a run stopped by stop_when_feasible
+        keeps the repaired schedule it stopped on. progress, if given, is
+        called with {iterations, elapsed, cost} every PROGRESS_INTERVAL
+        seconds. Returns a dict of search statistics.
+        """
+        if time_budget is None and max_iterations is None and deadline is None:
+            raise ValueError("LocalSearch.run needs a time_budget, max_iterations or deadline")
+        started = time.monotonic()
+        if time_budget is not None:
+            deadline = started + time_budget if deadline is None else min(deadline, started + time_budget)
+        initial_cost = cost = best_cost = self.cost()
+        best = self.scheduler.snapshot_grid()
+        iterations = 0
+        completed = 0.0   # Fraction of the budget used, drives the cooling
+        next_report = started + PROGRESS_INTERVAL
+
+        repaired = False
+        while cost > 0:
+            if stop_when_feasible and self.is_repaired():
+                repaired = True
+                break
+            if max_iterations is not None:
+                if iterations >= max_iterations:
+                    break
+                completed = iterations / max_iterations
+            if iterations % 64 == 0 and (deadline is not None or progress is not None):
+                now = time.monotonic()
+                if deadline is not None:
+                    if now >= deadline:
+                        break
+                    completed = max(completed, (now - started) / (deadline - started))
+                if progress is not None and now >= next_report:
+                    progress({'iterations': iterations, 'elapsed': now - started, 'cost': best_cost})
+                    next_report = now + PROGRESS_INTERVAL
+            iterations += 1
+
+            changes = self._propose()
+            if not changes or not self._allowed(changes):
+                continue
+            undo = self._apply(changes)
+            new_cost = self.cost()
+            delta = new_cost - cost
+            temperature = START_TEMPERATURE * (1.0 - completed) + 0.1
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                cost = new_cost
+                if cost < best_cost:
+                    best_cost = cost
+                    best = self.scheduler.snapshot_grid()
+            else:
+                self._apply(undo)
+
+        if cost > best_cost and not repaired:
+            self.scheduler.restore_grid(best)
+            self.tracker = self.scheduler.constraints()
+            cost = best_cost
+        return {
+            'iterations': iterations,
+            'elapsed': time.monotonic() - started,
+            'initial_cost': initial_cost,
+            'cost': cost,
+            'feasible': self.is_feasible()
+        }
+
+def benchmark(groups=('sala', 'cocina', 'coperia'), year=2024, month=3, seeds=range(10),
+              time_budget=DEFAULT_TIME_BUDGET):
+    """Compare greedy and search scores over the same seeds.
+
+    Returns {group: {'greedy': avg score, 'search': avg score,
+    'greedy_feasible': count, 'search_feasible': count, 'seconds': avg}}.
+    """
+    from scheduler_core import SchedulerCore
+
+    seeds = list(seeds)
+    results = {}
+    for group in groups:
+        totals = {'greedy': 0, 'search': 0, 'greedy_feasible': 0, 'search_feasible': 0, 'seconds': 0.0}
+        for seed in seeds:
+            for engine in ('greedy', 'search'):
+                scheduler = SchedulerCore(group)
+                scheduler.initialize_month(year, month)
+                scheduler.set_seed(seed)
+                started = time.monotonic()
+                missing_dls, violations = scheduler.generate_schedule(engine, time_budget)
+                if engine == 'search':
+                    totals['seconds'] += time.monotonic() - started
+                score = scheduler.score_schedule(missing_dls, violations)
+                totals[engine] += score['total']
+                totals[engine + '_feasible'] += not (missing_dls or violations or score['t_to_m_violations'])
+        results[group] = {name: (value / len(seeds) if name in ('greedy', 'search', 'seconds') else value)
+                          for name, value in totals.items()}
+    return results
+
+if __name__ == '__main__':
+    for group, result in benchmark().items():
+        print(f"{group:8} greedy {result['greedy']:7.1f} ({result['greedy_feasible']} feasible)  "
+              f"search {result['search']:7.1f} ({result['search_feasible']} feasible)  "
+              f"{result['seconds']:.2f}s per schedule")
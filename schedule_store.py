@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+
+from schedule_codec import encode_schedule, decode_schedule, is_grid_payload
+from sqlite_db import SqliteDatabase
+
+class VersionConflict(Exception):
+    """Raised when a compare-and-set save finds a different version in the store"""
+
+    def __init__(self, group, year, month, expected_version, current_version):
+        super().__init__(
+            f"Schedule for {group} {year}-{month} is at version {current_version}, "
+            f"expected {expected_version}"
+        )
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+class ScheduleStore:
+    """Base class for schedule stores.
+
+    Schedules are stored in get_month_schedule() format keyed by
+    (group, year, month). Every save bumps the record's version; passing
+    expected_version makes the save a compare-and-set (0 means the record
+    must not exist yet). Each group also has an active month, the one the
+    UI is currently working on.
+
+    Payloads are written in the compact grid format (see schedule_codec);
+    JSON payloads written by older versions are still read.
+    """
+
+    def encode(self, group, year, month, schedule):
+        """Serialize a schedule for storage"""
+        return encode_schedule(group, year, month, schedule)
+
+    def decode(self, payload):
+        """Deserialize a stored schedule"""
+        if is_grid_payload(payload):
+            return decode_schedule(payload)['schedule']
+        return json.loads(payload)
+
+    def load(self, group, year, month):
+        """Return {'schedule': ..., 'version': ...} or None if nothing is stored"""
+        raise NotImplementedError
+
+    def get_version(self, group, year, month):
+        """Return the stored schedule's version without loading it, 0 if nothing is stored"""
+        raise NotImplementedError
+
+    def save(self, group, year, month, schedule, expected_version=None):
+        """Store a schedule and return its new version"""
+        raise NotImplementedError
+
+    def get_active_month(self, group):
+        """Return (year, month) the group is working on, or None"""
+        raise NotImplementedError
+
+    def set_active_month(self, group, year, month):
+        """Set the month the group is working on"""
+        raise NotImplementedError
+
+class MemoryScheduleStore(ScheduleStore):
+    """Schedule store living in this process only (tests, single worker)"""
+
+    def __init__(self):
+        self.records = {}  # (group, year, month) -> (version, payload)
+        self.active_months = {}
+        self.lock = threading.Lock()
+
+    def load(self, group, year, month):
+        with self.lock:
+            record = self.records.get((group, year, month))
+        if record is None:
+            return None
+        version, payload = record
+        return {'schedule': self.decode(payload), 'version': version}
+
+    def get_version(self, group, year, month):
+        with self.lock:
+            return self.records.get((group, year, month), (0, None))[0]
+
+    def save(self, group, year, month, schedule, expected_version=None):
+        payload = self.encode(group, year, month, schedule)
+        key = (group, year, month)
+        with self.lock:
+            current_version = self.records.get(key, (0, None))[0]
+            if expected_version is not None and expected_version != current_version:
+                raise VersionConflict(group, year, month, expected_version, current_version)
+            self.records[key] = (current_version + 1, payload)
+            return current_version + 1
+
+    def get_active_month(self, group):
+        with self.lock:
+            return self.active_months.get(group)
+
+    def set_active_month(self, group, year, month):
+        with self.lock:
+            self.active_months[group] = (year, month)
+
+class SqliteScheduleStore(ScheduleStore):
+    """Schedule store in a SQLite file shared by every worker process (see SqliteDatabase)"""
+
+    def __init__(self, path, timeout=10.0):
+        self.db = SqliteDatabase(path, timeout)
+        with self.db.transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS schedules ("
+                " grp TEXT NOT NULL, year INTEGER NOT NULL, month INTEGER NOT NULL,"
+                " version INTEGER NOT NULL, payload BLOB NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (grp, year, month))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS active_months ("
+                " grp TEXT PRIMARY KEY, year INTEGER NOT NULL, month INTEGER NOT NULL)"
+            )
+
+    def load(self, group, year, month):
+        row = self.db.connect().execute(
+            "SELECT version, payload FROM schedules WHERE grp = ? AND year = ? AND month = ?",
+            (group, year, month)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'schedule': self.decode(row[1]), 'version': row[0]}
+
+    def get_version(self, group, year, month):
+        row = self.db.connect().execute(
+            "SELECT version FROM schedules WHERE grp = ? AND year = ? AND month = ?",
+            (group, year, month)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def save(self, group, year, month, schedule, expected_version=None):
+        payload = self.encode(group, year, month, schedule)
+        # The write lock is taken before reading the version so the check and write are atomic
+        with self.db.transaction() as connection:
+            row = connection.execute(
+                "SELECT version FROM schedules WHERE grp = ? AND year = ? AND month = ?",
+                (group, year, month)
+            ).fetchone()
+            current_version = row[0] if row else 0
+            if expected_version is not None and expected_version != current_version:
+                raise VersionConflict(group, year, month, expected_version, current_version)
+            connection.execute(
+                "INSERT OR REPLACE INTO schedules (grp, year, month, version, payload, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (group, year, month, current_version + 1, payload, time.time())
+            )
+        return current_version + 1
+
+    def get_active_month(self, group):
+        row = self.db.connect().execute(
+            "SELECT year, month FROM active_months WHERE grp = ?", (group,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def set_active_month(self, group, year, month):
+        self.db.connect().execute(
+            "INSERT OR REPLACE INTO active_months (grp, year, month) VALUES (?, ?, ?)",
+            (group, year, month)
+        )
+
+def open_schedule_store(location):
+    """Open the store named by location: 'memory' or a SQLite file path"""
+    if location == 'memory':
+        return MemoryScheduleStore()
+    return SqliteScheduleStore(location)
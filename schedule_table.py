@@ -0,0 +1,199 @@
+import calendar
+import csv
+import io
+import os
+import tempfile
+
+from scheduler_core import SHIFT_HOURS
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Parquet and Arrow are optional, CSV always works
+    pyarrow = None
+
+# Long-form schedule tables: one row per worker per day with a shift in the
+# month (preview days belong to the next month and aren't repeated). hours
+# is the shift's hours, so summing it per worker gives the month's total.
+TABLE_COLUMNS = ('group', 'year', 'month', 'worker', 'day', 'shift', 'hours')
+
+# Columns an import needs; hours is recomputed from the shifts
+IMPORT_COLUMNS = TABLE_COLUMNS[:-1]
+
+# format -> (mimetype, file extension)
+TABLE_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow')
+}
+
+# Formats that need pyarrow
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+# Rows per CSV chunk or Arrow record batch
+TABLE_BATCH_ROWS = 4096
+
+# Columnar exports up to this many bytes stay in memory, larger ones spill to a temp file
+TABLE_SPOOL_SIZE = 1024 * 1024
+
+class TableFormatError(ValueError):
+    """Raised when an uploaded table can't be read as a schedule table"""
+
+def check_table_format(table_format):
+    """Raise ValueError with a message for the client if table_format can't be used"""
+    if table_format not in TABLE_FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(TABLE_FORMATS)}')
+    if table_format in COLUMNAR_FORMATS and pyarrow is None:
+        raise ValueError(f'{table_format} needs pyarrow, which is not installed; use csv instead')
+
+def table_format_of(filename):
+    """Format matching a file name's extension, or None"""
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension == 'feather':
+        return 'arrow'
+    for table_format, (_, format_extension) in TABLE_FORMATS.items():
+        if extension == format_extension:
+            return table_format
+    return None
+
+def table_filename(table_format, year, month, last=None):
+    """Download name of a month's table export, or of a range ending at last=(year, month)"""
+    extension = TABLE_FORMATS[table_format][1]
+    if last is None or last == (year, month):
+        return f'schedule_{year}-{month:02d}.{extension}'
+    return f'schedule_{year}-{month:02d}_to_{last[0]}-{last[1]:02d}.{extension}'
+
+def iter_schedule_rows(group, year, month, schedule):
+    """Yield the long-form rows of one group's month (schedule in get_month_schedule() format)"""
+    days = range(1, calendar.monthrange(year, month)[1] + 1)
+    for worker in schedule:
+        name = worker['name']
+        shifts = worker['shifts']
+        for day in days:
+            shift = shifts.get(day)
+            if shift:
+                yield (group, year, month, name, day, shift, SHIFT_HOURS.get(shift, 0))
+
+def _batches(rows, size=TABLE_BATCH_ROWS):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_csv_chunks(rows):
+    """Yield a CSV table (header first) as UTF-8 chunks of TABLE_BATCH_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(TABLE_COLUMNS)
+    for batch in _batches(rows):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def _arrow_schema():
+    return pyarrow.schema([
+        ('group', pyarrow.string()),
+        ('year', pyarrow.int16()),
+        ('month', pyarrow.int8()),
+        ('worker', pyarrow.string()),
+        ('day', pyarrow.int8()),
+        ('shift', pyarrow.string()),
+        ('hours', pyarrow.float64())
+    ])
+
+def spool_columnar(rows, table_format):
+    """Write rows as Parquet or an Arrow IPC file into a rewound spooled temp file.
+
+    Rows are written one TABLE_BATCH_ROWS record batch at a time.
+    Returns (file, size); the caller closes the file.
+    """
+    check_table_format(table_format)
+    schema = _arrow_schema()
+    spooled = tempfile.SpooledTemporaryFile(max_size=TABLE_SPOOL_SIZE)
+    try:
+        sink = pyarrow.PythonFile(spooled, mode='w')
+        if table_format == 'parquet':
+            writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        else:
+            writer = pyarrow.ipc.new_file(sink, schema)
+        with writer:
+            for batch in _batches(rows):
+                columns = [list(column) for column in zip(*batch)]
+                writer.write_batch(pyarrow.record_batch(columns, schema=schema))
+        size = spooled.seek(0, os.SEEK_END)
+        spooled.seek(0)
+    except BaseException:
+        spooled.close()
+        raise
+    return spooled, size
+
+def _check_header(columns):
+    missing = [column for column in IMPORT_COLUMNS if column not in columns]
+    if missing:
+        raise TableFormatError(f"Table is missing column(s): {', '.join(missing)}")
+
+def _import_row(values, line):
+    group, year, month, worker, day, shift = values
+    try:
+        year, month, day = int(year), int(month), int(day)
+    except (TypeError, ValueError):
+        raise TableFormatError(f"Row {line}: year, month and day must be integers") from None
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        raise TableFormatError(f"Row {line}: no such month {year}-{month}")
+    if not 1 <= day <= calendar.monthrange(year, month)[1]:
+        raise TableFormatError(f"Row {line}: {year}-{month:02d} has no day {day}")
+    if not group or not worker:
+        raise TableFormatError(f"Row {line}: group and worker can't be empty")
+    return str(group), year, month, str(worker), day, str(shift or '')
+
+def iter_csv_rows(file):
+    """Yield (group, year, month, worker, day, shift) from an uploaded binary CSV file.
+
+    Raises TableFormatError for a missing column or a malformed row.
+    """
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if header is None:
+        raise TableFormatError("Table is empty")
+    header = [column.strip() for column in header]
+    _check_header(header)
+    positions = [header.index(column) for column in IMPORT_COLUMNS]
+    for line, row in enumerate(reader, 2):
+        if not row:
+            continue
+        if len(row) < len(header):
+            raise TableFormatError(f"Row {line}: expected {len(header)} values, got {len(row)}")
+        yield _import_row([row[position] for position in positions], line)
+
+def iter_columnar_rows(file, table_format):
+    """Yield (group, year, month, worker, day, shift) from an uploaded Parquet or Arrow file.
+
+    Reads one record batch at a time. Raises TableFormatError if the file
+    can't be read or lacks a column.
+    """
+    check_table_format(table_format)
+    try:
+        if table_format == 'parquet':
+            parquet_file = pyarrow.parquet.ParquetFile(file)
+            _check_header(parquet_file.schema_arrow.names)
+            batches = parquet_file.iter_batches(batch_size=TABLE_BATCH_ROWS, columns=list(IMPORT_COLUMNS))
+        else:
+            reader = pyarrow.ipc.open_file(file)
+            _check_header(reader.schema.names)
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+        line = 0
+        for batch in batches:
+            columns = [batch.column(column).to_pylist() for column in IMPORT_COLUMNS]
+            for values in zip(*columns):
+                line += 1
+                yield _import_row(values, line)
+    except pyarrow.ArrowException as e:
+        raise TableFormatError(f"Could not read {table_format} table: {e}") from None
@@ -1,73 +1,271 @@
 import calendar
+import multiprocessing
+import os
 import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
+from schedule_search import LocalSearch, DEFAULT_TIME_BUDGET
+from staff_roster import Roster, compile_roster, get_roster, get_rosters
+
+# Shift types known up front; code 0 is always the empty cell
+BASE_SHIFT_TYPES = ["", "N", "LN", "SL", "L", "DL", "M", "T", "M4", "2T", "10N", "10LN", "I"]
+
+# Hours counted per shift type (SL, L, DL and anything unknown count as 0)
+SHIFT_HOURS = {
+    "M4": 8.5, "2T": 8.5, "10N": 8.5, "10LN": 8.5,
+    "N": 7.5, "LN": 7.5, "M": 7.5, "T": 7.5, "I": 7.5
+}
+
+# Seeds are drawn from [0, MAX_SEED) when a generation doesn't supply one
+MAX_SEED = 2 ** 31
+
+# A grid cell is a single byte, so at most 256 distinct shift types
+MAX_SHIFT_CODES = 256
+
+# Penalty per problem when scoring a generated schedule (lower scores are better)
+SCORE_WEIGHTS = {
+    'missing_dls': 100,         # full-time worker with fewer than 2 DLs
+    'streak_violations': 100,   # worker with 7+ consecutive work days
+    't_to_m_violations': 50,    # M shift straight after a T shift
+    'shift_imbalance': 1        # |M - T| summed over every day
+}
+
+# Working this many days in a row without an L, SL or DL is a streak violation
+STREAK_LIMIT = 7
+
+# Sundays off (DL) every full-time worker needs per month
+MIN_SUNDAY_DLS = 2
+
+# Generation engines: the greedy pipeline alone, or greedy followed by local search
+ENGINES = ('greedy', 'search')
+
+# Iteration budget of the repair pass that follows assign_dayshifts. Counting
+# iterations rather than time keeps a seeded generation reproducible.
+REPAIR_MAX_ITERATIONS = 5000
+
+# Shift types that break a work streak
+FREE_SHIFT_TYPES = ("L", "SL", "DL")
+
+class ConstraintTracker:
+    """Live rule violations of a SchedulerCore grid.
+
+    Built from the grid once, then kept current by SchedulerCore._set_cell:
+    each changed cell only rechecks its T->M neighbours, the worker's DL
+    days and the work streak around it. Violations are kept in one set of
+    tuples:
+
+        ('t_to_m', worker_index, day)       M straight after T
+        ('streak', worker_index, start)     STREAK_LIMIT+ work days from start
+        ('missing_dl', worker_index)        full-time worker with < 2 Sunday DLs
+
+    Streaks and DLs only apply to full-time workers, like assign_l_days and
+    the DL checks. counts, streak_excess (days past STREAK_LIMIT - 1 over
+    all long runs) and dl_shortfall (DLs missing over all workers) are
+    kept alongside so a search can read its objective in O(1).
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.morning = scheduler.intern_shift("M")
+        self.afternoon = scheduler.intern_shift("T")
+        self.day_off = scheduler.intern_shift("DL")
+        self.free_codes = frozenset(scheduler.intern_shift(shift) for shift in FREE_SHIFT_TYPES)
+        self.sundays = frozenset(day for day in range(1, scheduler.days_in_month + 1)
+                                 if calendar.weekday(scheduler.year, scheduler.month, day) == 6)
+        self.violations = set()
+        self.counts = {'t_to_m': 0, 'streak': 0, 'missing_dl': 0}
+        self.streak_excess = 0
+        self.dl_shortfall = 0
+        self.dl_days = [set() for _ in scheduler.grid]   # month days holding a DL
+        self.streaks = [{} for _ in scheduler.grid]      # run start -> length, long runs only
+        self.worker_shortfall = [0] * len(scheduler.grid)
+        
+        for worker_index, row in enumerate(scheduler.grid):
+            for day in range(1, len(row)):
+                self._check_t_to_m(worker_index, day)
+            for day in range(1, scheduler.days_in_month + 1):
+                if row[day] == self.day_off:
+                    self.dl_days[worker_index].add(day)
+            if scheduler.roster.full_time_mask[worker_index]:
+                self._check_dls(worker_index)
+                self._record_streaks(worker_index, 1, len(row) - 1)
+
+    def cell_changed(self, worker_index, day, old_code):
+        """Update the state around a cell that was just written"""
+        code = self.scheduler.grid[worker_index][day]
+        day_shifts = (self.morning, self.afternoon)
+        if code in day_shifts or old_code in day_shifts:
+            self._check_t_to_m(worker_index, day)
+            self._check_t_to_m(worker_index, day + 1)
+        full_time = self.scheduler.roster.full_time_mask[worker_index]
+        if (code == self.day_off) != (old_code == self.day_off) and day <= self.scheduler.days_in_month:
+            if code == self.day_off:
+                self.dl_days[worker_index].add(day)
+            else:
+                self.dl_days[worker_index].discard(day)
+            if full_time and day in self.sundays:
+                self._check_dls(worker_index)
+        # Swapping one work shift for another leaves every streak as it was
+        if full_time and (code in self.free_codes) != (old_code in self.free_codes):
+            self._rescan_streaks(worker_index, day)
+
+    def _check_t_to_m(self, worker_index, day):
+        row = self.scheduler.grid[worker_index]
+        if not 1 < day < len(row):
+            return
+        self._flag(('t_to_m', worker_index, day),
+                   row[day] == self.morning and row[day - 1] == self.afternoon)
+
+    def _flag(self, key, present):
+        """Add or remove a violation, keeping counts in step"""
+        if present:
+            if key not in self.violations:
+                self.violations.add(key)
+                self.counts[key[0]] += 1
+        elif key in self.violations:
+            self.violations.discard(key)
+            self.counts[key[0]] -= 1
+
+    def _check_dls(self, worker_index):
+        shortfall = max(0, MIN_SUNDAY_DLS - len(self.sunday_dl_days(worker_index)))
+        self.dl_shortfall += shortfall - self.worker_shortfall[worker_index]
+        self.worker_shortfall[worker_index] = shortfall
+        self._flag(('missing_dl', worker_index), shortfall > 0)
+
+    def _rescan_streaks(self, worker_index, day):
+        """Recount the runs between the free days on either side of day"""
+        row = self.scheduler.grid[worker_index]
+        free = self.free_codes
+        first = day - 1
+        while first >= 1 and row[first] not in free:
+            first -= 1
+        last = day + 1
+        while last < len(row) and row[last] not in free:
+            last += 1
+        
+        # Every run that touched day started between those free days
+        streaks = self.streaks[worker_index]
+        for start in [start for start in streaks if first < start < last]:
+            self.streak_excess -= streaks.pop(start) - STREAK_LIMIT + 1
+            self._flag(('streak', worker_index, start), False)
+        self._record_streaks(worker_index, first + 1, last - 1)
+
+    def _record_streaks(self, worker_index, first, last):
+        row = self.scheduler.grid[worker_index]
+        free = self.free_codes
+        start = None
+        for day in range(first, last + 2):
+            if day <= last and row[day] not in free:
+                if start is None:
+                    start = day
+            elif start is not None:
+                if day - start >= STREAK_LIMIT:
+                    self.streaks[worker_index][start] = day - start
+                    self.streak_excess += day - start - STREAK_LIMIT + 1
+                    self._flag(('streak', worker_index, start), True)
+                start = None
+
+    def t_to_m_violations(self):
+        """Return sorted (worker_index, day) pairs with an M straight after a T"""
+        return sorted(key[1:] for key in self.violations if key[0] == 't_to_m')
+
+    def streak_violations(self):
+        """Return sorted (worker_index, start, length) of every long work streak"""
+        return sorted((worker_index, start, length)
+                      for worker_index, streaks in enumerate(self.streaks)
+                      for start, length in streaks.items())
+
+    def streak_workers(self):
+        """Return sorted indices of workers with a long work streak"""
+        return [worker_index for worker_index, streaks in enumerate(self.streaks) if streaks]
+
+    def missing_dl_workers(self):
+        """Return sorted indices of full-time workers with fewer than 2 Sunday DLs"""
+        return sorted(key[1] for key in self.violations if key[0] == 'missing_dl')
+
+    def sunday_dl_days(self, worker_index):
+        """Return the sorted Sundays on which a worker has a DL"""
+        return sorted(day for day in self.dl_days[worker_index] if day in self.sundays)
+
+class UnknownGroupError(ValueError):
+    """Raised for a group that isn't in the staff config"""
+
+    def __init__(self, group):
+        super().__init__(f"Invalid group: {group}")
+        self.group = group
+
 class SchedulerCore:
-    def __init__(self):
-        # Define all staff groups
-        self.staff_groups = {
-            'sala': {
-                'name': 'Personal de Sala',
-                'workers_full_time': [  # Regular full-time workers
-                    "Alejandrina", "Isabel", "Paulina", "Yuli", "Camila", "Javier",
-                    "Natalia", "Fiorella", "Martina", "Felipe", "Javiera", "Marianella", "Krishna"
-                ],
-                'workers_part_time': [  # Part-time workers
-                    "Anais", "Diego Cisterna", "Diego Nuñez", "Jennifer", "Joaquin"
-                ],
-                'special_rules': ['marianella_javiera']
-            },
-            'coperia': {
-                'name': 'Copería',
-                'workers_full_time': [
-                    "Eric", "Soledad", "Ester", "Kelly", "Marthita"
-                ],
-                'workers_part_time': [],
-                'special_rules': []
-            },
-            'cocina': {
-                'name': 'Cocina',
-                'workers_full_time': [
-                    "Soledad", "Gonzalo", "Christopher", "Ahyran", 
-                    "Dominique", "Carolina", "Donkan"
-                ],
-                'workers_part_time': [],
-                'special_rules': []
-            }
-        }
+    def __init__(self, group=None):
+        # Start with the given group, or the first one in the staff config
+        if group is None:
+            group = next(iter(get_rosters()), None)
+        roster = get_roster(group) if group is not None else None
+        if roster is None:
+            raise UnknownGroupError(group)
+        self.current_group = group
+        self.use_roster(roster)
         
-        # Start with sala as default
-        self.current_group = 'sala'
-        # Combine full-time and part-time workers, maintaining order
-        self.selected_workers = (
-            self.staff_groups[self.current_group]['workers_full_time'] +
-            self.staff_groups[self.current_group]['workers_part_time']
-        )
+        # Month being scheduled (set by initialize_month)
+        self.year = None
+        self.month = None
+        self.days_in_month = 0
+        self.preview_days = 7
+        
+        # Each generation draws from its own seeded RNG so it can be replayed
+        self.set_seed()
         
-        # Schedule storage
-        self.schedule = {}  # Format: {(worker_index, day): shift_type}
+        # Shift interning table: shift_names[code] -> shift type, shift_codes[shift type] -> code
+        self.shift_names = list(BASE_SHIFT_TYPES)
+        self.shift_codes = {shift: code for code, shift in enumerate(self.shift_names)}
+        self.shift_hours = [SHIFT_HOURS.get(shift, 0) for shift in self.shift_names]
+        
+        # Schedule storage: one bytearray row of shift codes per worker, indexed by day
+        # (index 0 is unused so days map directly)
+        self.grid = []
         self.total_hours = {}
+        # Built on first use by constraints(), dropped whenever the grid is rebuilt
+        self.constraint_tracker = None
+        # Statistics of the last generate_schedule() search stage (None for greedy)
+        self.search_stats = None
+        self.reset_grid()
 
     def set_current_group(self, group):
         """Switch to a different staff group"""
-        if group in self.staff_groups:
+        roster = get_roster(group)
+        if roster is not None:
             self.current_group = group
-            self.selected_workers = (
-                self.staff_groups[group]['workers_full_time'] +
-                self.staff_groups[group]['workers_part_time']
-            )
-            self.schedule.clear()
-            self.total_hours.clear()
+            self.use_roster(roster)
+            self.reset_grid()
             return True
         return False
 
+    def use_roster(self, roster):
+        """Point the worker lookups at a compiled roster"""
+        self.roster = roster
+        self.selected_workers = list(roster.workers)
+        self.worker_indices = roster.worker_indices
+
+    def set_seed(self, seed=None):
+        """Start a fresh RNG for the next generation and return its seed.
+
+        A random seed is picked when none is given.
+        """
+        if seed is None:
+            seed = random.randrange(MAX_SEED)
+        self.seed = int(seed)
+        self.rng = random.Random(self.seed)
+        return self.seed
+
     def is_part_time(self, worker):
         """Check if a worker is part-time"""
-        return worker in self.staff_groups[self.current_group]['workers_part_time']
+        return worker in self.roster.part_time_workers
 
     def has_special_rule(self, rule):
         """Check if current group has a specific special rule"""
-        return rule in self.staff_groups[self.current_group]['special_rules']
+        return rule in self.roster.special_rules
         
     def initialize_month(self, year, month):
         """Initialize empty schedule for given month"""
@@ -75,75 +273,177 @@ class SchedulerCore:
         self.month = month
         self.days_in_month = calendar.monthrange(year, month)[1]
         self.preview_days = 7
-        self.schedule.clear()
+        self.reset_grid()
+
+    def reset_grid(self):
+        """Allocate an empty workers x (month + preview days) grid"""
+        row_length = self.days_in_month + self.preview_days + 1
+        self.grid = [bytearray(row_length) for _ in self.selected_workers]
+        self.constraint_tracker = None
+        self.reset_total_hours()
+
+    def reset_total_hours(self):
+        """Zero the hours ledger for every worker"""
         self.total_hours.clear()
+        for worker_index in range(len(self.selected_workers)):
+            self.total_hours[worker_index] = 0
+
+    def intern_shift(self, shift_type):
+        """Return the grid code for a shift type, registering it if new"""
+        if not shift_type:
+            return 0
+        code = self.shift_codes.get(shift_type)
+        if code is None:
+            code = len(self.shift_names)
+            if code >= MAX_SHIFT_CODES:
+                raise ValueError(f"Too many distinct shift types (max {MAX_SHIFT_CODES})")
+            self.shift_names.append(shift_type)
+            self.shift_hours.append(SHIFT_HOURS.get(shift_type, 0))
+            self.shift_codes[shift_type] = code
+        return code
 
     def get_shift(self, worker_index, day):
         """Get shift for a specific worker and day"""
-        return self.schedule.get((worker_index, day), "")
+        row = self.grid[worker_index]
+        if 0 < day < len(row):
+            return self.shift_names[row[day]]
+        return ""
+
+    def _set_cell(self, worker_index, day, code):
+        """Write a shift code and adjust that worker's hours by the difference.
+
+        Raises ValueError unless 1 <= day <= days_in_month + preview_days.
+        """
+        row = self.grid[worker_index]
+        if not 0 < day < len(row):
+            raise ValueError(f"Day {day} is outside 1-{len(row) - 1}")
+        old_code = row[day]
+        if old_code == code:
+            return
+        row[day] = code
+        # Preview days don't count towards this month's hours
+        if day <= self.days_in_month:
+            self.total_hours[worker_index] += self.shift_hours[code] - self.shift_hours[old_code]
+        if self.constraint_tracker is not None:
+            self.constraint_tracker.cell_changed(worker_index, day, old_code)
+
+    def constraints(self):
+        """Return the live ConstraintTracker for the grid, building it if needed"""
+        if self.constraint_tracker is None:
+            self.constraint_tracker = ConstraintTracker(self)
+        return self.constraint_tracker
+
+    def get_worker_index(self, worker):
+        """Get the position of a worker in the current group"""
+        try:
+            return self.worker_indices[worker]
+        except KeyError:
+            raise ValueError(f"Unknown worker: {worker}") from None
 
     def assign_shift(self, day, worker, shift_type):
         """Assign a shift to a worker on a specific day"""
-        worker_index = self.selected_workers.index(worker)
-        self.schedule[(worker_index, day)] = shift_type
-        self.update_total_hours()
+        self._set_cell(self.get_worker_index(worker), day, self.intern_shift(shift_type))
+
+    def assign_shift_at(self, day, worker_index, shift_type):
+        """Assign a shift to the worker at worker_index on a specific day"""
+        self._set_cell(worker_index, day, self.intern_shift(shift_type))
 
     def clear_shift(self, day, worker):
         """Clear a shift assignment"""
-        worker_index = self.selected_workers.index(worker)
-        if (worker_index, day) in self.schedule:
-            del self.schedule[(worker_index, day)]
-        self.update_total_hours()
+        self._set_cell(self.get_worker_index(worker), day, 0)
+
+    def clear_shift_at(self, day, worker_index):
+        """Clear the shift of the worker at worker_index on a specific day"""
+        self._set_cell(worker_index, day, 0)
     
     def update_total_hours(self):
-        """Calculate total hours for each worker"""
+        """Recalculate total hours for each worker from scratch.
+
+        assign_shift keeps the ledger up to date, so this is only needed
+        after writing to the grid directly or to check the ledger.
+        """
         self.total_hours.clear()
         
-        for worker_index, worker in enumerate(self.selected_workers):
-            total = 0
-            for day in range(1, self.days_in_month + 1):
-                shift = self.get_shift(worker_index, day)
-                
-                if shift in ["M4", "2T", "10N", "10LN"]:
-                    total += 8.5
-                elif shift in ["N", "LN", "M", "T", "I"]:
-                    total += 7.5
-                elif shift in ["SL", "L", "DL"]:
-                    total += 0
-                
-            self.total_hours[worker_index] = total
+        for worker_index, row in enumerate(self.grid):
+            self.total_hours[worker_index] = self._row_hours(row)
+
+    def check_total_hours(self):
+        """Return indices of workers whose ledger disagrees with a full recompute"""
+        return [worker_index for worker_index, row in enumerate(self.grid)
+                if self.total_hours.get(worker_index, 0) != self._row_hours(row)]
+
+    def snapshot_grid(self):
+        """Copy the grid and hours so later edits can be diffed against it"""
+        return [bytes(row) for row in self.grid], dict(self.total_hours)
+
+    def restore_grid(self, snapshot):
+        """Put back the grid and hours saved by snapshot_grid()"""
+        rows, hours = snapshot
+        for row, saved_row in zip(self.grid, rows):
+            row[:] = saved_row
+        self.total_hours.clear()
+        self.total_hours.update(hours)
+        self.constraint_tracker = None
+
+    def diff_grid(self, snapshot):
+        """Return (changes, total_hours) relative to a snapshot_grid() copy.
+
+        changes lists {'worker', 'day', 'shift'} for every cell that differs
+        and total_hours maps each worker whose hours changed to the new total.
+        """
+        rows, hours = snapshot
+        changes = []
+        total_hours = {}
+        for worker_index, (old_row, row) in enumerate(zip(rows, self.grid)):
+            if old_row == row:
+                continue
+            worker = self.selected_workers[worker_index]
+            for day in range(1, len(row)):
+                if old_row[day] != row[day]:
+                    changes.append({
+                        'worker': worker,
+                        'day': day,
+                        'shift': self.shift_names[row[day]]
+                    })
+            if hours.get(worker_index, 0) != self.total_hours[worker_index]:
+                total_hours[worker] = self.total_hours[worker_index]
+        return changes, total_hours
+
+    def _row_hours(self, row):
+        """Sum the hours of a grid row over the current month"""
+        hours = self.shift_hours
+        return sum(hours[code] for code in row[1:self.days_in_month + 1])
 
     def assign_night_shifts(self, start_from_day=1):
-        """Assign night shift cycles based on group-specific rules"""
+        """Assign night shift cycles based on the group's night_cycle rule"""
         if start_from_day == 1:
             self.clear_schedule()
             
-        if self.current_group == 'sala':
-            self._assign_sala_nights(start_from_day)
-        elif self.current_group == 'cocina':
-            self._assign_cocina_nights(start_from_day)
-        elif self.current_group == 'coperia':
-            self._assign_coperia_nights(start_from_day)
-
-    def _assign_sala_nights(self, start_from_day):
-        """Original night shift logic for Sala"""
+        if self.roster.rules.night_cycle == 'anchor':
+            self._assign_anchor_nights(start_from_day)
+        else:
+            self._assign_team_nights(start_from_day)
+
+    def _assign_team_nights(self, start_from_day):
+        """Night cycles worked by teams of rules.team_size workers"""
+        team_size = self.roster.rules.team_size
         day = start_from_day
-        worker_pool = [w for w in self.selected_workers if not self.is_part_time(w)]
+        worker_pool = list(self.roster.night_eligible_indices)
         used_workers = []
         last_night_workers = []
 
         while day <= self.days_in_month + self.preview_days:
             # Replenish pool if needed
-            if len(worker_pool) < 3:
-                worker_pool = [w for w in self.selected_workers if not self.is_part_time(w)]
+            if len(worker_pool) < team_size:
+                worker_pool = list(self.roster.night_eligible_indices)
                 used_workers = []
 
             # Select workers for this cycle
             available_pool = [w for w in worker_pool if w not in last_night_workers]
-            if len(available_pool) >= 3:
-                selected_for_night = random.sample(available_pool, 3)
+            if len(available_pool) >= team_size:
+                selected_for_night = self.rng.sample(available_pool, team_size)
             else:
-                selected_for_night = random.sample(worker_pool, 3)
+                selected_for_night = self.rng.sample(worker_pool, team_size)
             
             # Assign the cycle
             cycle_complete = True
@@ -153,22 +453,21 @@ class SchedulerCore:
                     cycle_complete = False
                     break
                 
-                for worker in selected_for_night:
+                for worker_index in selected_for_night:
                     shift_type = "N" if day_offset < 3 else "LN"
-                    self.assign_shift(current_day, worker, shift_type)
+                    self.assign_shift_at(current_day, worker_index, shift_type)
             
             # Handle rest days after cycle
             if cycle_complete:
                 rest_day = day + 4
                 if rest_day <= self.days_in_month + self.preview_days:
-                    for worker in selected_for_night:
-                        self.assign_shift(rest_day, worker, "SL")
+                    for worker_index in selected_for_night:
+                        self.assign_shift_at(rest_day, worker_index, "SL")
                         
                         next_day = rest_day + 1
                         if next_day <= self.days_in_month + self.preview_days:
-                            worker_index = self.selected_workers.index(worker)
                             if self.get_shift(worker_index, next_day) != "DL":
-                                self.assign_shift(next_day, worker, "L")
+                                self.assign_shift_at(next_day, worker_index, "L")
                 
                 used_workers.extend(selected_for_night)
                 worker_pool = [w for w in worker_pool if w not in selected_for_night]
@@ -176,85 +475,36 @@ class SchedulerCore:
             last_night_workers = selected_for_night
             day = day + 4
 
-    def _assign_cocina_nights(self, start_from_day):
-        """Single worker night shift cycles for Cocina"""
-        day = start_from_day
-        worker_pool = [w for w in self.selected_workers if not self.is_part_time(w)]
-        used_workers = []
-        last_night_worker = None
-        
-        while day <= self.days_in_month + self.preview_days:
-            # Replenish pool if needed
-            if len(worker_pool) < 1:
-                worker_pool = [w for w in self.selected_workers if not self.is_part_time(w)]
-                used_workers = []
-            
-            # Select worker for this cycle
-            available_pool = [w for w in worker_pool if w != last_night_worker]
-            if len(available_pool) >= 1:
-                selected_for_night = random.choice(available_pool)
-            else:
-                selected_for_night = random.choice(worker_pool)
-            
-            # Assign the cycle
-            cycle_complete = True
-            for day_offset in range(4):
-                current_day = day + day_offset
-                if current_day > self.days_in_month + self.preview_days:
-                    cycle_complete = False
-                    break
-                
-                shift_type = "N" if day_offset < 3 else "LN"
-                self.assign_shift(current_day, selected_for_night, shift_type)
-            
-            # Handle rest days after cycle
-            if cycle_complete:
-                rest_day = day + 4
-                if rest_day <= self.days_in_month + self.preview_days:
-                    self.assign_shift(rest_day, selected_for_night, "SL")
-                    
-                    next_day = rest_day + 1
-                    if next_day <= self.days_in_month + self.preview_days:
-                        if self.get_shift(self.selected_workers.index(selected_for_night), next_day) != "DL":
-                            self.assign_shift(next_day, selected_for_night, "L")
-                
-                used_workers.append(selected_for_night)
-                worker_pool = [w for w in worker_pool if w != selected_for_night]
-            
-            last_night_worker = selected_for_night
-            day = day + 4
-
-
-    def _assign_coperia_nights(self, start_from_day=1):
-        """Marthita-focused night shifts for Coperia"""
+    def _assign_anchor_nights(self, start_from_day=1):
+        """Night cycles run by the rules.anchor_index worker, with cover on their rest days"""
         if start_from_day == 1:
-            self.schedule.clear()
-            self.total_hours.clear()
+            self.clear_schedule()
         
         day = start_from_day
-        other_workers = [w for w in self.selected_workers if w != "Marthita" and not self.is_part_time(w)]
+        anchor_index = self.roster.rules.anchor_index
+        other_workers = [i for i in self.roster.night_eligible_indices if i != anchor_index]
         used_workers = []
         cycle_day = 0  # Track where we are in the 6-day cycle
 
         while day <= self.days_in_month + self.preview_days:
             # Days 1-3: N shifts
             if cycle_day < 3:
-                self.assign_shift(day, "Marthita", "N")
+                self.assign_shift_at(day, anchor_index, "N")
             # Day 4: LN shift
             elif cycle_day == 3:
-                self.assign_shift(day, "Marthita", "LN")
+                self.assign_shift_at(day, anchor_index, "LN")
             # Day 5: SL + random worker N
             elif cycle_day == 4:
-                self.assign_shift(day, "Marthita", "SL")
-                replacement_worker = random.choice(other_workers)
-                self.assign_shift(day, replacement_worker, "N")
+                self.assign_shift_at(day, anchor_index, "SL")
+                replacement_worker = self.rng.choice(other_workers)
+                self.assign_shift_at(day, replacement_worker, "N")
             # Day 6: L + different random worker N
             elif cycle_day == 5:
-                self.assign_shift(day, "Marthita", "L")
-                available_workers = [w for w in other_workers if not self.get_shift(self.selected_workers.index(w), day-1) == "N"]
+                self.assign_shift_at(day, anchor_index, "L")
+                available_workers = [w for w in other_workers if not self.get_shift(w, day-1) == "N"]
                 if available_workers:
-                    second_replacement = random.choice(available_workers)
-                    self.assign_shift(day, second_replacement, "N")
+                    second_replacement = self.rng.choice(available_workers)
+                    self.assign_shift_at(day, second_replacement, "N")
             
             cycle_day = (cycle_day + 1) % 6  # Reset to 0 after completing a cycle
             day += 1
@@ -266,55 +516,49 @@ class SchedulerCore:
         if not all_sundays:
             return False
         
+        full_time = self.roster.full_time_indices
+        dl_capacity = self.roster.rules.dl_per_sunday
         dl_per_sunday = {day: [] for day in all_sundays}
-        worker_dls = {worker: [] for worker in self.selected_workers if not self.is_part_time(worker)}
+        worker_dls = {worker_index: [] for worker_index in full_time}
         
         # Count existing DLs
-        for worker in self.selected_workers:
-            if self.is_part_time(worker):
-                continue
-            worker_index = self.selected_workers.index(worker)
+        for worker_index in full_time:
             for sunday in all_sundays:
                 if self.get_shift(worker_index, sunday) == "DL":
-                    dl_per_sunday[sunday].append(worker)
-                    worker_dls[worker].append(sunday)
+                    dl_per_sunday[sunday].append(worker_index)
+                    worker_dls[worker_index].append(sunday)
         
         # First pass - assign first DLs
-        for worker in self.selected_workers:
-            if self.is_part_time(worker):
-                continue
-            if len(worker_dls[worker]) >= 2:
+        for worker_index in full_time:
+            if len(worker_dls[worker_index]) >= 2:
                 continue
                 
-            worker_index = self.selected_workers.index(worker)
             first_dl_assigned = False
             for i, sunday in enumerate(all_sundays):
-                if i % 2 == 0 and len(dl_per_sunday[sunday]) < 7:
+                if i % 2 == 0 and len(dl_per_sunday[sunday]) < dl_capacity:
                     if self.get_shift(worker_index, sunday) not in ["N", "LN", "SL"]:
-                        self.assign_shift(sunday, worker, "DL")
-                        dl_per_sunday[sunday].append(worker)
-                        worker_dls[worker].append(sunday)
+                        self.assign_shift_at(sunday, worker_index, "DL")
+                        dl_per_sunday[sunday].append(worker_index)
+                        worker_dls[worker_index].append(sunday)
                         first_dl_assigned = True
                         break
             
             # If couldn't assign on even Sundays, try odd ones
             if not first_dl_assigned:
                 for i, sunday in enumerate(all_sundays):
-                    if i % 2 == 1 and len(dl_per_sunday[sunday]) < 7:
+                    if i % 2 == 1 and len(dl_per_sunday[sunday]) < dl_capacity:
                         if self.get_shift(worker_index, sunday) not in ["N", "LN", "SL"]:
-                            self.assign_shift(sunday, worker, "DL")
-                            dl_per_sunday[sunday].append(worker)
-                            worker_dls[worker].append(sunday)
+                            self.assign_shift_at(sunday, worker_index, "DL")
+                            dl_per_sunday[sunday].append(worker_index)
+                            worker_dls[worker_index].append(sunday)
                             break
         
         # Second pass - assign second DLs
-        for worker in self.selected_workers:
-            if self.is_part_time(worker):
-                continue
-            if len(worker_dls[worker]) >= 2 or not worker_dls[worker]:
+        for worker_index in full_time:
+            if len(worker_dls[worker_index]) >= 2 or not worker_dls[worker_index]:
                 continue
                 
-            first_dl = worker_dls[worker][0]
+            first_dl = worker_dls[worker_index][0]
             first_dl_index = all_sundays.index(first_dl)
             
             # Try to maintain alternating pattern
@@ -322,23 +566,22 @@ class SchedulerCore:
                 target_index = first_dl_index + offset
                 if 0 <= target_index < len(all_sundays):
                     target_sunday = all_sundays[target_index]
-                    worker_index = self.selected_workers.index(worker)
-                    if (len(dl_per_sunday[target_sunday]) < 7 and 
+                    if (len(dl_per_sunday[target_sunday]) < dl_capacity and 
                         self.get_shift(worker_index, target_sunday) not in ["N", "LN", "SL"]):
-                        self.assign_shift(target_sunday, worker, "DL")
-                        dl_per_sunday[target_sunday].append(worker)
-                        worker_dls[worker].append(target_sunday)
+                        self.assign_shift_at(target_sunday, worker_index, "DL")
+                        dl_per_sunday[target_sunday].append(worker_index)
+                        worker_dls[worker_index].append(target_sunday)
                         break
         
         # Get workers missing DLs for warnings
-        missing_dls = [worker for worker, dls in worker_dls.items() if len(dls) < 2]
+        missing_dls = [self.selected_workers[worker_index] for worker_index, dls in worker_dls.items() if len(dls) < 2]
         return missing_dls
 
     def assign_l_days(self, start_from_day=1):
         """Assign L (free) days"""
         # First pass: Handle L days before SL
         for worker_index, worker in enumerate(self.selected_workers):
-            if self.is_part_time(worker):
+            if self.roster.part_time_mask[worker_index]:
                 continue
             for day in range(1, self.days_in_month + self.preview_days + 1):
                 if self.get_shift(worker_index, day) == "SL":
@@ -352,11 +595,11 @@ class SchedulerCore:
                     if needs_l:
                         l_day = day - 7
                         if l_day > 0 and self.can_place_l_here(worker_index, l_day):
-                            self.assign_shift(l_day, worker, "L")
+                            self.assign_shift_at(l_day, worker_index, "L")
         
         # Second pass: Handle consecutive working days
         for worker_index, worker in enumerate(self.selected_workers):
-            if self.is_part_time(worker):
+            if self.roster.part_time_mask[worker_index]:
                 continue
             consecutive_days = 0
             consecutive_start = 0
@@ -374,49 +617,35 @@ class SchedulerCore:
                         next_day = day + 1
                         if (next_day <= self.days_in_month + self.preview_days and 
                             self.can_place_l_here(worker_index, next_day)):
-                            self.assign_shift(next_day, worker, "L")
+                            self.assign_shift_at(next_day, worker_index, "L")
                             consecutive_days = 0
 
         # Return workers with violations (7+ consecutive days)
-        violations = []
-        for worker_index, worker in enumerate(self.selected_workers):
-            if self.is_part_time(worker):
-                continue
-            consecutive_days = 0
-            for day in range(1, self.days_in_month + self.preview_days + 1):
-                current_shift = self.get_shift(worker_index, day)
-                if current_shift in ["L", "SL", "DL"]:
-                    consecutive_days = 0
-                else:
-                    consecutive_days += 1
-                    if consecutive_days >= 7 and worker not in violations:
-                        violations.append(worker)
-        return violations
+        return [self.selected_workers[worker_index]
+                for worker_index in self.constraints().streak_workers()]
 
     def assign_dayshifts(self, start_from_day=1):
         """Assign morning (M) and afternoon (T) shifts"""
         worker_shift_type = {}
         last_shift = {}  # Track the last non-free shift for each worker
         
+        rules = self.roster.rules
+        # A worker under the opposite_shift rule is handled separately below
+        follower_index, leader_index = rules.opposite_shift or (None, None)
+        regular_workers = [i for i in self.roster.full_time_indices if i != follower_index]
+        
         # Initialize shift types
-        for worker in self.selected_workers:
-            if self.is_part_time(worker):
-                continue
-            if worker != "Marianella":  # Keep original Marianella condition
-                worker_shift_type[worker] = random.choice(['M', 'T'])
-                last_shift[worker] = worker_shift_type[worker]
+        for worker_index in regular_workers:
+            worker_shift_type[worker_index] = self.rng.choice(['M', 'T'])
+            last_shift[worker_index] = worker_shift_type[worker_index]
+        
         
         # Assign shifts day by day
         for day in range(start_from_day, self.days_in_month + self.preview_days + 1):
             morning_count = afternoon_count = 0
             
             # Count existing shifts
-            for worker in self.selected_workers:
-                if self.is_part_time(worker):
-                    continue
-                if worker == "Marianella":
-                    continue
-                worker_index = self.selected_workers.index(worker)
+            for worker_index in regular_workers:
                 current_shift = self.get_shift(worker_index, day)
                 if current_shift == 'M':
                     morning_count += 1
@@ -424,14 +653,7 @@ class SchedulerCore:
                     afternoon_count += 1
             
             # Handle regular workers
-            for worker in self.selected_workers:
-                if self.is_part_time(worker):
-                    continue
-                if worker == "Marianella":
-                    continue
-                    
-                worker_index = self.selected_workers.index(worker)
-                
+            for worker_index in regular_workers:
                 # Skip if already has a shift
                 if self.get_shift(worker_index, day) in ["N", "LN", "SL", "DL", "L", "M", "T"]:
                     continue
@@ -441,61 +663,60 @@ class SchedulerCore:
                     prev_shift = self.get_shift(worker_index, day - 1)
                     if prev_shift in ["L", "SL", "DL"]:  # After a free day
                         # Switch from M to T or T to M
-                        if last_shift.get(worker) == 'M':
-                            worker_shift_type[worker] = 'T'
-                        elif last_shift.get(worker) == 'T':
-                            worker_shift_type[worker] = 'M'
+                        if last_shift.get(worker_index) == 'M':
+                            worker_shift_type[worker_index] = 'T'
+                        elif last_shift.get(worker_index) == 'T':
+                            worker_shift_type[worker_index] = 'M'
                 
                 # STRICT T->M VALIDATION
                 if day > 1 and self.get_shift(worker_index, day - 1) == "T":
-                    self.assign_shift(day, worker, "T")
+                    self.assign_shift_at(day, worker_index, "T")
                     afternoon_count += 1
-                    worker_shift_type[worker] = "T"
-                    last_shift[worker] = "T"
+                    worker_shift_type[worker_index] = "T"
+                    last_shift[worker_index] = "T"
                     continue
                 
                 # Regular shift assignment if not forced to T
-                if morning_count >= 4:
-                    worker_shift_type[worker] = 'T'
-                elif afternoon_count >= 5:
-                    worker_shift_type[worker] = 'M'
+                if morning_count >= rules.morning_cap:
+                    worker_shift_type[worker_index] = 'T'
+                elif afternoon_count >= rules.afternoon_cap:
+                    worker_shift_type[worker_index] = 'M'
                 
-                self.assign_shift(day, worker, worker_shift_type[worker])
-                last_shift[worker] = worker_shift_type[worker]
-                if worker_shift_type[worker] == 'M':
+                self.assign_shift_at(day, worker_index, worker_shift_type[worker_index])
+                last_shift[worker_index] = worker_shift_type[worker_index]
+                if worker_shift_type[worker_index] == 'M':
                     morning_count += 1
                 else:
                     afternoon_count += 1
             
-            # Now handle Marianella separately (keep existing Marianella logic)
-            if self.has_special_rule('marianella_javiera'):
-                marianella_index = self.selected_workers.index("Marianella")
-                javiera_index = self.selected_workers.index("Javiera")
-                
-                if not self.get_shift(marianella_index, day):
+            # Now handle the opposite_shift worker: the opposite of whoever they follow
+            if follower_index is not None:
+                if not self.get_shift(follower_index, day):
                     # First check T->T rule
-                    if day > 1 and self.get_shift(marianella_index, day - 1) == "T":
-                        self.assign_shift(day, "Marianella", "T")
+                    if day > 1 and self.get_shift(follower_index, day - 1) == "T":
+                        self.assign_shift_at(day, follower_index, "T")
                         continue
                     
-                    # Follow Javiera's opposite schedule
-                    javiera_shift = self.get_shift(javiera_index, day)
-                    if javiera_shift == "M":
-                        self.assign_shift(day, "Marianella", "T")
-                    elif javiera_shift == "T":
-                        if day > 1 and self.get_shift(marianella_index, day - 1) == "T":
-                            self.assign_shift(day, "Marianella", "T")  # Keep T after T
+                    # Follow the leader's opposite schedule
+                    leader_shift = self.get_shift(leader_index, day)
+                    if leader_shift == "M":
+                        self.assign_shift_at(day, follower_index, "T")
+                    elif leader_shift == "T":
+                        if day > 1 and self.get_shift(follower_index, day - 1) == "T":
+                            self.assign_shift_at(day, follower_index, "T")  # Keep T after T
                         else:
-                            self.assign_shift(day, "Marianella", "M")
-                    elif javiera_shift in ["N", "LN", "L", "SL", "DL"]:
-                        if day > 1 and self.get_shift(marianella_index, day - 1) == "T":
-                            self.assign_shift(day, "Marianella", "T")
+                            self.assign_shift_at(day, follower_index, "M")
+                    elif leader_shift in ["N", "LN", "L", "SL", "DL"]:
+                        if day > 1 and self.get_shift(follower_index, day - 1) == "T":
+                            self.assign_shift_at(day, follower_index, "T")
                         else:
-                            self.assign_shift(day, "Marianella", "M")
+                            self.assign_shift_at(day, follower_index, "M")
     def clear_schedule(self):
         """Clear the entire schedule"""
-        self.schedule.clear()
-        self.total_hours.clear()
+        for row in self.grid:
+            row[:] = bytes(len(row))
+        self.constraint_tracker = None
+        self.reset_total_hours()
 
     def can_place_l_here(self, worker_index, day):
         """Check if an L day can be placed on this day"""
@@ -513,20 +734,174 @@ class SchedulerCore:
     def get_month_schedule(self):
         """Return the complete schedule in a structured format"""
         schedule_data = []
+        names = self.shift_names
         for worker_index, worker in enumerate(self.selected_workers):
+            row = self.grid[worker_index]
             worker_schedule = {
                 'name': worker,
-                'shifts': {},
+                'shifts': {day: names[code] for day, code in enumerate(row) if code},
                 'total_hours': self.total_hours.get(worker_index, 0),
-                'part_time': self.is_part_time(worker)
+                'part_time': self.roster.part_time_mask[worker_index]
             }
-            for day in range(1, self.days_in_month + self.preview_days + 1):
-                shift = self.get_shift(worker_index, day)
-                if shift:
-                    worker_schedule['shifts'][day] = shift
             schedule_data.append(worker_schedule)
         return schedule_data
 
+    def get_preview_week(self):
+        """Return the shifts of days 1-7 for every worker as nested tuples"""
+        names = self.shift_names
+        return tuple(tuple(names[code] for code in row[1:8]) for row in self.grid)
+
+    def load_month_schedule(self, schedule_data):
+        """Load a schedule in get_month_schedule format into the grid"""
+        self.clear_schedule()
+        for worker_schedule in schedule_data:
+            worker_index = self.worker_indices.get(worker_schedule['name'])
+            if worker_index is None:
+                continue
+            row = self.grid[worker_index]
+            for day, shift in worker_schedule['shifts'].items():
+                day = int(day)
+                if 0 < day < len(row):
+                    row[day] = self.intern_shift(shift)
+        self.constraint_tracker = None
+        self.update_total_hours()
+
+    def load_shift_rows(self, rows):
+        """Write [(worker, first_day, shifts)] straight into the grid.
+
+        shifts holds one entry per day from first_day; empty entries and
+        unknown workers are skipped. Hours and constraints are rebuilt
+        once at the end instead of per cell.
+        """
+        for worker, first_day, shifts in rows:
+            worker_index = self.worker_indices.get(worker)
+            if worker_index is None:
+                continue
+            row = self.grid[worker_index]
+            for day, shift in enumerate(shifts, first_day):
+                if shift and 0 < day < len(row):
+                    row[day] = self.intern_shift(shift)
+        self.constraint_tracker = None
+        self.update_total_hours()
+
+    def repair_schedule(self, start_from_day=1, max_iterations=REPAIR_MAX_ITERATIONS):
+        """Fix rule violations left by the assigners without regenerating.
+
+        Runs LocalSearch (M/T swaps, moved L days, DL Sundays) from
+        start_from_day until no fixable violation is left or
+        max_iterations is spent. Night cycles aren't touched. Returns the
+        workers still missing DLs and the workers left with 7+
+        consecutive days.
+        """
+        LocalSearch(self, start_from_day).run(time_budget=None, max_iterations=max_iterations,
+                                              stop_when_feasible=True)
+        return self.remaining_violations()
+
+    def remaining_violations(self):
+        """Return (workers missing DLs, workers with 7+ consecutive days) from the tracker"""
+        tracker = self.constraints()
+        return ([self.selected_workers[i] for i in tracker.missing_dl_workers()],
+                [self.selected_workers[i] for i in tracker.streak_workers()])
+
+    def current_score(self):
+        """Score the schedule as it stands, from the tracker"""
+        return self.score_schedule(*self.remaining_violations())
+
+    def _run_phases(self, phases, engine, time_budget, max_iterations, start_from_day, progress,
+                    deadline=None):
+        """Run [(phase, step)] then repair and the optional search stage.
+
+        deadline, an absolute time.monotonic() value, caps the search on
+        top of time_budget.
+
+        progress, if given, is called as progress(phase, info) after each
+        phase with info['score'] from current_score(), and as
+        progress('searching', stats) every schedule_search.PROGRESS_INTERVAL
+        seconds while the search runs.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+
+        def phase_done(phase):
+            if progress is not None:
+                progress(phase, {'score': self.current_score()})
+
+        for phase, step in phases:
+            step()
+            phase_done(phase)
+        violations = self.repair_schedule(start_from_day)
+        phase_done('repair')
+        self.search_stats = None
+        if engine == 'search':
+            if time_budget is None and max_iterations is None and deadline is None:
+                time_budget = DEFAULT_TIME_BUDGET
+            on_progress = None
+            if progress is not None:
+                on_progress = lambda stats: progress('searching', stats)
+            self.search_stats = LocalSearch(self, start_from_day).run(
+                time_budget=time_budget, max_iterations=max_iterations, progress=on_progress,
+                deadline=deadline)
+            violations = self.remaining_violations()
+            phase_done('search')
+        return violations
+
+    def generate_schedule(self, engine='greedy', time_budget=None, max_iterations=None, progress=None,
+                          deadline=None):
+        """Run the full generation pipeline for the current group and month.
+
+        The greedy assigners are followed by repair_schedule(); engine
+        'search' then optimizes further with a LocalSearch run of
+        time_budget seconds, ending by the absolute time.monotonic()
+        deadline if one is given (DEFAULT_TIME_BUDGET if no limit is
+        given); its statistics are kept in search_stats. See _run_phases
+        for progress. Returns the workers missing DLs and the workers
+        left with 7+ consecutive days.
+        """
+        return self._run_phases([
+            ('nights', self.assign_night_shifts),
+            ('dls', self.assign_free_sundays),
+            ('l_days', self.assign_l_days),
+            ('dayshifts', self.assign_dayshifts)
+        ], engine, time_budget, max_iterations, 1, progress, deadline)
+
+    def complete_schedule(self, engine='greedy', time_budget=None, max_iterations=None, progress=None):
+        """Generate the rest of a month whose preview week was carried over.
+
+        Like generate_schedule(), but nights continue the cycles of the
+        preview week and repair and search leave that week as it is.
+        """
+        return self._run_phases([
+            ('nights', self.assign_night_shifts_after_transfer),
+            ('dls', self.assign_free_sundays),
+            ('l_days', self.assign_l_days),
+            ('dayshifts', self.assign_dayshifts)
+        ], engine, time_budget, max_iterations, self.preview_days + 1, progress)
+
+    def score_schedule(self, missing_dls, violations):
+        """Score the current schedule from generate_schedule's results.
+
+        Returns the count for each SCORE_WEIGHTS component plus the
+        weighted 'total' (lower is better).
+        """
+        morning = self.shift_codes["M"]
+        afternoon = self.shift_codes["T"]
+        total_days = self.days_in_month + self.preview_days
+        t_to_m = len(self.constraints().t_to_m_violations())
+        
+        imbalance = 0
+        for day in range(1, total_days + 1):
+            day_codes = [row[day] for row in self.grid]
+            imbalance += abs(day_codes.count(morning) - day_codes.count(afternoon))
+        
+        score = {
+            'missing_dls': len(missing_dls),
+            'streak_violations': len(violations),
+            't_to_m_violations': t_to_m,
+            'shift_imbalance': imbalance
+        }
+        score['total'] = sum(SCORE_WEIGHTS[name] * count for name, count in score.items())
+        return score
+
     def transfer_to_next_month(self):
         """Transfer preview data to next month ONLY"""
         # Store preview data
@@ -556,27 +931,24 @@ class SchedulerCore:
             for day in range(1, 8):
                 shift = preview_data[worker][day - 1]
                 if shift:
-                    self.assign_shift(day, worker, shift)
-        
-        self.update_total_hours()
+                    self.assign_shift_at(day, worker_index, shift)
 
         
     def assign_night_shifts_after_transfer(self):
         """Special version of night shift assignment for after month transfer"""
-        if self.current_group == 'sala':
-            self._assign_sala_nights_after_transfer()
-        elif self.current_group == 'cocina':
-            self._assign_cocina_nights_after_transfer()
-        elif self.current_group == 'coperia':
-            self._assign_coperia_nights_after_transfer()
-
-    def _assign_sala_nights_after_transfer(self):
-        """Sala version of night shifts after transfer - handles 3 workers per cycle"""
+        if self.roster.rules.night_cycle == 'anchor':
+            self._assign_anchor_nights_after_transfer()
+        else:
+            self._assign_team_nights_after_transfer()
+
+    def _assign_team_nights_after_transfer(self):
+        """Team night cycles after transfer: finish the preview week's cycles, then continue"""
+        team_size = self.roster.rules.team_size
         # Step 1: Identify and complete preview cycles
         preview_night_workers = []
         
         for worker_index, worker in enumerate(self.selected_workers):
-            if self.is_part_time(worker):
+            if self.roster.part_time_mask[worker_index]:
                 continue
             for day in range(1, 8):
                 if self.get_shift(worker_index, day) == "N":
@@ -589,47 +961,47 @@ class SchedulerCore:
                             break
                     if sequence:  # Found a sequence
                         if sequence[-1] == "LN":
-                            preview_night_workers.append((worker, day, "needs_sl_l"))
+                            preview_night_workers.append((worker_index, day, "needs_sl_l"))
                         elif len(sequence) == 3:
-                            preview_night_workers.append((worker, day, "needs_ln_sl_l"))
+                            preview_night_workers.append((worker_index, day, "needs_ln_sl_l"))
                         elif len(sequence) == 2:
-                            preview_night_workers.append((worker, day, "needs_n_ln_sl_l"))
+                            preview_night_workers.append((worker_index, day, "needs_n_ln_sl_l"))
                         elif len(sequence) == 1:
-                            preview_night_workers.append((worker, day, "needs_nn_ln_sl_l"))
+                            preview_night_workers.append((worker_index, day, "needs_nn_ln_sl_l"))
                     break
 
         # Step 2: Complete existing night cycles
         latest_completion = 8
         workers_in_cycles = set()  # Keep track of all workers involved in night cycles
         
-        for worker, start_day, completion_type in preview_night_workers:
-            workers_in_cycles.add(worker)
+        for worker_index, start_day, completion_type in preview_night_workers:
+            workers_in_cycles.add(worker_index)
             
             if completion_type == "needs_sl_l":
-                self.assign_shift(start_day + 4, worker, "SL")
-                self.assign_shift(start_day + 5, worker, "L")
+                self.assign_shift_at(start_day + 4, worker_index, "SL")
+                self.assign_shift_at(start_day + 5, worker_index, "L")
                 latest_completion = max(latest_completion, start_day + 5)
             elif completion_type == "needs_ln_sl_l":
-                self.assign_shift(start_day + 3, worker, "LN")
-                self.assign_shift(start_day + 4, worker, "SL")
-                self.assign_shift(start_day + 5, worker, "L")
+                self.assign_shift_at(start_day + 3, worker_index, "LN")
+                self.assign_shift_at(start_day + 4, worker_index, "SL")
+                self.assign_shift_at(start_day + 5, worker_index, "L")
                 latest_completion = max(latest_completion, start_day + 5)
             elif completion_type == "needs_n_ln_sl_l":
-                self.assign_shift(start_day + 2, worker, "N")
-                self.assign_shift(start_day + 3, worker, "LN")
-                self.assign_shift(start_day + 4, worker, "SL")
-                self.assign_shift(start_day + 5, worker, "L")
+                self.assign_shift_at(start_day + 2, worker_index, "N")
+                self.assign_shift_at(start_day + 3, worker_index, "LN")
+                self.assign_shift_at(start_day + 4, worker_index, "SL")
+                self.assign_shift_at(start_day + 5, worker_index, "L")
                 latest_completion = max(latest_completion, start_day + 5)
             elif completion_type == "needs_nn_ln_sl_l":
-                self.assign_shift(start_day + 1, worker, "N")
-                self.assign_shift(start_day + 2, worker, "N")
-                self.assign_shift(start_day + 3, worker, "LN")
-                self.assign_shift(start_day + 4, worker, "SL")
-                self.assign_shift(start_day + 5, worker, "L")
+                self.assign_shift_at(start_day + 1, worker_index, "N")
+                self.assign_shift_at(start_day + 2, worker_index, "N")
+                self.assign_shift_at(start_day + 3, worker_index, "LN")
+                self.assign_shift_at(start_day + 4, worker_index, "SL")
+                self.assign_shift_at(start_day + 5, worker_index, "L")
                 latest_completion = max(latest_completion, start_day + 5)
 
         # Step 3: Setup initial pool for new assignments
-        worker_pool = [w for w in self.selected_workers if not self.is_part_time(w) and w not in workers_in_cycles]
+        worker_pool = [i for i in self.roster.night_eligible_indices if i not in workers_in_cycles]
         used_workers = []
         last_night_workers = []
         
@@ -640,24 +1012,24 @@ class SchedulerCore:
             for worker_index, worker in enumerate(self.selected_workers):
                 if self.get_shift(worker_index, check_day) == "SL":
                     sl_count += 1
-            if sl_count == 3:  # Found where a group hits SL
+            if sl_count == team_size:  # Found where a team hits SL
                 day = check_day
                 break
 
         # Step 4: Continue with regular night shift assignment
         while day <= self.days_in_month + self.preview_days:
             # Replenish pool if needed
-            if len(worker_pool) < 3:
-                worker_pool = [w for w in self.selected_workers if not self.is_part_time(w)]
+            if len(worker_pool) < team_size:
+                worker_pool = list(self.roster.night_eligible_indices)
                 worker_pool = [w for w in worker_pool if w not in last_night_workers]  # Avoid back-to-back
                 used_workers = []
 
             # Select workers for this cycle
             available_pool = [w for w in worker_pool if w not in last_night_workers]
-            if len(available_pool) >= 3:
-                selected_for_night = random.sample(available_pool, 3)
+            if len(available_pool) >= team_size:
+                selected_for_night = self.rng.sample(available_pool, team_size)
             else:
-                selected_for_night = random.sample(worker_pool, 3)
+                selected_for_night = self.rng.sample(worker_pool, team_size)
 
             # Assign the cycle
             cycle_complete = True
@@ -667,22 +1039,21 @@ class SchedulerCore:
                     cycle_complete = False
                     break
                 
-                for worker in selected_for_night:
+                for worker_index in selected_for_night:
                     shift_type = "N" if day_offset < 3 else "LN"
-                    self.assign_shift(current_day, worker, shift_type)
+                    self.assign_shift_at(current_day, worker_index, shift_type)
             
             # Handle rest days after cycle
             if cycle_complete:
                 rest_day = day + 4
                 if rest_day <= self.days_in_month + self.preview_days:
-                    for worker in selected_for_night:
-                        self.assign_shift(rest_day, worker, "SL")
+                    for worker_index in selected_for_night:
+                        self.assign_shift_at(rest_day, worker_index, "SL")
                         
                         next_day = rest_day + 1
                         if next_day <= self.days_in_month + self.preview_days:
-                            worker_index = self.selected_workers.index(worker)
                             if self.get_shift(worker_index, next_day) != "DL":
-                                self.assign_shift(next_day, worker, "L")
+                                self.assign_shift_at(next_day, worker_index, "L")
                 
                 used_workers.extend(selected_for_night)
                 worker_pool = [w for w in worker_pool if w not in selected_for_night]
@@ -690,108 +1061,15 @@ class SchedulerCore:
             last_night_workers = selected_for_night
             day = day + 4
     
-    def _assign_cocina_nights_after_transfer(self):
-        """Cocina version of nights after transfer - single worker cycles"""
-        # Step 1: Identify preview cycles
-        preview_night_workers = []
-        
-        for worker_index, worker in enumerate(self.selected_workers):
-            if self.is_part_time(worker):  # Skip part-time workers
-                continue
-            for day in range(1, 8):
-                if self.get_shift(worker_index, day) == "N":
-                    # Count consecutive N/LN
-                    sequence = []
-                    for check_day in range(day, 8):
-                        check_shift = self.get_shift(worker_index, check_day)
-                        if check_shift in ["N", "LN"]:
-                            sequence.append(check_shift)
-                        else:
-                            break
-                    if sequence:  # Found a sequence
-                        if sequence[-1] == "LN":
-                            preview_night_workers.append((worker, day, "needs_sl_l"))
-                        elif len(sequence) == 3:
-                            preview_night_workers.append((worker, day, "needs_ln_sl_l"))
-                        elif len(sequence) == 2:
-                            preview_night_workers.append((worker, day, "needs_n_ln_sl_l"))
-                        elif len(sequence) == 1:
-                            preview_night_workers.append((worker, day, "needs_nn_ln_sl_l"))
-                    break
-
-        # Step 2: Complete existing night cycles
-        latest_completion = 8
-        for worker, start_day, completion_type in preview_night_workers:
-            if completion_type == "needs_sl_l":
-                self.assign_shift(start_day + 4, worker, "SL")
-                self.assign_shift(start_day + 5, worker, "L")
-                latest_completion = max(latest_completion, start_day + 5)
-            elif completion_type == "needs_ln_sl_l":
-                self.assign_shift(start_day + 3, worker, "LN")
-                self.assign_shift(start_day + 4, worker, "SL")
-                self.assign_shift(start_day + 5, worker, "L")
-                latest_completion = max(latest_completion, start_day + 5)
-            elif completion_type == "needs_n_ln_sl_l":
-                self.assign_shift(start_day + 2, worker, "N")
-                self.assign_shift(start_day + 3, worker, "LN")
-                self.assign_shift(start_day + 4, worker, "SL")
-                self.assign_shift(start_day + 5, worker, "L")
-                latest_completion = max(latest_completion, start_day + 5)
-            elif completion_type == "needs_nn_ln_sl_l":
-                self.assign_shift(start_day + 1, worker, "N")
-                self.assign_shift(start_day + 2, worker, "N")
-                self.assign_shift(start_day + 3, worker, "LN")
-                self.assign_shift(start_day + 4, worker, "SL")
-                self.assign_shift(start_day + 5, worker, "L")
-                latest_completion = max(latest_completion, start_day + 5)
-
-        # Step 3: Continue with regular night assignment from latest completion
-        day = latest_completion
-        worker_pool = [w for w in self.selected_workers if not self.is_part_time(w)]
-        used_workers = []
-        last_night_worker = None
-        
-        while day <= self.days_in_month + self.preview_days:
-            if len(worker_pool) < 1:
-                worker_pool = [w for w in self.selected_workers if not self.is_part_time(w)]
-                used_workers = []
-            
-            available_pool = [w for w in worker_pool if w != last_night_worker]
-            if len(available_pool) >= 1:
-                selected_for_night = random.choice(available_pool)
-            else:
-                selected_for_night = random.choice(worker_pool)
-            
-            for day_offset in range(4):
-                current_day = day + day_offset
-                if current_day > self.days_in_month + self.preview_days:
-                    break
-                
-                shift_type = "N" if day_offset < 3 else "LN"
-                self.assign_shift(current_day, selected_for_night, shift_type)
-            
-            rest_day = day + 4
-            if rest_day <= self.days_in_month + self.preview_days:
-                self.assign_shift(rest_day, selected_for_night, "SL")
-                next_day = rest_day + 1
-                if next_day <= self.days_in_month + self.preview_days:
-                    if self.get_shift(self.selected_workers.index(selected_for_night), next_day) != "DL":
-                        self.assign_shift(next_day, selected_for_night, "L")
-            
-            used_workers.append(selected_for_night)
-            worker_pool = [w for w in worker_pool if w != selected_for_night]
-            last_night_worker = selected_for_night
-            day = day + 4
-
-    def _assign_coperia_nights_after_transfer(self):
-        """Coperia version of nights after transfer - Marthita focused"""
-        marthita_index = self.selected_workers.index("Marthita")
-        other_workers = [w for w in self.selected_workers if w != "Marthita" and not self.is_part_time(w)]
+    def _assign_anchor_nights_after_transfer(self):
+        """Anchor night cycles after transfer: pick the anchor's cycle back up after the preview week"""
+        anchor_index = self.roster.rules.anchor_index
+        other_workers = [i for i in self.roster.night_eligible_indices if i != anchor_index]
 
         # Check if we end with exactly 2 Ns
         last_shifts = []
         for day in range(6, 8):  # Check days 6 and 7
-            shift = self.get_shift(marthita_index, day)
+            shift = self.get_shift(anchor_index, day)
             last_shifts.append(shift)
 
         if last_shifts == ["N", "N"]:
@@ -799,18 +1077,18 @@ class SchedulerCore:
             # Just need to add N LN SL L to complete it
             day = 8  # Start after preview week
             if day <= self.days_in_month + self.preview_days:
-                self.assign_shift(day, "Marthita", "N")
+                self.assign_shift_at(day, anchor_index, "N")
                 if day + 1 <= self.days_in_month + self.preview_days:
-                    self.assign_shift(day + 1, "Marthita", "LN")
+                    self.assign_shift_at(day + 1, anchor_index, "LN")
                     if day + 2 <= self.days_in_month + self.preview_days:
-                        self.assign_shift(day + 2, "Marthita", "SL")
-                        replacement_worker = random.choice(other_workers)
-                        self.assign_shift(day + 2, replacement_worker, "N")
+                        self.assign_shift_at(day + 2, anchor_index, "SL")
+                        replacement_worker = self.rng.choice(other_workers)
+                        self.assign_shift_at(day + 2, replacement_worker, "N")
                         if day + 3 <= self.days_in_month + self.preview_days:
-                            self.assign_shift(day + 3, "Marthita", "L")
+                            self.assign_shift_at(day + 3, anchor_index, "L")
                             available_workers = [w for w in other_workers if w != replacement_worker]
-                            second_replacement = random.choice(available_workers)
-                            self.assign_shift(day + 3, second_replacement, "N")
+                            second_replacement = self.rng.choice(available_workers)
+                            self.assign_shift_at(day + 3, second_replacement, "N")
             day = day + 4  # Move to start of next cycle
         else:
             # Find where we are in current cycle and continue from there
@@ -824,20 +1102,100 @@ class SchedulerCore:
                 if current_day > self.days_in_month + self.preview_days:
                     break
                 shift_type = "N" if i < 3 else "LN"
-                self.assign_shift(current_day, "Marthita", shift_type)
+                self.assign_shift_at(current_day, anchor_index, shift_type)
             
             # Rest days
             rest_day = day + 4
             if rest_day <= self.days_in_month + self.preview_days:
-                self.assign_shift(rest_day, "Marthita", "SL")
-                replacement_worker = random.choice(other_workers)
-                self.assign_shift(rest_day, replacement_worker, "N")
+                self.assign_shift_at(rest_day, anchor_index, "SL")
+                replacement_worker = self.rng.choice(other_workers)
+                self.assign_shift_at(rest_day, replacement_worker, "N")
                 
                 next_day = rest_day + 1
                 if next_day <= self.days_in_month + self.preview_days:
-                    self.assign_shift(next_day, "Marthita", "L")
+                    self.assign_shift_at(next_day, anchor_index, "L")
                     available_workers = [w for w in other_workers if w != replacement_worker]
-                    second_replacement = random.choice(available_workers)
-                    self.assign_shift(next_day, second_replacement, "N")
+                    second_replacement = self.rng.choice(available_workers)
+                    self.assign_shift_at(next_day, second_replacement, "N")
             
-            day = rest_day + 2
\ No newline at end of file
+            day = rest_day + 2
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool():
+    """Return the shared process pool used for batch and candidate generation.
+
+    The pool is created on first use, usually inside a threaded web
+    worker, so its processes are spawned rather than forked: a fork would
+    copy locks other threads hold at that moment (SQLite connections,
+    caches, job threads) into every child.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+def generate_group(group, year, month, seed, engine='greedy', time_budget=None):
+    """Generate one group's month from scratch (runs inside a pool worker)"""
+    scheduler = SchedulerCore(group)
+    scheduler.initialize_month(year, month)
+    scheduler.set_seed(seed)
+    scheduler.generate_schedule(engine, time_budget)
+    return scheduler.get_month_schedule()
+
+def generate_all_groups(year, month, seed, groups=None, engine='greedy', time_budget=None):
+    """Generate every group's month concurrently, all from the same seed.
+
+    groups defaults to every group in the staff config. Returns
+    {group: schedule} with each schedule in get_month_schedule format.
+    """
+    if groups is None:
+        groups = list(get_rosters())
+    pool = get_process_pool()
+    futures = {group: pool.submit(generate_group, group, year, month, seed, engine, time_budget)
+               for group in groups}
+    return {group: future.result() for group, future in futures.items()}
+
+def generate_candidate(group, year, month, seed, engine='greedy', time_budget=None, deadline=None,
+                       required=True):
+    """Generate and score one candidate schedule (runs inside a pool worker).
+
+    deadline is an absolute time.monotonic() value (the clock is shared
+    by every process on the host); a candidate that isn't required and
+    only starts after it is skipped. Returns (seed, score, schedule,
+    search iterations), or None for a skipped candidate.
+    """
+    if not required and deadline is not None and time.monotonic() >= deadline:
+        return None
+    scheduler = SchedulerCore(group)
+    scheduler.initialize_month(year, month)
+    scheduler.set_seed(seed)
+    missing_dls, violations = scheduler.generate_schedule(engine, time_budget, deadline=deadline)
+    iterations = scheduler.search_stats['iterations'] if scheduler.search_stats else 0
+    return (seed, scheduler.score_schedule(missing_dls, violations), scheduler.get_month_schedule(),
+            iterations)
+
+def generate_best_candidate(group, year, month, seeds, engine='greedy', time_budget=None, deadline=None):
+    """Generate one candidate per seed across the process pool and keep the best.
+
+    With an absolute time.monotonic() deadline, every search stops by it
+    and candidates still queued at that point are skipped (the first
+    seed always runs). Returns (seed, score, schedule) of the
+    lowest-scoring candidate, ties going to the earliest seed, plus the
+    search iterations of all candidates.
+    """
+    seeds = list(seeds)
+    pool = get_process_pool()
+    chunksize = max(1, len(seeds) // (4 * (os.cpu_count() or 1)))
+    results = pool.map(generate_candidate,
+                       [group] * len(seeds), [year] * len(seeds), [month] * len(seeds), seeds,
+                       [engine] * len(seeds), [time_budget] * len(seeds), [deadline] * len(seeds),
+                       [index == 0 for index in range(len(seeds))],
+                       chunksize=chunksize)
+    results = [result for result in results if result is not None]
+    seed, score, schedule, _ = min(results, key=lambda result: result[1]['total'])
+    return seed, score, schedule, sum(result[3] for result in results)
@@ -0,0 +1,43 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+class SqliteDatabase:
+    """A SQLite file shared by every worker process.
+
+    The database runs in WAL mode so readers don't block the writer, and
+    each thread gets its own connection. Statements autocommit; use
+    transaction() when a read and a write have to be atomic.
+    """
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+        self.connect().execute("PRAGMA journal_mode=WAL")
+
+    def connect(self):
+        """Return this thread's connection, opening it on first use"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            # Transactions are managed explicitly with BEGIN IMMEDIATE
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        """Run the block in a write transaction and yield the connection.
+
+        BEGIN IMMEDIATE takes the write lock up front, so anything read in
+        the block stays valid until it commits. Any exception rolls back.
+        """
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from schedule_rules import compile_rules
+
+# Staff config read by every SchedulerCore (override with STAFF_CONFIG)
+STAFF_CONFIG_PATH = os.environ.get(
+    'STAFF_CONFIG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'staff_config.json')
+)
+
+# Workers taking part in each special rule
+SPECIAL_RULE_WORKERS = {
+    'marianella_javiera': ("Marianella", "Javiera")
+}
+
+# Read-only view of a staff group, compiled once per config load and shared
+# by every SchedulerCore. The *_mask fields hold one boolean per worker index.
+Roster = namedtuple('Roster', [
+    'group', 'name', 'workers', 'worker_indices',
+    'full_time_mask', 'part_time_mask', 'night_eligible_mask', 'special_rule_mask',
+    'full_time_indices', 'night_eligible_indices', 'part_time_workers', 'special_rules',
+    'rules', 'fingerprint'
+])
+
+def _string_list(group, key, value):
+    if not isinstance(value, list) or not all(isinstance(item, str) and item for item in value):
+        raise ValueError(f"{group}: {key} must be a list of names")
+    return value
+
+def validate_group_config(group, group_config):
+    """Check one group's entry in the staff config, raising ValueError if it's malformed"""
+    if not isinstance(group_config, dict):
+        raise ValueError(f"{group}: group config must be an object")
+    if not isinstance(group_config.get('name'), str):
+        raise ValueError(f"{group}: name must be a string")
+    full_time = _string_list(group, 'workers_full_time', group_config.get('workers_full_time'))
+    part_time = _string_list(group, 'workers_part_time', group_config.get('workers_part_time', []))
+    _string_list(group, 'special_rules', group_config.get('special_rules', []))
+    if not full_time:
+        raise ValueError(f"{group}: workers_full_time can't be empty")
+
+    workers = full_time + part_time
+    duplicates = sorted({worker for worker in workers if workers.count(worker) > 1})
+    if duplicates:
+        raise ValueError(f"{group}: workers listed more than once: {', '.join(duplicates)}")
+    if not isinstance(group_config.get('rules', {}), dict):
+        raise ValueError(f"{group}: rules must be an object")
+
+def compile_roster(group, group_config):
+    """Compile a staff group definition into a Roster"""
+    full_time = list(group_config['workers_full_time'])
+    part_time = list(group_config.get('workers_part_time', []))
+    # Combine full-time and part-time workers, maintaining order
+    workers = tuple(full_time + part_time)
+    special_rules = frozenset(group_config.get('special_rules', []))
+
+    rule_workers = set()
+    for rule in special_rules:
+        rule_workers.update(SPECIAL_RULE_WORKERS.get(rule, ()))
+
+    part_time_set = frozenset(part_time)
+    part_time_mask = tuple(worker in part_time_set for worker in workers)
+    full_time_mask = tuple(not is_part_time for is_part_time in part_time_mask)
+    full_time_indices = tuple(index for index, is_full_time in enumerate(full_time_mask) if is_full_time)
+    worker_indices = {worker: index for index, worker in enumerate(workers)}
+    # Only full-time workers take night cycles
+    rules = compile_rules(group, group_config, worker_indices, full_time_indices)
+
+    return Roster(
+        group=group,
+        name=group_config['name'],
+        workers=workers,
+        worker_indices=MappingProxyType(worker_indices),
+        full_time_mask=full_time_mask,
+        part_time_mask=part_time_mask,
+        night_eligible_mask=full_time_mask,
+        special_rule_mask=tuple(worker in rule_workers for worker in workers),
+        full_time_indices=full_time_indices,
+        night_eligible_indices=full_time_indices,
+        part_time_workers=part_time_set,
+        special_rules=special_rules,
+        rules=rules,
+        # Changes whenever anything that affects generation changes
+        fingerprint=hashlib.sha1(json.dumps(
+            [group, full_time, part_time, sorted(special_rules), rules.config]
+        ).encode('utf-8')).hexdigest()
+    )
+
+def compile_staff_config(config):
+    """Validate a parsed staff config and compile every group.
+
+    Returns a read-only {group: Roster} mapping.
+    """
+    if not isinstance(config, dict) or not config:
+        raise ValueError("Staff config must be an object with at least one group")
+    rosters = {}
+    for group, group_config in config.items():
+        validate_group_config(group, group_config)
+        rosters[group] = compile_roster(group, group_config)
+    return MappingProxyType(rosters)
+
+class RosterLoader:
+    """Loads the staff config and shares the compiled rosters.
+
+    The file is parsed and compiled once, then again only when its mtime
+    changes (checked at most every check_interval seconds), so roster
+    edits apply without restarting the server. If a changed file fails to
+    load, the error is reported and the previous rosters stay in use.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.rosters = None
+        self.mtime = None
+        self.next_check = 0.0
+
+    def load(self):
+        """Read and compile the config file"""
+        with open(self.path, encoding='utf-8') as config_file:
+            return compile_staff_config(json.load(config_file))
+
+    def get_rosters(self):
+        """Return {group: Roster}, reloading first if the file has changed"""
+        now = time.monotonic()
+        if self.rosters is not None and now < self.next_check:
+            return self.rosters
+
+        with self.lock:
+            if self.rosters is not None and now < self.next_check:
+                return self.rosters
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if self.rosters is None:
+                    raise
+                print(f"Keeping previous rosters, could not read {self.path}: {e}")
+                mtime = self.mtime
+            if mtime != self.mtime:
+                try:
+                    self.rosters = self.load()
+                except Exception as e:
+                    # Any error from a bad edit, not just ValueError, keeps the last good rosters
+                    if self.rosters is None:
+                        raise
+                    print(f"Keeping previous rosters, could not reload {self.path}: {e!r}")
+                # A broken file isn't retried until it changes again
+                self.mtime = mtime
+            self.next_check = now + self.check_interval
+            return self.rosters
+
+    def get_roster(self, group):
+        """Return the compiled Roster of a group, or None if there's no such group"""
+        return self.get_rosters().get(group)
+
+roster_loader = RosterLoader(STAFF_CONFIG_PATH)
+
+def get_roster(group):
+    """Return a group's Roster from the shared staff config"""
+    return roster_loader.get_roster(group)
+
+def get_rosters():
+    """Return {group: Roster} of every group in the shared staff config, in config order"""
+    return roster_loader.get_rosters()
@@ -0,0 +1,23 @@
+import os
+
+# Keep schedules and jobs in memory; must be set before app is imported
+os.environ['SCHEDULE_STORE'] = 'memory'
+
+import pytest
+
+import app as app_module
+from job_queue import JobQueue, MemoryJobStore
+from schedule_cache import ScheduleCache
+
+@pytest.fixture
+def app(monkeypatch):
+    """The app module with an empty store, empty caches and its own job queue"""
+    monkeypatch.setattr(app_module, 'schedule_store', app_module.open_schedule_store('memory'))
+    monkeypatch.setattr(app_module, 'generation_cache', ScheduleCache(max_size=32, ttl=3600))
+    monkeypatch.setattr(app_module, 'tracker_cache', ScheduleCache(max_size=32, ttl=3600))
+    monkeypatch.setattr(app_module, 'job_queue', JobQueue(MemoryJobStore(), max_workers=1, group_limit=1))
+    return app_module
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
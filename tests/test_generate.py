@@ -0,0 +1,50 @@
+import pytest
+
+def generate(client, **params):
+    response = client.post('/api/generate', json=dict({'group': 'sala', 'year': 2024, 'month': 5, 'seed': 1}, **params))
+    data = response.get_json()
+    assert data['success'], data
+    return data
+
+def test_deadline_and_time_budget_are_cached_apart(app, client):
+    generate(client, engine='search', time_budget_ms=20)
+    generate(client, deadline_ms=20)
+    assert app.generation_cache.stats()['hits'] == 0
+    generate(client, deadline_ms=20)
+    assert app.generation_cache.stats()['hits'] == 1
+
+def test_best_of_n_runs_candidates_in_the_pool(app, client):
+    data = generate(client, candidates=3)
+    assert data['best_of']['candidates'] == 3
+    # The winning seed alone reproduces the schedule
+    again = generate(client, seed=data['seed'], candidates=1)
+    assert again['schedule'] == data['schedule']
+
+def test_generate_all_stores_every_group(app, client):
+    response = client.post('/api/generate-all', json={'year': 2024, 'month': 6, 'seed': 2})
+    data = response.get_json()
+    assert data['success']
+    assert sorted(data['schedules']) == sorted(app.get_rosters())
+    for group, result in data['schedules'].items():
+        stored = app.schedule_store.load(group, 2024, 6)['schedule']
+        assert [{str(day): shift for day, shift in worker['shifts'].items()} for worker in stored] == \
+               [worker['shifts'] for worker in result['schedule']]
+
+def test_best_of_n_keeps_the_lowest_score(app, client):
+    best = generate(client, seed=10, candidates=4)
+    singles = [generate(client, seed=seed)['score']['total'] for seed in range(10, 14)]
+    assert best['score']['total'] == min(singles)
+    assert best['seed'] in range(10, 14)
+
+@pytest.mark.parametrize('group', ['sala', 'coperia'])
+def test_search_engine_never_scores_worse_than_greedy(client, group):
+    greedy = generate(client, group=group, seed=21)
+    search = generate(client, group=group, seed=21, engine='search', time_budget_ms=50)
+    assert search['engine'] == 'search' and search['iterations'] > 0
+    assert search['score']['total'] <= greedy['score']['total']
+
+@pytest.mark.parametrize('params', [{'engine': 'annealing'}, {'engine': 'search', 'time_budget_ms': 10 ** 6},
+                                    {'engine': 'search', 'time_budget_ms': 10000, 'candidates': 100}])
+def test_bad_engine_options_are_rejected(client, params):
+    response = client.post('/api/generate', json=dict({'group': 'sala', 'year': 2024, 'month': 5}, **params))
+    assert response.status_code == 400
@@ -0,0 +1,102 @@
+import io
+import threading
+import time
+
+import pytest
+from openpyxl import load_workbook
+
+from job_queue import JobLimitError, MemoryJobStore, SqliteJobStore
+
+def wait_for(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['job']['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'Job {job_id} still running')
+
+def submit(client, job_type, params):
+    response = client.post('/api/jobs', json={'type': job_type, 'params': params})
+    assert response.status_code == 202, response.get_json()
+    return response.get_json()['job_id']
+
+def test_generate_job_matches_the_request(app, client):
+    job = wait_for(client, submit(client, 'generate', {'group': 'cocina', 'year': 2024, 'month': 5, 'seed': 4}))
+    assert job['job']['status'] == 'done'
+    assert job['result']['success'] and job['result']['seed'] == 4
+    direct = client.post('/api/generate', json={'group': 'cocina', 'year': 2024, 'month': 5, 'seed': 4}).get_json()
+    assert job['result']['schedule'] == direct['schedule']
+
+def test_invalid_job_params_are_rejected_at_submit(client):
+    response = client.post('/api/jobs', json={'type': 'generate', 'params': {'group': 'nobody'}})
+    assert response.status_code == 400
+    response = client.post('/api/jobs', json={'type': 'export-table', 'params': {'format': 'xml'}})
+    assert response.status_code == 400
+
+def test_export_job_result_is_the_file(client):
+    client.post('/api/generate', json={'group': 'sala', 'year': 2024, 'month': 5, 'seed': 1})
+    job = wait_for(client, submit(client, 'export-excel', {}))
+    assert job['job']['status'] == 'done'
+    result = client.get(job['result_url'])
+    assert 'attachment' in result.headers['Content-Disposition']
+    assert load_workbook(io.BytesIO(result.data), read_only=True).sheetnames
+
+def test_export_of_nothing_stored_is_a_400_result(client):
+    job = wait_for(client, submit(client, 'export-table', {'start': '2030-01'}))
+    assert job['job']['status'] == 'done'
+    assert job['result_status'] == 400
+    assert not job['result']['success']
+
+def test_group_limit_and_cancel(app):
+    release = threading.Event()
+
+    def wait_for_cancel(job):
+        while not release.is_set():
+            job.check_cancelled()
+            time.sleep(0.01)
+        return {}
+
+    queue = app.job_queue
+    job_id = queue.submit('generate', 'sala', wait_for_cancel)
+    try:
+        with pytest.raises(JobLimitError):
+            queue.submit('generate', 'sala', wait_for_cancel)
+        assert queue.cancel(job_id) in ('queued', 'running')
+        deadline = time.monotonic() + 5
+        while queue.get(job_id)['status'] not in ('cancelled', 'done', 'failed'):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert queue.get(job_id)['status'] == 'cancelled'
+        # A cancelled job no longer counts against the limit
+        queue.submit('generate', 'sala', lambda job: {})
+    finally:
+        release.set()
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make_store(**ages):
+        if request.param == 'memory':
+            return MemoryJobStore(**ages)
+        return SqliteJobStore(str(tmp_path / 'jobs.db'), **ages)
+    return make_store
+
+def test_prune_keeps_running_jobs(make_store):
+    store = make_store(max_age=0)
+    store.create('long', 'export-excel', 'all', group_limit=1)
+    assert store.start('long')
+    store.create('other', 'generate', 'sala', group_limit=1)
+    assert store.get('long')['status'] == 'running'
+    with pytest.raises(JobLimitError):
+        store.create('next', 'export-excel', 'all', group_limit=1)
+    store.finish('long', result={'status_code': 200, 'mimetype': 'text/csv', 'headers': {}, 'body': b''})
+    assert store.get('long')['status'] == 'done'
+    # Finished jobs go once they're max_age old
+    store.create('next', 'export-excel', 'all', group_limit=1)
+    assert store.get('long') is None
+
+def test_prune_drops_stale_active_jobs(make_store):
+    store = make_store(stale_age=0)
+    store.create('dead', 'generate', 'sala', group_limit=1)
+    store.create('new', 'generate', 'sala', group_limit=1)
+    assert store.get('dead') is None
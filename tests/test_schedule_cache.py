@@ -0,0 +1,70 @@
+from schedule_cache import ScheduleCache
+
+def generate(client, **params):
+    response = client.post('/api/generate', json=dict({'group': 'sala', 'year': 2024, 'month': 5, 'seed': 7}, **params))
+    data = response.get_json()
+    assert data['success'], data
+    return data
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('schedule_cache.time.monotonic', lambda: now[0])
+    cache = ScheduleCache(max_size=2, ttl=10)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)  # b is the least recently used
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    now[0] += 10
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['evictions'], stats['expirations']) == (1, 1)
+
+def test_repeat_generate_hits_the_cache(app, client):
+    first = generate(client)
+    second = generate(client)
+    assert second['schedule'] == first['schedule']
+    assert second['score'] == first['score']
+    assert app.generation_cache.stats()['hits'] == 1
+
+def test_edits_do_not_leak_into_cached_generation(app, client):
+    first = generate(client)
+    worker = first['schedule'][0]['name']
+    edited = client.post('/api/update-shift', json={'group': 'sala', 'worker': worker, 'day': 3, 'shift': 'L'})
+    assert edited.get_json()['success']
+    # Generating again replaces the edit with the cached generation
+    again = generate(client)
+    assert app.generation_cache.stats()['hits'] == 1
+    assert again['schedule'] == first['schedule']
+    assert app.schedule_store.load('sala', 2024, 5)['version'] == 3
+
+def test_complete_generate_is_keyed_by_preview_week(app, client):
+    client.post('/api/generate-all', json={'year': 2024, 'month': 5, 'seed': 7})
+    assert client.post('/api/transfer', json={'group': 'sala'}).get_json()['success']
+    groups = list(app.get_rosters())
+    transferred = {group: app.schedule_store.load(group, 2024, 6)['schedule'] for group in groups}
+
+    def restore_transfer():
+        for group, schedule in transferred.items():
+            app.schedule_store.save(group, 2024, 6, schedule)
+
+    first = client.post('/api/complete-generate', json={'group': 'sala', 'seed': 3}).get_json()
+    assert first['success']
+
+    # Same preview week and seed: every group is served from the cache
+    restore_transfer()
+    hits = app.generation_cache.stats()['hits']
+    again = client.post('/api/complete-generate', json={'group': 'sala', 'seed': 3}).get_json()
+    assert app.generation_cache.stats()['hits'] == hits + len(groups)
+    assert again['schedule'] == first['schedule']
+
+    # An edit inside the preview week changes that group's key only
+    restore_transfer()
+    worker = transferred['sala'][0]['name']
+    shift = 'L' if transferred['sala'][0]['shifts'].get(4) != 'L' else 'M'
+    edited = client.post('/api/update-shift', json={'group': 'sala', 'worker': worker, 'day': 4, 'shift': shift})
+    assert edited.get_json()['success'], edited.get_json()
+    misses = app.generation_cache.stats()['misses']
+    assert client.post('/api/complete-generate', json={'group': 'sala', 'seed': 3}).get_json()['success']
+    assert app.generation_cache.stats()['misses'] == misses + 1
@@ -0,0 +1,22 @@
+import pytest
+
+from schedule_codec import decode_schedule, encode_schedule, ScheduleFormatError
+
+SCHEDULE = [{'name': 'Ana', 'shifts': {1: 'M', 2: 'T', 31: 'N'}, 'total_hours': 22.5, 'part_time': False}]
+
+def test_grid_round_trip():
+    decoded = decode_schedule(encode_schedule('sala', 2024, 5, SCHEDULE))
+    assert (decoded['group'], decoded['year'], decoded['month']) == ('sala', 2024, 5)
+    assert decoded['schedule'] == SCHEDULE
+
+def test_undefined_shift_code_is_a_format_error():
+    data = bytearray(encode_schedule('sala', 2024, 5, SCHEDULE))
+    data[-1] = 200
+    with pytest.raises(ScheduleFormatError, match='undefined shift code'):
+        decode_schedule(bytes(data))
+
+@pytest.mark.parametrize('query', ['year=abc', 'year=2024&month=x', 'year=2024&month=13'])
+def test_get_schedule_rejects_bad_month(client, query):
+    response = client.get(f'/api/schedule?group=sala&{query}')
+    assert response.status_code == 400
+    assert not response.get_json()['success']
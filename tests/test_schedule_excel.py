@@ -0,0 +1,84 @@
+import io
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from schedule_excel import SHIFT_COLORS, ExcelStyles, FileChunks, sheet_title, sheet_group_name
+
+def test_sheet_titles_round_trip():
+    assert sheet_group_name(sheet_title('Cocina')) == 'Cocina'
+    assert sheet_title('Cocina', 2024, 2) == 'Cocina 2024-02'
+    assert sheet_group_name('Cocina 2024-02') == 'Cocina'
+
+def test_multi_month_export_imports_every_sheet(app, client, monkeypatch):
+    for month in (4, 5):
+        response = client.post('/api/generate', json={'group': 'cocina', 'year': 2024, 'month': month, 'seed': month})
+        assert response.get_json()['success']
+    stored = {month: app.schedule_store.load('cocina', 2024, month)['schedule'] for month in (4, 5)}
+    exported = client.post('/api/export-excel', json={'start': '2024-04', 'end': '2024-05'}).data
+
+    monkeypatch.setattr(app, 'schedule_store', app.open_schedule_store('memory'))
+    response = client.post('/api/import-excel', data={'file': (io.BytesIO(exported), 'schedule.xlsx')})
+    data = response.get_json()
+    assert data['success']
+    assert [(entry['group'], entry['month']) for entry in data['imported']] == [('cocina', 4), ('cocina', 5)]
+    assert data['schedules']['cocina']['month_data']['month'] == 5
+    for month in (4, 5):
+        assert app.schedule_store.load('cocina', 2024, month)['schedule'] == stored[month]
+
+def test_workbook_without_schedule_sheets_is_rejected(client):
+    workbook = Workbook()
+    workbook.active.title = 'Summary'
+    upload = io.BytesIO()
+    workbook.save(upload)
+    upload.seek(0)
+    response = client.post('/api/import-excel', data={'file': (upload, 'other.xlsx')})
+    assert response.status_code == 400
+    assert not response.get_json()['success']
+
+def test_export_renders_a_bounded_window_in_order(app, monkeypatch):
+    rendered = []
+    monkeypatch.setattr(app, 'EXPORT_RENDER_WORKERS', 2)
+    monkeypatch.setattr(app, 'render_export_sheet', lambda writer, *sheet: rendered.append(sheet) or sheet)
+    sheets = [('sala', 2024, month) for month in range(1, 13)]
+    written = []
+    for sheet, rows in app.render_export_sheets(None, sheets):
+        assert rows == sheet
+        written.append(sheet)
+        # Never more than the window rendered ahead of what's written
+        assert len(rendered) - len(written) <= 2
+    assert written == sheets
+
+def test_export_cells_use_named_styles(client):
+    response = client.post('/api/generate', json={'group': 'sala', 'year': 2024, 'month': 5, 'seed': 1})
+    assert response.get_json()['success']
+    exported = client.post('/api/export-excel', json={'year': 2024}).data
+
+    workbook = load_workbook(io.BytesIO(exported))
+    assert {ExcelStyles.TITLE, ExcelStyles.DAY, ExcelStyles.BOLD} <= set(workbook.named_styles)
+    sheet = workbook.worksheets[0]
+    assert sheet['A1'].style == ExcelStyles.TITLE
+    # Rows 2-3 are the day headers; worker rows follow
+    shift_styles = {cell.style for row in sheet.iter_rows(min_row=4) for cell in row if cell.value in SHIFT_COLORS}
+    assert shift_styles and all(style.startswith('schedule_shift_') for style in shift_styles)
+
+def test_export_content_length_matches_the_body(client):
+    response = client.post('/api/generate', json={'group': 'sala', 'year': 2024, 'month': 5, 'seed': 1})
+    assert response.get_json()['success']
+    response = client.post('/api/export-excel', json={'year': 2024})
+    assert response.status_code == 200
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+@pytest.mark.parametrize('chunks_read', [0, 1, 3])
+def test_file_chunks_closes_the_file(chunks_read):
+    file = io.BytesIO(b'x' * 10)
+    chunks = FileChunks(file, chunk_size=4)
+    for _ in range(chunks_read):
+        next(chunks, None)
+    chunks.close()
+    assert file.closed
+
+def test_file_chunks_reads_the_whole_file_then_closes_it():
+    file = io.BytesIO(b'x' * 10)
+    assert list(FileChunks(file, chunk_size=4)) == [b'xxxx', b'xxxx', b'xx']
+    assert file.closed
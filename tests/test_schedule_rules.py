@@ -0,0 +1,35 @@
+import pytest
+
+from schedule_rules import compile_rules
+
+WORKERS = ('Ana', 'Berta', 'Carla', 'Diego')
+WORKER_INDICES = {worker: index for index, worker in enumerate(WORKERS)}
+NIGHT_ELIGIBLE = (0, 1, 2)
+
+def compile_group(rules):
+    return compile_rules('test', {'name': 'Test', 'rules': rules}, WORKER_INDICES, NIGHT_ELIGIBLE)
+
+def test_defaults_compile():
+    rule_set = compile_group({})
+    assert rule_set.night_cycle == 'team'
+    assert (rule_set.morning_cap, rule_set.afternoon_cap) == (4, 5)
+    assert rule_set.opposite_shift is None
+
+def test_opposite_shift_resolves_workers():
+    rule_set = compile_group({'opposite_shift': {'worker': 'Diego', 'follows': 'Ana'}})
+    assert rule_set.opposite_shift == (3, 0)
+
+@pytest.mark.parametrize('rules, key', [
+    ({'night_cycle': 'team'}, 'night_cycle'),
+    ({'night_cycle': {'type': 'anchor', 'worker': 7}}, 'night_cycle'),
+    ({'night_cycle': {'type': 'team', 'team_size': '2'}}, 'night_cycle team_size'),
+    ({'shift_caps': [4, 5]}, 'shift_caps'),
+    ({'shift_caps': {'M': 4}}, 'shift_caps T'),
+    ({'dl_per_sunday': None}, 'dl_per_sunday'),
+    ({'opposite_shift': 'Diego'}, 'opposite_shift'),
+    ({'opposite_shift': {'worker': ['Diego'], 'follows': 'Ana'}}, 'opposite_shift'),
+    ({'opposite_shift': {'worker': 'Nobody', 'follows': 'Ana'}}, 'opposite_shift'),
+])
+def test_malformed_rules_raise_value_error(rules, key):
+    with pytest.raises(ValueError, match=f'^test: {key}'):
+        compile_group(rules)
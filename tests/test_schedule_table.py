@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+from schedule_table import iter_csv_chunks, iter_csv_rows, iter_schedule_rows, TableFormatError
+
+def shifts_by_day(schedule):
+    return {worker['name']: {int(day): shift for day, shift in worker['shifts'].items()}
+            for worker in schedule}
+
+def test_csv_rows_round_trip():
+    schedule = [{'name': 'Ana', 'shifts': {1: 'M', 2: 'DL', 31: 'N', 32: 'N'}, 'total_hours': 15}]
+    data = b''.join(iter_csv_chunks(iter_schedule_rows('sala', 2024, 5, schedule)))
+    assert data.decode().splitlines() == [
+        'group,year,month,worker,day,shift,hours',
+        'sala,2024,5,Ana,1,M,7.5',
+        'sala,2024,5,Ana,2,DL,0',
+        'sala,2024,5,Ana,31,N,7.5'
+    ]
+    assert list(iter_csv_rows(io.BytesIO(data))) == [
+        ('sala', 2024, 5, 'Ana', 1, 'M'), ('sala', 2024, 5, 'Ana', 2, 'DL'), ('sala', 2024, 5, 'Ana', 31, 'N')
+    ]
+
+def test_csv_rows_reject_days_outside_the_month():
+    data = b'group,year,month,worker,day,shift\nsala,2024,2,Ana,30,M\n'
+    with pytest.raises(TableFormatError, match='no day 30'):
+        list(iter_csv_rows(io.BytesIO(data)))
+
+def test_single_month_import_keeps_preview_week(app, client):
+    response = client.post('/api/generate', json={'group': 'sala', 'year': 2024, 'month': 5, 'seed': 3})
+    assert response.get_json()['success']
+    before = shifts_by_day(app.schedule_store.load('sala', 2024, 5)['schedule'])
+    assert any(day > 31 for shifts in before.values() for day in shifts)
+
+    exported = client.post('/api/export-table', json={'format': 'csv', 'start': '2024-05'}).data
+    response = client.post('/api/import-table', data={'file': (io.BytesIO(exported), 'schedule.csv')})
+    assert response.get_json()['success']
+
+    after = app.schedule_store.load('sala', 2024, 5)
+    assert after['version'] == 2
+    assert shifts_by_day(after['schedule']) == before
+
+@pytest.mark.parametrize('table_format', ['parquet', 'arrow'])
+def test_columnar_two_month_round_trip(app, client, monkeypatch, table_format):
+    pytest.importorskip('pyarrow')
+    for month in (1, 2):
+        response = client.post('/api/generate-all', json={'year': 2024, 'month': month, 'seed': month})
+        assert response.get_json()['success']
+    groups = list(app.get_rosters())
+    before = {(group, month): app.schedule_store.load(group, 2024, month)['schedule']
+              for group in groups for month in (1, 2)}
+
+    response = client.post('/api/export-table', json={'format': table_format, 'start': '2024-01', 'end': '2024-02'})
+    assert response.status_code == 200
+    exported = response.data
+
+    monkeypatch.setattr(app, 'schedule_store', app.open_schedule_store('memory'))
+    response = client.post('/api/import-table',
+                           data={'file': (io.BytesIO(exported), f'schedule.{table_format}')})
+    assert response.get_json()['success']
+
+    for (group, month), schedule in before.items():
+        days_in_month = 31 if month == 1 else 29
+        after = app.schedule_store.load(group, 2024, month)['schedule']
+        assert [worker['total_hours'] for worker in after] == [worker['total_hours'] for worker in schedule]
+        in_month = lambda shifts: {day: shift for day, shift in shifts.items() if day <= days_in_month}
+        assert [in_month(shifts) for shifts in shifts_by_day(after).values()] == \
+               [in_month(shifts) for shifts in shifts_by_day(schedule).values()]
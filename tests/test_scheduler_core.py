@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from scheduler_core import SchedulerCore, UnknownGroupError
+
+def new_month(group='sala', year=2024, month=5):
+    scheduler = SchedulerCore(group)
+    scheduler.initialize_month(year, month)
+    return scheduler
+
+@pytest.mark.parametrize('day', [-1, 0, 39, 99])
+def test_assign_shift_rejects_days_outside_month_and_preview(day):
+    scheduler = new_month()
+    worker = scheduler.selected_workers[0]
+    with pytest.raises(ValueError):
+        scheduler.assign_shift(day, worker, 'M')
+    assert scheduler.get_month_schedule()[0]['shifts'] == {}
+    assert scheduler.total_hours[0] == 0
+
+def test_assign_shift_accepts_last_preview_day():
+    scheduler = new_month()
+    worker = scheduler.selected_workers[0]
+    scheduler.assign_shift(31 + 7, worker, 'M')
+    assert scheduler.get_shift(0, 38) == 'M'
+    # Preview days don't count towards the month's hours
+    assert scheduler.total_hours[0] == 0
+
+def test_unknown_group_raises():
+    with pytest.raises(UnknownGroupError):
+        SchedulerCore('nope')
+
+@pytest.mark.parametrize('group', ['sala', 'cocina', 'coperia'])
+def test_hours_ledger_follows_generation_and_edits(group):
+    scheduler = new_month(group)
+    scheduler.set_seed(5)
+    scheduler.generate_schedule()
+    assert scheduler.check_total_hours() == []
+
+    rng = random.Random(5)
+    last_day = scheduler.days_in_month + scheduler.preview_days
+    for _ in range(200):
+        worker_index = rng.randrange(len(scheduler.selected_workers))
+        scheduler.assign_shift_at(rng.randint(1, last_day), worker_index, rng.choice(['M', 'T', 'N', 'L', 'DL', '']))
+    assert scheduler.check_total_hours() == []
+
+@pytest.mark.parametrize('group', ['sala', 'cocina'])
+@pytest.mark.parametrize('seed', range(5))
+def test_generation_leaves_no_rule_violations(group, seed):
+    scheduler = new_month(group, 2024, 3)
+    scheduler.set_seed(seed)
+    scheduler.generate_schedule()
+    assert scheduler.constraints().counts == {'t_to_m': 0, 'streak': 0, 'missing_dl': 0}
+
+def test_repair_fixes_an_edit_that_breaks_t_to_m():
+    scheduler = new_month('sala', 2024, 3)
+    scheduler.set_seed(0)
+    scheduler.generate_schedule()
+    tracker = scheduler.constraints()
+    worker_index, day = next((w, d) for w in range(len(scheduler.selected_workers)) for d in range(2, 28)
+                             if scheduler.get_shift(w, d - 1) == 'T' and scheduler.get_shift(w, d) == 'T')
+    scheduler.assign_shift(day, scheduler.selected_workers[worker_index], 'M')
+    assert tracker.counts['t_to_m'] == 1
+    scheduler.repair_schedule()
+    assert tracker.counts['t_to_m'] == 0
@@ -0,0 +1,80 @@
+import pytest
+
+@pytest.fixture
+def generated(app, client):
+    response = client.post('/api/generate', json={'group': 'sala', 'year': 2024, 'month': 5, 'seed': 3})
+    data = response.get_json()
+    assert data['success']
+    return data
+
+def stored_shifts(app):
+    return {worker['name']: {int(day): shift for day, shift in worker['shifts'].items()}
+            for worker in app.schedule_store.load('sala', 2024, 5)['schedule']}
+
+def find_cell(shifts, accept):
+    """First (worker, day) whose shift, and the one before it, pass accept(previous, shift)"""
+    for worker, worker_shifts in shifts.items():
+        for day in range(2, 32):
+            if accept(worker_shifts.get(day - 1), worker_shifts.get(day)):
+                return worker, day
+    raise AssertionError('no such cell')
+
+def test_update_shift_returns_only_changes(app, client, generated):
+    worker, day = find_cell(stored_shifts(app), lambda previous, shift: shift in ('M', 'T'))
+    response = client.post('/api/update-shift', json={'group': 'sala', 'worker': worker, 'day': day, 'shift': 'L'})
+    data = response.get_json()
+    assert data['success']
+    assert {'worker': worker, 'day': day, 'shift': 'L'} in data['changes']
+    assert 'schedule' not in data
+    stored = app.schedule_store.load('sala', 2024, 5)['schedule']
+    assert data['total_hours'][worker] == next(w['total_hours'] for w in stored if w['name'] == worker)
+    assert stored_shifts(app)[worker][day] == 'L'
+
+def test_update_shifts_applies_a_batch(app, client, generated):
+    shifts = stored_shifts(app)
+    first = find_cell(shifts, lambda previous, shift: shift in ('M', 'T'))
+    second = find_cell({worker: s for worker, s in shifts.items() if worker != first[0]},
+                       lambda previous, shift: shift in ('M', 'T'))
+    edits = [{'worker': worker, 'day': day, 'shift': 'L'} for worker, day in (first, second)]
+    data = client.post('/api/update-shifts', json={'group': 'sala', 'edits': edits}).get_json()
+    assert data['success'] and data['version'] == 2
+    for edit in edits:
+        assert edit in data['changes']
+        assert stored_shifts(app)[edit['worker']][edit['day']] == 'L'
+
+def test_update_shifts_saves_nothing_when_an_edit_fails(app, client, generated):
+    before = stored_shifts(app)
+    valid = find_cell(before, lambda previous, shift: shift in ('M', 'T'))
+    # M right after T breaks the T->M rule
+    invalid = find_cell(before, lambda previous, shift: previous == 'T' and shift != 'DL')
+    edits = [{'worker': valid[0], 'day': valid[1], 'shift': 'L'},
+             {'worker': invalid[0], 'day': invalid[1], 'shift': 'M'}]
+    response = client.post('/api/update-shifts', json={'group': 'sala', 'edits': edits})
+    assert response.status_code == 400
+    assert response.get_json()['edit'] == 1
+    assert app.schedule_store.load('sala', 2024, 5)['version'] == 1
+    assert stored_shifts(app) == before
+
+@pytest.mark.parametrize('edit', [{'worker': 'Nobody', 'day': 3, 'shift': 'L'}, {'day': 3, 'shift': 'L'}])
+def test_update_shifts_rejects_malformed_edits_without_saving(app, client, generated, edit):
+    before = stored_shifts(app)
+    worker, day = find_cell(before, lambda previous, shift: shift in ('M', 'T'))
+    edits = [{'worker': worker, 'day': day, 'shift': 'L'}, edit]
+    response = client.post('/api/update-shifts', json={'group': 'sala', 'edits': edits})
+    assert response.status_code == 400
+    assert app.schedule_store.load('sala', 2024, 5)['version'] == 1
+
+@pytest.mark.parametrize('endpoint', ['/api/update-shift', '/api/update-shifts'])
+def test_stale_version_is_a_conflict(app, client, generated, endpoint):
+    worker, day = find_cell(stored_shifts(app), lambda previous, shift: shift in ('M', 'T'))
+    # Someone else saves first
+    app.schedule_store.save('sala', 2024, 5, app.schedule_store.load('sala', 2024, 5)['schedule'])
+    before = stored_shifts(app)
+
+    edit = {'worker': worker, 'day': day, 'shift': 'L'}
+    body = dict(edit) if endpoint == '/api/update-shift' else {'edits': [edit]}
+    response = client.post(endpoint, json=dict(body, group='sala', version=generated['version']))
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 2
+    assert app.schedule_store.load('sala', 2024, 5)['version'] == 2
+    assert stored_shifts(app) == before
@@ -0,0 +1,25 @@
+import pytest
+
+from job_queue import JobLimitError, SqliteJobStore
+from schedule_store import SqliteScheduleStore, VersionConflict
+
+SCHEDULE = [{'name': 'Ana', 'shifts': {1: 'M'}, 'total_hours': 7.5}]
+
+def test_schedule_store_compare_and_set(tmp_path):
+    store = SqliteScheduleStore(str(tmp_path / 'schedules.db'))
+    assert store.save('sala', 2024, 5, SCHEDULE, expected_version=0) == 1
+    with pytest.raises(VersionConflict):
+        store.save('sala', 2024, 5, SCHEDULE, expected_version=0)
+    assert store.get_version('sala', 2024, 5) == 1
+    assert store.load('sala', 2024, 5)['schedule'][0]['shifts'] == {1: 'M'}
+
+def test_job_store_limit_rolls_back(tmp_path):
+    store = SqliteJobStore(str(tmp_path / 'jobs.db'))
+    store.create('a', 'generate', 'sala', group_limit=1)
+    with pytest.raises(JobLimitError):
+        store.create('b', 'generate', 'sala', group_limit=1)
+    assert store.get('b') is None
+    # The failed create left no transaction open
+    assert store.cancel('a') == 'cancelled'
+    store.create('c', 'generate', 'sala', group_limit=1)
+    assert store.get('c')['status'] == 'queued'
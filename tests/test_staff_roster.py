@@ -0,0 +1,34 @@
+import json
+import os
+
+import pytest
+
+from staff_roster import RosterLoader
+
+GROUP = {'name': 'Test', 'workers_full_time': ['Ana', 'Berta', 'Carla']}
+
+def write_config(path, config, mtime):
+    path.write_text(json.dumps(config), encoding='utf-8')
+    os.utime(path, ns=(mtime, mtime))
+
+def test_first_load_errors_propagate(tmp_path):
+    path = tmp_path / 'staff.json'
+    write_config(path, {'test': dict(GROUP, rules={'shift_caps': [4, 5]})}, 1_000_000_000)
+    with pytest.raises(ValueError):
+        RosterLoader(str(path), check_interval=0).get_rosters()
+
+@pytest.mark.parametrize('rules', [{'night_cycle': 'team'}, {'shift_caps': [4, 5]}, {'opposite_shift': 'Ana'}])
+def test_broken_reload_keeps_previous_rosters(tmp_path, monkeypatch, rules):
+    path = tmp_path / 'staff.json'
+    write_config(path, {'test': GROUP}, 1_000_000_000)
+    loader = RosterLoader(str(path), check_interval=0)
+    rosters = loader.get_rosters()
+
+    write_config(path, {'test': dict(GROUP, rules=rules)}, 2_000_000_000)
+    assert loader.get_rosters() is rosters
+
+    # The broken file isn't parsed again until it changes
+    loads = []
+    monkeypatch.setattr(loader, 'load', lambda: loads.append(1))
+    assert loader.get_rosters() is rosters
+    assert not loads
@@ -0,0 +1,43 @@
+import threading
+import time
+
+import pytest
+
+@pytest.fixture
+def stream_client(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'stream_slots', threading.BoundedSemaphore(1))
+    assert client.post('/api/generate', json={'group': 'sala', 'year': 2024, 'month': 5}).get_json()['success']
+    return client
+
+def test_stream_releases_its_slot(stream_client):
+    for _ in range(2):
+        body = stream_client.get('/api/complete-generate/stream?group=sala&seed=1').get_data(as_text=True)
+        assert 'event: done' in body
+
+def test_stream_limit(app, stream_client):
+    assert app.stream_slots.acquire(blocking=False)
+    try:
+        response = stream_client.get('/api/complete-generate/stream?group=sala&seed=1')
+        assert response.status_code == 429
+    finally:
+        app.stream_slots.release()
+
+def test_unread_stream_never_generates(app, stream_client):
+    with app.app.test_request_context('/api/complete-generate/stream?group=sala&seed=1'):
+        response = app.complete_generate_stream()
+    assert not app.stream_slots.acquire(blocking=False)
+    response.close()
+    assert app.stream_slots.acquire(blocking=False)
+    app.stream_slots.release()
+    # Only the fixture's generate stored anything
+    assert app.schedule_store.get_version('sala', 2024, 5) == 1
+
+def test_disconnect_stops_generation(app, stream_client):
+    response = stream_client.get('/api/complete-generate/stream?group=sala&seed=1'
+                                 '&engine=search&time_budget_ms=3000', buffered=False)
+    assert next(iter(response.response)).startswith(b'event: progress')
+    started = time.monotonic()
+    response.close()
+    assert time.monotonic() - started < 2
+    assert app.stream_slots.acquire(blocking=False)
+    app.stream_slots.release()
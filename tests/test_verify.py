@@ -0,0 +1,27 @@
+def fresh_verify(app, group):
+    scheduler, _ = app.load_scheduler(group)
+    constraints = scheduler.constraints()
+    return sorted(constraints.t_to_m_violations()), sorted(constraints.streak_violations())
+
+def test_verify_reuses_tracker_of_saved_version(app, client):
+    response = client.post('/api/generate', json={'group': 'sala', 'year': 2024, 'month': 5, 'seed': 3})
+    assert response.get_json()['success']
+
+    first = client.get('/api/verify-schedule?group=sala').get_json()
+    second = client.get('/api/verify-dl-counts?group=sala').get_json()
+    assert first['success'] and second['success']
+    assert app.tracker_cache.stats()['hits'] == 2
+    assert app.tracker_cache.stats()['misses'] == 0
+
+def test_verify_follows_edits(app, client):
+    client.post('/api/generate', json={'group': 'sala', 'year': 2024, 'month': 5, 'seed': 3})
+    scheduler, _ = app.load_scheduler('sala')
+    worker = scheduler.selected_workers[0]
+    response = client.post('/api/update-shift', json={'group': 'sala', 'worker': worker, 'day': 3, 'shift': 'L'})
+    assert response.get_json()['success']
+
+    result = client.get('/api/verify-schedule?group=sala').get_json()
+    t_to_m, streaks = fresh_verify(app, 'sala')
+    assert result['total_violations'] == len(t_to_m)
+    assert len(result['streak_violations']) == len(streaks)
+    assert app.tracker_cache.stats()['misses'] == 1